@@ -0,0 +1,85 @@
+"""Compare parallel cache generation against a serial font database build.
+
+Builds a synthetic tree of font directories by copying a seed font, then times
+
+- ``Config.build_fonts`` on a config listing the tree, which scans serially;
+- ``fontconfig.build_caches`` on the same tree with a pool of threads.
+
+Each run writes to its own empty cache directory. Usage::
+
+    python benchmarks/bench_build_caches.py --dirs 50 --files 40 --workers 8
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import fontconfig
+
+
+def make_tree(root: str, seed: str, dirs: int, files: int) -> None:
+    ext = os.path.splitext(seed)[1]
+    for i in range(dirs):
+        path = os.path.join(root, "family%03d" % i)
+        os.makedirs(path)
+        for j in range(files):
+            shutil.copy(seed, os.path.join(path, "font%03d%s" % (j, ext)))
+
+
+def make_config(workdir: str, font_root: str, name: str) -> fontconfig.Config:
+    cache_dir = os.path.join(workdir, "cache-" + name)
+    os.makedirs(cache_dir)
+    conf = os.path.join(workdir, name + ".conf")
+    with open(conf, "w") as f:
+        f.write(
+            "<fontconfig><dir>%s</dir><cachedir>%s</cachedir></fontconfig>"
+            % (font_root, cache_dir)
+        )
+    config = fontconfig.Config.create()
+    if not config.parse_and_load(conf):
+        raise RuntimeError("Failed to load %s" % conf)
+    return config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=20, help="number of directories")
+    parser.add_argument("--files", type=int, default=20, help="font files per directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", help="font file to copy (default: first system font)")
+    args = parser.parse_args()
+
+    seed = args.seed
+    if seed is None:
+        files = [font["file"] for font in fontconfig.list(select=("file",)) if "file" in font]
+        if not files:
+            parser.error("no system fonts found; pass --seed")
+        seed = files[0]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        font_root = os.path.join(workdir, "fonts")
+        make_tree(font_root, seed, args.dirs, args.files)
+        print("%d font files in %d directories, seed %s" % (args.dirs * args.files, args.dirs, seed))
+
+        config = make_config(workdir, font_root, "serial")
+        start = time.perf_counter()
+        config.build_fonts()
+        serial = time.perf_counter() - start
+        print("serial build_fonts:          %8.3f s" % serial)
+
+        config = make_config(workdir, font_root, "parallel")
+        start = time.perf_counter()
+        counts = fontconfig.build_caches([font_root], workers=args.workers, config=config)
+        parallel = time.perf_counter() - start
+        print("build_caches (%2d workers):   %8.3f s  (%.2fx)" % (args.workers, parallel, serial / parallel))
+        assert sum(counts.values()) == args.dirs * args.files
+
+        start = time.perf_counter()
+        config.build_fonts()
+        print("build_fonts with warm caches: %8.3f s" % (time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
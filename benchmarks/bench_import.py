@@ -0,0 +1,63 @@
+"""Measure the startup cost of importing fontconfig.
+
+Runs each scenario in a fresh interpreter and reports the median wall time
+and peak resident memory of
+
+- ``import fontconfig`` alone, which must not load the configuration;
+- ``import fontconfig`` followed by ``fontconfig.init()``;
+- ``import fontconfig`` followed by the first ``fontconfig.match()``.
+
+Usage::
+
+    python benchmarks/bench_import.py --repeat 20
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    "import": "",
+    "import + init()": "fontconfig.init()",
+    "import + match()": "fontconfig.match(':family=sans-serif')",
+}
+
+TEMPLATE = """
+import json, resource, time
+start = time.perf_counter()
+import fontconfig
+{}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss]))
+"""
+
+
+def run(code: str) -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", TEMPLATE.format(code)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return tuple(json.loads(output.stdout.splitlines()[-1]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10, help="runs per scenario")
+    args = parser.parse_args()
+
+    run("")  # Warm up the OS file cache.
+    for name, code in SCENARIOS.items():
+        results = [run(code) for _ in range(args.repeat)]
+        elapsed = statistics.median(result[0] for result in results)
+        rss = statistics.median(result[1] for result in results)
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+        rss = rss / 1024 if sys.platform == "darwin" else rss
+        print("%-18s %8.1f ms  %8.1f MiB max RSS" % (name + ":", elapsed * 1000, rss / 1024))
+
+
+if __name__ == "__main__":
+    main()
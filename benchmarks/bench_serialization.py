@@ -0,0 +1,74 @@
+"""Compare binary serialization of font sets against pattern strings.
+
+Lists the installed fonts with their charsets and langsets, then times
+
+- ``FontSet.to_bytes`` and ``FontSet.from_bytes``;
+- ``pickle.dumps`` and ``pickle.loads`` of the font set;
+- ``Pattern.unparse`` and ``Pattern.parse`` of every font, the string
+  alternative, which does not keep value bindings.
+
+Each round trip is checked against the original fonts. Usage::
+
+    python benchmarks/bench_serialization.py --repeat 10
+"""
+
+import argparse
+import pickle
+import time
+
+import fontconfig
+
+PROPERTIES = ("family", "style", "file", "index", "weight", "slant", "width", "charset", "lang")
+
+
+def timeit(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, size: int, encode: float, decode: float, count: int) -> None:
+    print(
+        "%-16s %10d bytes  encode %8.2f ms (%8.0f fonts/s)  decode %8.2f ms (%8.0f fonts/s)"
+        % (name, size, encode * 1000, count / encode, decode * 1000, count / decode)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    args = parser.parse_args()
+
+    config = fontconfig.Config.get_current()
+    object_set = fontconfig.ObjectSet.create()
+    object_set.build(PROPERTIES)
+    fonts = config.font_list(fontconfig.Pattern.create(), object_set)
+    count = len(fonts)
+    if not count:
+        parser.error("no system fonts found")
+    expected = [dict(font) for font in fonts]
+    print("%d fonts with %s" % (count, ", ".join(PROPERTIES)))
+
+    data = fonts.to_bytes()
+    assert [dict(font) for font in fontconfig.FontSet.from_bytes(data)] == expected
+    encode = timeit(fonts.to_bytes, args.repeat)
+    decode = timeit(lambda: fontconfig.FontSet.from_bytes(data), args.repeat)
+    report("to_bytes:", len(data), encode, decode, count)
+
+    data = pickle.dumps(fonts)
+    assert [dict(font) for font in pickle.loads(data)] == expected
+    encode = timeit(lambda: pickle.dumps(fonts), args.repeat)
+    decode = timeit(lambda: pickle.loads(data), args.repeat)
+    report("pickle:", len(data), encode, decode, count)
+
+    names = [font.unparse() for font in fonts]
+    encode = timeit(lambda: [font.unparse() for font in fonts], args.repeat)
+    decode = timeit(lambda: [fontconfig.Pattern.parse(name) for name in names], args.repeat)
+    report("unparse:", sum(len(name.encode("utf-8")) for name in names), encode, decode, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Run the benchmark suite and compare the results with a baseline.
+
+Builds a hermetic config holding only application fonts added with
+``Config.app_font_add_dir``, with its own cache directory and no system
+configuration, then times
+
+- ``match()`` per request and ``match_many()`` on the same requests;
+- ``sort()`` with and without ``trim``;
+- ``list()`` of all fonts with many ``select`` properties;
+- ``CharSet`` construction and iteration on the CJK Unified Ideographs block;
+- ``Pattern.to_dict()`` of every font.
+
+The fonts come from ``--fonts``, or by default from the font files of the
+current configuration, i.e., whatever fonts the machine has installed, so
+results are only comparable when ``--fonts`` points at a fixed directory.
+Each file is linked ``--copies`` times to grow the catalog.
+
+Each benchmark reports the median, best and worst wall time per call over
+``--repeat`` rounds, each lasting at least 0.2 seconds, and the peak Python
+heap allocated during one call, measured with ``tracemalloc`` in a separate
+call. With ``--compare``, the script exits with status 1 when a peak grows by
+more than its threshold, or when a median time grows by more than its
+threshold and the best round is slower than the worst round of the baseline,
+so that timing noise within the baseline's spread is not reported. Usage::
+
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json --time-threshold 0.2
+"""
+
+import argparse
+import array
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+
+import fontconfig
+
+FORMAT_VERSION = 2
+
+LIST_SELECT = (
+    "family",
+    "familylang",
+    "style",
+    "stylelang",
+    "fullname",
+    "file",
+    "index",
+    "weight",
+    "slant",
+    "width",
+    "spacing",
+    "foundry",
+    "fontformat",
+    "fontversion",
+    "postscriptname",
+    "scalable",
+    "color",
+    "variable",
+    "lang",
+)
+
+CJK_FIRST = 0x4E00
+CJK_LAST = 0x9FFF
+
+
+def font_files(fonts_dir: str) -> List[str]:
+    if fonts_dir:
+        files = []
+        for root, _, names in os.walk(fonts_dir):
+            files.extend(os.path.join(root, name) for name in names)
+    else:
+        files = [font["file"] for font in fontconfig.list(select=("file",)) if "file" in font]
+    return sorted(set(files))
+
+
+def make_config(workdir: str, files: List[str], copies: int) -> fontconfig.Config:
+    font_dir = os.path.join(workdir, "fonts")
+    cache_dir = os.path.join(workdir, "cache")
+    os.makedirs(font_dir)
+    os.makedirs(cache_dir)
+    for i, path in enumerate(files):
+        base, ext = os.path.splitext(os.path.basename(path))
+        for j in range(copies):
+            target = os.path.join(font_dir, "%04d-%02d-%s%s" % (i, j, base, ext))
+            try:
+                os.symlink(path, target)
+            except OSError:
+                shutil.copy(path, target)
+    conf = os.path.join(workdir, "fonts.conf")
+    with open(conf, "w") as f:
+        f.write("<fontconfig><cachedir>%s</cachedir></fontconfig>" % cache_dir)
+    config = fontconfig.Config.create()
+    if not config.parse_and_load(conf):
+        raise RuntimeError("Failed to load %s" % conf)
+    if not config.app_font_add_dir(font_dir):
+        raise RuntimeError("Failed to add fonts from %s" % font_dir)
+    return config
+
+
+def make_benchmarks(config: fontconfig.Config) -> Dict[str, Callable[[], object]]:
+    fonts = config.get_fonts("application")
+    families = sorted({font.get("family") for font in fonts} - {None})
+    requests = [{"family": family, "weight": weight} for family in families for weight in (80, 200)]
+    sort_requests = [{"family": family} for family in families[:10]]
+    text = "".join(chr(c) for c in range(CJK_FIRST, CJK_LAST + 1))
+    codepoints = array.array("I", range(CJK_FIRST, CJK_LAST + 1))
+    charset = fontconfig.CharSet.from_codepoints(codepoints)
+
+    def match() -> None:
+        for request in requests:
+            fontconfig.match(properties=request, config=config)
+
+    def match_many() -> None:
+        fontconfig.match_many(requests, config=config)
+
+    def sort_trim() -> None:
+        for request in sort_requests:
+            fontconfig.sort(properties=request, trim=True, config=config)
+
+    def sort_no_trim() -> None:
+        for request in sort_requests:
+            fontconfig.sort(properties=request, trim=False, config=config)
+
+    def list_select() -> None:
+        fontconfig.list(select=LIST_SELECT, config=config)
+
+    def charset_from_string() -> None:
+        fontconfig.CharSet.from_string(text)
+
+    def charset_from_codepoints() -> None:
+        fontconfig.CharSet.from_codepoints(codepoints)
+
+    def charset_iter() -> None:
+        for _ in charset:
+            pass
+
+    def charset_iter_ranges() -> None:
+        for _ in charset.iter_ranges():
+            pass
+
+    def pattern_to_dict() -> None:
+        for font in fonts:
+            font.to_dict()
+
+    return {
+        "match": match,
+        "match_many": match_many,
+        "sort_trim": sort_trim,
+        "sort_no_trim": sort_no_trim,
+        "list_select": list_select,
+        "charset_from_string": charset_from_string,
+        "charset_from_codepoints": charset_from_codepoints,
+        "charset_iter": charset_iter,
+        "charset_iter_ranges": charset_iter_ranges,
+        "pattern_to_dict": pattern_to_dict,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()  # Also warms up caches.
+    times = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": statistics.median(times), "min": min(times), "max": max(times), "peak": peak}
+
+
+def compare(results: dict, baseline: dict, time_threshold: float, memory_threshold: float) -> List[str]:
+    if baseline.get("version") != FORMAT_VERSION:
+        raise ValueError("Unsupported baseline version: %r" % baseline.get("version"))
+    if baseline.get("fonts") != results["fonts"]:
+        print(
+            "warning: baseline has %s fonts, this run %d; results may not be comparable"
+            % (baseline.get("fonts"), results["fonts"]),
+            file=sys.stderr,
+        )
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        if result["time"] > base["time"] * (1 + time_threshold) and result["min"] > base["max"]:
+            regressions.append(
+                "%s: time %.3f ms -> %.3f ms" % (name, base["time"] * 1000, result["time"] * 1000)
+            )
+        if result["peak"] > base["peak"] * (1 + memory_threshold):
+            regressions.append(
+                "%s: peak %.1f KiB -> %.1f KiB" % (name, base["peak"] / 1024, result["peak"] / 1024)
+            )
+    return regressions
+
+
+def report(name: str, result: Dict[str, float], base: Dict[str, float]) -> None:
+    line = "%-24s %10.3f ms (%10.3f - %10.3f ms)  %10.1f KiB" % (
+        name + ":",
+        result["time"] * 1000,
+        result["min"] * 1000,
+        result["max"] * 1000,
+        result["peak"] / 1024,
+    )
+    if base:
+        line += "  time %+6.1f%%  peak %+6.1f%%" % (
+            (result["time"] / base["time"] - 1) * 100,
+            (result["peak"] / base["peak"] - 1) * 100 if base["peak"] else 0.0,
+        )
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fonts", help="font directory (default: installed fonts, not hermetic)")
+    parser.add_argument("--copies", type=int, default=10, help="links per font file")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks containing this string")
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--compare", help="baseline JSON file written by --save")
+    parser.add_argument("--time-threshold", type=float, default=0.2, help="allowed median time increase")
+    parser.add_argument("--memory-threshold", type=float, default=0.2, help="allowed peak increase")
+    args = parser.parse_args()
+
+    files = font_files(args.fonts)
+    if not files:
+        parser.error("no font files found; pass --fonts")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = make_config(workdir, files, args.copies)
+        benchmarks = make_benchmarks(config)
+        results = {
+            "version": FORMAT_VERSION,
+            "fontconfig": fontconfig.get_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fonts": len(config.get_fonts("application")),
+            "benchmarks": {},
+        }
+        print(
+            "%d fonts from %d files, fontconfig %s, Python %s"
+            % (results["fonts"], len(files), results["fontconfig"], results["python"])
+        )
+        for name, func in benchmarks.items():
+            if args.filter not in name:
+                continue
+            result = measure(func, args.repeat)
+            results["benchmarks"][name] = result
+            report(name, result, baseline["benchmarks"].get(name) if baseline else None)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+        for regression in regressions:
+            print("regression: " + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-cdef extern from "fontconfig/fontconfig.h":
+cdef extern from "fontconfig/fontconfig.h" nogil:
 
     ctypedef unsigned char FcChar8
 
@@ -646,3 +646,76 @@ cdef extern from "fontconfig/fontconfig.h":
     FcBool FcConfigParseAndLoad(FcConfig* config, const FcChar8* file, FcBool complain)
 
     FcBool FcConfigParseAndLoadFromMemory(FcConfig* config, const FcChar8* buffer, FcBool complain)
+
+
+# FreeType is linked with fontconfig, but its headers may not be on the include
+# path. Declare the few functions needed to query fonts in memory, with opaque
+# handles and the stable layout of the variation structs.
+cdef extern from * nogil:
+    """
+    typedef struct FT_LibraryRec_* FT_Library;
+    typedef struct FT_FaceRec_* FT_Face;
+    typedef struct {
+        char* name;
+        long minimum;
+        long def;
+        long maximum;
+        unsigned long tag;
+        unsigned int strid;
+    } FT_Var_Axis;
+    typedef struct {
+        long* coords;
+        unsigned int strid;
+        unsigned int psid;
+    } FT_Var_Named_Style;
+    typedef struct {
+        unsigned int num_axis;
+        unsigned int num_designs;
+        unsigned int num_namedstyles;
+        FT_Var_Axis* axis;
+        FT_Var_Named_Style* namedstyle;
+    } FT_MM_Var;
+    int FT_Init_FreeType(FT_Library* alibrary);
+    int FT_Done_FreeType(FT_Library library);
+    int FT_New_Memory_Face(FT_Library library, const unsigned char* file_base,
+                           long file_size, long face_index, FT_Face* aface);
+    int FT_Done_Face(FT_Face face);
+    int FT_Get_MM_Var(FT_Face face, FT_MM_Var** amaster);
+    int FT_Done_MM_Var(FT_Library library, FT_MM_Var* amaster);
+    int FT_Set_Var_Design_Coordinates(FT_Face face, unsigned int num_coords,
+                                      long* coords);
+    FcPattern* FcFreeTypeQueryFace(const FT_Face face, const FcChar8* file,
+                                   unsigned int id, FcBlanks* blanks);
+    """
+    ctypedef struct FT_LibraryRec_
+    ctypedef struct FT_FaceRec_
+    ctypedef FT_LibraryRec_* FT_Library
+    ctypedef FT_FaceRec_* FT_Face
+
+    ctypedef struct FT_Var_Axis:
+        long def_ "def"
+
+    ctypedef struct FT_Var_Named_Style:
+        long* coords
+
+    ctypedef struct FT_MM_Var:
+        unsigned int num_axis
+        unsigned int num_namedstyles
+        FT_Var_Axis* axis
+        FT_Var_Named_Style* namedstyle
+
+    int FT_Init_FreeType(FT_Library* alibrary)
+
+    int FT_Done_FreeType(FT_Library library)
+
+    int FT_New_Memory_Face(FT_Library library, const unsigned char* file_base, long file_size, long face_index, FT_Face* aface)
+
+    int FT_Done_Face(FT_Face face)
+
+    int FT_Get_MM_Var(FT_Face face, FT_MM_Var** amaster)
+
+    int FT_Done_MM_Var(FT_Library library, FT_MM_Var* amaster)
+
+    int FT_Set_Var_Design_Coordinates(FT_Face face, unsigned int num_coords, long* coords)
+
+    FcPattern* FcFreeTypeQueryFace(const FT_Face face, const FcChar8* file, unsigned int id, FcBlanks* blanks)
@@ -0,0 +1,393 @@
+"""Asyncio front-end to fontconfig.
+
+The coroutines in this module run the blocking calls of :py:mod:`fontconfig`
+on a bounded pool of threads, so that font lookups and font database rebuilds
+do not stall the event loop.
+
+- Identical requests that are in flight at the same time share one lookup.
+  Each caller receives its own copy of the result dicts.
+- Cancelling a caller only cancels the shared lookup when no other caller
+  awaits it. A lookup that already runs in a thread completes in the
+  background.
+- :py:func:`rebuild` waits for the running lookups to finish, and lookups
+  started during a rebuild wait for it. This applies to the calls made through
+  this module on the same event loop.
+
+Example::
+
+    import fontconfig.aio
+
+    async def handle(request):
+        font = await fontconfig.aio.match(":family=Arial:weight=200")
+        fallbacks = await fontconfig.aio.sort(":lang=ja", select=("family", "file"))
+        await fontconfig.aio.rebuild(dirs=["/srv/fonts"])
+"""
+
+import asyncio
+import builtins
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+import fontconfig
+
+__all__ = ["match", "sort", "list", "rebuild", "set_max_workers", "shutdown"]
+
+DEFAULT_MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_max_workers = DEFAULT_MAX_WORKERS
+_executor_lock = threading.Lock()
+
+
+def set_max_workers(max_workers: int) -> None:
+    """
+    Set the number of threads running blocking calls.
+
+    The current pool finishes its pending calls in the background; new calls
+    go to a new pool of ``max_workers`` threads.
+
+    :param int max_workers: Number of threads (default: number of CPUs, up to 8).
+    """
+    global _executor, _max_workers
+    if max_workers <= 0:
+        raise ValueError("max_workers must be positive: %d" % max_workers)
+    with _executor_lock:
+        _max_workers = max_workers
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def shutdown(wait: bool = True) -> None:
+    """
+    Shut down the thread pool. A new pool is created on the next call.
+
+    :param bool wait: Wait for the pending calls to finish.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_max_workers, thread_name_prefix="fontconfig-aio"
+            )
+        return _executor
+
+
+class _ReadWriteLock:
+    """Event loop lock shared by lookups and exclusive to rebuilds."""
+
+    def __init__(self) -> None:
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._waiters: List[asyncio.Future] = []
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def _wait(self) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        await waiter
+
+    async def acquire_read(self) -> None:
+        # Waiting writers go first, so that a stream of lookups cannot
+        # starve a rebuild.
+        while self._writer or self._writers_waiting:
+            await self._wait()
+        self._readers += 1
+
+    async def acquire_write(self) -> None:
+        self._writers_waiting += 1
+        try:
+            while self._writer or self._readers:
+                await self._wait()
+        finally:
+            self._writers_waiting -= 1
+            self._wake()
+        self._writer = True
+
+    def release_read(self) -> None:
+        self._readers -= 1
+        if self._readers == 0:
+            self._wake()
+
+    def release_write(self) -> None:
+        self._writer = False
+        self._wake()
+
+
+class _LoopState:
+    """In-flight calls and lock of an event loop."""
+
+    def __init__(self) -> None:
+        self.lock = _ReadWriteLock()
+        self.in_flight: Dict[Hashable, "_Flight"] = {}
+
+
+class _Flight:
+    """A call shared by the callers of identical requests."""
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_state(loop: asyncio.AbstractEventLoop) -> _LoopState:
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState()
+    return state
+
+
+def _freeze(value: Any) -> Any:
+    """Convert request arguments into a hashable key."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (tuple, builtins.list)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _make_key(*args: Any) -> Optional[Hashable]:
+    try:
+        key = _freeze(args)
+        hash(key)
+    except TypeError:
+        # Unhashable or unorderable arguments, e.g., CharSet values.
+        return None
+    return key
+
+
+async def _run(
+    loop: asyncio.AbstractEventLoop,
+    state: _LoopState,
+    func: Callable[[], Any],
+    exclusive: bool,
+) -> Any:
+    """Run a blocking call in the pool while holding the loop lock."""
+    if exclusive:
+        await state.lock.acquire_write()
+        release = state.lock.release_write
+    else:
+        await state.lock.acquire_read()
+        release = state.lock.release_read
+
+    try:
+        future = _get_executor().submit(func)
+    except BaseException:
+        release()
+        raise
+
+    def _done(_: Future) -> None:
+        # Hold the lock until the thread finishes, even if the caller was
+        # cancelled meanwhile.
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            pass  # The event loop is closed.
+
+    future.add_done_callback(_done)
+    return await asyncio.wrap_future(future)
+
+
+def _copy_font(font: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return None if font is None else dict(font)
+
+
+def _copy_fonts(fonts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(font) for font in fonts]
+
+
+async def _call(
+    key: Optional[Hashable],
+    func: Callable[[], Any],
+    exclusive: bool = False,
+    copy: Optional[Callable[[Any], Any]] = None,
+) -> Any:
+    """Run func, sharing the call with concurrent callers of the same key.
+
+    Each caller gets its own ``copy`` of the result, so that callers sharing
+    a call can modify their results.
+    """
+    loop = asyncio.get_running_loop()
+    state = _get_state(loop)
+    flight = state.in_flight.get(key) if key is not None else None
+    if flight is None:
+        flight = _Flight(loop.create_task(_run(loop, state, func, exclusive)))
+        if key is not None:
+            state.in_flight[key] = flight
+
+            def _forget(_: asyncio.Task, key: Hashable = key, flight: _Flight = flight) -> None:
+                if state.in_flight.get(key) is flight:
+                    del state.in_flight[key]
+
+            flight.task.add_done_callback(_forget)
+
+    flight.waiters += 1
+    try:
+        result = await asyncio.shield(flight.task)
+        return result if copy is None else copy(result)
+    except asyncio.CancelledError:
+        if flight.waiters == 1 and not flight.task.done():
+            # Later callers must not join the cancelled call.
+            if key is not None and state.in_flight.get(key) is flight:
+                del state.in_flight[key]
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+
+
+async def match(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    config: Optional[fontconfig.Config] = None,
+    cache: Optional[fontconfig.MatchCache] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Find the best matching font for a given pattern.
+
+    Awaitable version of :py:func:`fontconfig.match`.
+
+    Example::
+
+        font = await fontconfig.aio.match(":family=Arial:weight=200")
+
+    :param str pattern: Pattern string like ``":family=Arial:weight=200"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dict.
+    :param Optional[Config] config: Config instance (default: current config).
+    :param Optional[MatchCache] cache: Cache to look up and store the result in.
+    :return: Dict with selected properties, or None if no match.
+    """
+    select = tuple(select)
+    key = _make_key("match", pattern, properties, select, config, cache)
+    func = functools.partial(fontconfig.match, pattern, properties, select, config, cache)
+    return await _call(key, func, copy=_copy_font)
+
+
+async def sort(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[fontconfig.Config] = None,
+    cache: Optional[fontconfig.MatchCache] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Get a sorted list of fonts matching a pattern, ordered by quality.
+
+    Awaitable version of :py:func:`fontconfig.sort`.
+
+    Example::
+
+        fonts = await fontconfig.aio.sort(":lang=ja", select=("family", "file"))
+
+    :param str pattern: Pattern string like ``":family=Arial"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param bool trim: Remove fonts with no common charset.
+    :param Optional[Config] config: Config instance (default: current config).
+    :param Optional[MatchCache] cache: Cache to look up and store the result in.
+    :param Optional[int] limit: Maximum number of fonts to return (default: all).
+    :return: List of dicts with selected properties, sorted by match quality.
+    """
+    select = tuple(select)
+    key = _make_key("sort", pattern, properties, select, trim, config, cache, limit)
+    func = functools.partial(
+        fontconfig.sort, pattern, properties, select, trim, config, cache, limit
+    )
+    return await _call(key, func, copy=_copy_fonts)
+
+
+async def list(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family",),
+    config: Optional[fontconfig.Config] = None,
+) -> List[Dict[str, Any]]:
+    """
+    List all fonts matching a pattern.
+
+    Awaitable version of :py:func:`fontconfig.list`.
+
+    Example::
+
+        fonts = await fontconfig.aio.list(":lang=ja", select=("family", "file"))
+
+    :param str pattern: Pattern string like ``":lang=ja"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of dicts with selected properties.
+    """
+    select = tuple(select)
+    key = _make_key("list", pattern, properties, select, config)
+    func = functools.partial(fontconfig.list, pattern, properties, select, config)
+    return await _call(key, func, copy=_copy_fonts)
+
+
+def _rebuild(config: Optional[fontconfig.Config], dirs: tuple, files: tuple) -> bool:
+    if config is None:
+        config = fontconfig.Config.get_current()
+    if not dirs and not files:
+        return config.build_fonts()
+    result = True
+    for dirname in dirs:
+        result = config.app_font_add_dir(dirname) and result
+    for filename in files:
+        result = config.app_font_add_file(filename) and result
+    return result
+
+
+async def rebuild(
+    config: Optional[fontconfig.Config] = None,
+    dirs: Iterable[str] = (),
+    files: Iterable[str] = (),
+) -> bool:
+    """
+    Rebuild the font database, or add application fonts to it.
+
+    Without ``dirs`` and ``files``, this runs :py:meth:`Config.build_fonts`,
+    which rescans the font directories whose caches are stale. Otherwise,
+    this adds the given directories and files with
+    :py:meth:`Config.app_font_add_dir` and :py:meth:`Config.app_font_add_file`.
+    Lookups made through this module wait until the rebuild completes.
+
+    Example::
+
+        await fontconfig.aio.rebuild(dirs=["/srv/fonts/uploads"])
+
+    :param Optional[Config] config: Config instance (default: current config).
+    :param Iterable[str] dirs: Directories of application fonts to add.
+    :param Iterable[str] files: Application font files to add.
+    :return: True if all operations succeeded.
+    """
+    dirs = tuple(dirs)
+    files = tuple(files)
+    key = _make_key("rebuild", dirs, files, config)
+    func = functools.partial(_rebuild, config, dirs, files)
+    return await _call(key, func, exclusive=True)
@@ -1,11 +1,135 @@
 """Type stubs for fontconfig module"""
 
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, NamedTuple, Optional, Tuple, Union, overload
 
 def get_version() -> str:
     """Get fontconfig version."""
     ...
 
+def init(preload: bool = True) -> None:
+    """
+    Initialize fontconfig and load the default configuration.
+
+    Importing the package does not initialize fontconfig. The default
+    configuration and its font caches are loaded by the first call that needs
+    them, such as :py:meth:`Config.get_current` or :py:func:`match`. Call this
+    function to pay that cost upfront instead, e.g., when a service starts.
+    Calling it again has no effect other than the preload.
+
+    Example::
+
+        import fontconfig
+
+        fontconfig.init()
+
+    :param bool preload: Also read the patterns of all fonts, so that the
+        first lookups do not page in the font caches.
+    """
+    ...
+
+class CallStats(NamedTuple):
+    """Timings of one lookup call, such as :py:func:`match`.
+
+    Passed to the hooks registered with :py:func:`add_stats_hook`.
+    ``operation`` names the function called, as listed in
+    :py:func:`get_stats`, and ``elapsed`` is the wall time of the call in
+    seconds. ``phases`` maps the phases the call
+    went through, as named by :py:func:`get_stats`, to the seconds spent in
+    them. ``results`` is the number of fonts returned, and ``cache_hit``
+    tells whether the result came from a :py:class:`MatchCache`, or is None
+    for calls without a cache.
+    """
+
+    operation: str
+    elapsed: float
+    phases: Dict[str, float]
+    results: int
+    cache_hit: Optional[bool]
+
+def enable_stats(enabled: bool = True) -> None:
+    """
+    Turn the collection of lookup statistics on or off.
+
+    While enabled, :py:func:`match`, :py:func:`sort`, :py:func:`list`, their
+    batch and iterator variants, :py:func:`resolve_fallback`,
+    :py:class:`Query` and the matching, sorting, listing and substitution
+    methods of :py:class:`Config` record their latencies, and the hooks
+    registered with :py:func:`add_stats_hook` are called. Statistics are
+    disabled by default and then cost a single flag test per call.
+
+    :param bool enabled: Whether to collect statistics.
+    """
+    ...
+
+def reset_stats() -> None:
+    """Reset all counters and histograms returned by :py:func:`get_stats`."""
+    ...
+
+def get_stats() -> Dict[str, Any]:
+    """
+    Return the statistics collected since the last :py:func:`reset_stats`.
+
+    ``"calls"`` holds one entry per lookup helper: ``match``, ``sort`` and
+    ``list``, including the :py:class:`Query` methods, ``match_many``,
+    ``sort_many``, ``iter_list``, ``iter_sort`` and ``resolve_fallback``.
+    ``"phases"`` holds one entry per step of a lookup:
+
+    - ``parse``: parsing pattern strings (``FcNameParse``);
+    - ``substitute``: default and config substitutions;
+    - ``match``, ``sort`` and ``list``: the fontconfig lookups;
+    - ``convert``: building result dicts.
+
+    Phases are also recorded when :py:class:`Config` methods are called
+    directly. The batch helpers record a substitute and a match or sort
+    phase per unique request. The iterator calls only cover the lookup, and
+    their ``results`` count the fonts available to the iterator; the
+    conversion is recorded as one ``convert`` phase when the iterator is
+    exhausted or closed. Each entry has a ``count``, the ``total`` and ``max`` seconds,
+    and a ``histogram`` of ``(upper_bound_seconds, count)`` pairs with
+    doubling bounds from 1 microsecond. Call entries also count the
+    ``results`` returned and the ``cache_hits`` and ``cache_misses`` of
+    calls with a :py:class:`MatchCache`.
+
+    Example::
+
+        fontconfig.enable_stats()
+        ...
+        stats = fontconfig.get_stats()
+        print(stats["calls"]["match"]["count"], stats["phases"]["match"]["total"])
+
+    :return: Dict with ``enabled``, ``calls`` and ``phases`` entries.
+    """
+    ...
+
+def add_stats_hook(hook: Callable[[CallStats], None]) -> None:
+    """
+    Register a function called with a :py:class:`CallStats` after each call.
+
+    Hooks run in the calling thread after each call listed in
+    :py:func:`get_stats`, while statistics are enabled. Exceptions raised by a hook
+    propagate to the caller.
+
+    Example::
+
+        def export(call):
+            histogram.labels(call.operation).observe(call.elapsed)
+
+        fontconfig.add_stats_hook(export)
+        fontconfig.enable_stats()
+
+    :param Callable hook: Function taking a :py:class:`CallStats`.
+    """
+    ...
+
+def remove_stats_hook(hook: Callable[[CallStats], None]) -> None:
+    """
+    Unregister a hook added with :py:func:`add_stats_hook`.
+
+    :raises ValueError: If the hook is not registered.
+    """
+    ...
+
 class Blanks:
     """
     A Blanks object holds a list of Unicode chars which are expected to be
@@ -50,6 +174,22 @@ class Config:
         object_set = fontconfig.ObjectSet.create()
         object_set.add("family")
         fonts = config.font_list(pattern, object_set)
+
+    Thread safety:
+
+    Matching, sorting, listing, substitution and font database builds release
+    the GIL while libfontconfig works, so these calls run in parallel when
+    issued from multiple Python threads. Before releasing the GIL, each call
+    takes its own reference to the underlying ``FcConfig`` with
+    ``FcConfigReference``, so the configuration stays alive until the call
+    returns even if another thread replaces the current configuration.
+
+    A Config returned by :py:meth:`Config.get_current` does not own a
+    reference; obtain a fresh one after :py:meth:`set_current` instead of
+    keeping the old object around. Patterns passed to :py:meth:`substitute`
+    are modified in place and must not be shared between threads while doing
+    so. Avoid modifying a configuration (``app_font_*``, ``build_fonts``,
+    ``parse_and_load``) while other threads query it.
     """
     def __init__(self, ptr: int, owner: bool = True) -> None: ...
     @classmethod
@@ -118,8 +258,64 @@ class Config:
     def font_match(self, p: Pattern) -> Optional[Pattern]:
         """Return best font"""
         ...
-    def font_sort(self, p: Pattern, trim: bool) -> Optional[FontSet]:
-        """Return list of matching fonts"""
+    @overload
+    def font_sort(self, p: Pattern, trim: bool, coverage: Literal[False] = False) -> Optional[FontSet]:
+        """Return list of matching fonts
+
+        With ``coverage=True``, return a ``(fonts, charset)`` tuple where
+        ``charset`` is the union of the charsets of the returned fonts.
+        """
+        ...
+    @overload
+    def font_sort(
+        self, p: Pattern, trim: bool, coverage: Literal[True]
+    ) -> Tuple[Optional[FontSet], Optional[CharSet]]: ...
+    def font_set_match(self, sets: Union[FontSet, Iterable[FontSet]], p: Pattern) -> Optional[Pattern]:
+        """Return best font from the given font sets.
+
+        Like :py:meth:`font_match`, but only fonts in ``sets`` are considered.
+        The pattern should be substituted first, as for :py:meth:`font_match`.
+
+        Example::
+
+            # Build a curated catalog once...
+            catalog = fontconfig.FontSet.create()
+            for font in config.get_fonts():
+                if font.get("family") in ("Noto Sans", "Noto Serif"):
+                    catalog.add(font)
+
+            # ...and match every request against it.
+            pattern = fontconfig.Pattern.parse(":family=serif:weight=200")
+            pattern.default_substitute()
+            config.substitute(pattern)
+            font = config.font_set_match(catalog, pattern)
+        """
+        ...
+    @overload
+    def font_set_sort(
+        self,
+        sets: Union[FontSet, Iterable[FontSet]],
+        p: Pattern,
+        trim: bool,
+        coverage: Literal[False] = False,
+    ) -> Optional[FontSet]:
+        """Return list of matching fonts from the given font sets
+
+        See :py:meth:`font_sort` for the ``coverage`` argument.
+        """
+        ...
+    @overload
+    def font_set_sort(
+        self,
+        sets: Union[FontSet, Iterable[FontSet]],
+        p: Pattern,
+        trim: bool,
+        coverage: Literal[True],
+    ) -> Tuple[Optional[FontSet], Optional[CharSet]]: ...
+    def font_set_list(
+        self, sets: Union[FontSet, Iterable[FontSet]], pattern: Pattern, object_set: ObjectSet
+    ) -> FontSet:
+        """List fonts from the given font sets"""
         ...
     def font_render_prepare(self, p: Pattern, font: Pattern) -> Pattern:
         """Prepare pattern for loading font file"""
@@ -162,17 +358,55 @@ class CharSet:
         ...
     @classmethod
     def from_codepoints(cls, codepoints: Iterable[int]) -> CharSet:
-        """Create charset from iterable of Unicode codepoints."""
+        """Create charset from iterable of Unicode codepoints.
+
+        Buffers of 32-bit integers, such as ``array('I')`` or a NumPy
+        ``uint32`` array, are read directly without per-item conversion.
+        """
+        ...
+    @classmethod
+    def from_bytes(cls, data: bytes) -> CharSet:
+        """Create charset from the output of :py:meth:`to_bytes`."""
         ...
     def copy(self) -> CharSet:
         """Create a copy of this charset."""
         ...
+    def to_bytes(self) -> bytes:
+        """Serialize the charset as page bitmaps.
+
+        The format is ``b"FcCS"``, the number of pages, then for each page its
+        base codepoint and 256-bit bitmap, all as little-endian 32-bit words.
+        """
+        ...
+    def iter_pages(self) -> Iterator[Tuple[int, bytes]]:
+        """Iterate over non-empty pages of 256 codepoints.
+
+        Yields ``(base, bitmap)`` pairs, where bit ``j`` of byte ``k`` of the
+        32-byte ``bitmap`` is set when codepoint ``base + 8 * k + j`` is in
+        the charset.
+        """
+        ...
+    def iter_ranges(self) -> Iterator[Tuple[int, int]]:
+        """Iterate over runs of consecutive codepoints.
+
+        Yields inclusive ``(start, end)`` pairs in ascending order.
+        """
+        ...
     def add(self, item: object) -> bool:
         """Add a character to the charset."""
         ...
     def discard(self, item: object) -> bool:
         """Remove a character from the charset if present."""
         ...
+    def update(self, chars: object) -> None:
+        """Add many characters to the charset."""
+        ...
+    def has_chars(self, chars: object) -> bytes:
+        """Check many characters at once, returning one byte per character."""
+        ...
+    def first_missing(self, chars: object) -> int:
+        """Return the index of the first character not in the charset, or -1."""
+        ...
     def __len__(self) -> int:
         """Return the number of characters in the charset."""
         ...
@@ -185,10 +419,166 @@ class CharSet:
     def __eq__(self, other: object) -> bool:
         """Check if two charsets are equal."""
         ...
+    def __le__(self, other: object) -> bool:
+        """Check if every character is also in other."""
+        ...
+    def __ge__(self, other: object) -> bool:
+        """Check if every character of other is also in this charset."""
+        ...
+    def __lt__(self, other: object) -> bool:
+        """Check if this is a proper subset of other."""
+        ...
+    def __gt__(self, other: object) -> bool:
+        """Check if this is a proper superset of other."""
+        ...
+    def __or__(self, other: CharSet) -> CharSet:
+        """Return the union of two charsets."""
+        ...
+    def __and__(self, other: CharSet) -> CharSet:
+        """Return the intersection of two charsets."""
+        ...
+    def __sub__(self, other: CharSet) -> CharSet:
+        """Return the characters not in other."""
+        ...
+    def __ior__(self, other: CharSet) -> CharSet:
+        """Add all characters of other in place."""
+        ...
+    def intersection_count(self, other: object) -> int:
+        """Return the number of characters also in other."""
+        ...
+    def missing_count(self, other: object) -> int:
+        """Return the number of characters of other not in this charset."""
+        ...
     def __repr__(self) -> str:
         """Return string representation for debugging."""
         ...
 
+class LangSet:
+    """A LangSet is a set of language tags, such as the languages a font supports.
+
+    The ``lang`` property of patterns is returned as a LangSet, which keeps
+    the native set and only builds language strings when iterated.
+
+    Example::
+
+        font = fontconfig.match(":family=sans-serif", select=("family", "lang"))
+        langs = font["lang"]
+        if "ja" in langs:
+            print("Supports Japanese")
+        print(len(langs), [lang for lang in langs])
+
+        # Create from language tags
+        langs = fontconfig.LangSet.from_langs(["en", "fr"])
+    """
+    def __init__(self, ptr: int) -> None: ...
+    @classmethod
+    def create(cls) -> LangSet:
+        """Create an empty langset"""
+        ...
+    @classmethod
+    def from_langs(cls, langs: Iterable[str]) -> LangSet:
+        """Create a langset from language tags"""
+        ...
+    def copy(self) -> LangSet:
+        """Copy a langset"""
+        ...
+    @classmethod
+    def from_bytes(cls, data: bytes) -> LangSet:
+        """Create a langset from the output of :py:meth:`to_bytes`."""
+        ...
+    def to_bytes(self) -> bytes:
+        """Serialize the langset in a compact binary format."""
+        ...
+    def __contains__(self, lang: object) -> bool:
+        """Check if the langset has exactly the language tag.
+
+        Example::
+            if "en" in langset:
+                print("Has English")
+        """
+        ...
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over language tags."""
+        ...
+    def __len__(self) -> int:
+        """Return the number of language tags."""
+        ...
+    def __eq__(self, other: object) -> bool:
+        """Check if two langsets are equal.
+
+        A langset also compares equal to a list of the same tags, in any
+        order. Other containers compare unequal, as they hash differently.
+        """
+        ...
+    def __hash__(self) -> int: ...
+    def has_lang(self, lang: str) -> str:
+        """Check how well the langset supports a language tag.
+
+        Return ``"equal"`` if the langset has the tag, ``"different_territory"``
+        if it has the language with another or no territory, and
+        ``"different_lang"`` otherwise.
+        """
+        ...
+    def compare(self, other: LangSet) -> str:
+        """Compare the languages of two langsets.
+
+        Return ``"equal"`` if they share a language tag, ``"different_territory"``
+        if they only share a language with different territories, and
+        ``"different_lang"`` otherwise.
+        """
+        ...
+    def __le__(self, other: object) -> bool:
+        """Check if other covers every language of this langset.
+
+        A tag without territory covers the same language with any territory.
+        """
+        ...
+    def __ge__(self, other: object) -> bool:
+        """Check if this langset covers every language of other."""
+        ...
+    def __lt__(self, other: object) -> bool:
+        """Check if other covers this langset and more."""
+        ...
+    def __gt__(self, other: object) -> bool:
+        """Check if this langset covers other and more."""
+        ...
+    def __or__(self, other: object) -> LangSet:
+        """Return the union of two langsets."""
+        ...
+    def __sub__(self, other: object) -> LangSet:
+        """Return the language tags not in other."""
+        ...
+    def __and__(self, other: object) -> LangSet:
+        """Return the language tags in both langsets."""
+        ...
+    def __repr__(self) -> str: ...
+
+def lang_charset(lang: str) -> Optional[CharSet]:
+    """
+    Return the characters of the orthography of a language.
+
+    The charset is the one fontconfig uses to decide whether a font supports
+    the language.
+
+    Example::
+
+        charset = fontconfig.lang_charset("ja")
+        print(f"{len(charset)} characters")
+
+    :param str lang: Language tag like ``"ja"`` or ``"zh-tw"``.
+    :return: CharSet of the orthography, or None if the language is unknown.
+    """
+    ...
+
+def normalize_lang(lang: str) -> Optional[str]:
+    """
+    Normalize a language tag, e.g., ``"ja_JP.UTF-8"`` to ``"ja"``.
+
+    :param str lang: Language tag or locale name.
+    :return: Normalized tag, or None if the tag is invalid.
+    """
+    ...
+
 class Pattern:
     """A Pattern is an opaque type that holds both patterns to match against
     the available fonts, as well as the information about each font.
@@ -214,6 +604,19 @@ class Pattern:
         """Copy a pattern"""
         ...
     @classmethod
+    def from_bytes(cls, data: bytes) -> Pattern:
+        """Create a pattern from the output of :py:meth:`to_bytes`."""
+        ...
+    def to_bytes(self) -> bytes:
+        """Serialize the pattern in a compact binary format.
+
+        Unlike :py:meth:`unparse`, all values are kept, including charsets,
+        langsets and value bindings. Object names and strings are stored once
+        in a string table, and charsets as page bitmaps. Patterns are also
+        picklable through this format.
+        """
+        ...
+    @classmethod
     def parse(cls, name: str) -> Pattern:
         """Parse a pattern string"""
         ...
@@ -232,9 +635,50 @@ class Pattern:
     def add(self, key: str, value: object, append: bool = True) -> bool:
         """Add a value to a pattern"""
         ...
-    def get(self, key: str, index: int = 0) -> Any:
-        """Return a value from a pattern"""
+    def get(self, key: str, index: int = 0, default: Any = ...) -> Any:
+        """Return a value from a pattern
+
+        Raise KeyError if the property or index is missing, unless a
+        ``default`` is given, which is then returned instead.
+        """
         ...
+    def get_string(self, key: str, index: int = 0, default: Optional[str] = None) -> Optional[str]:
+        """Return a string value, or ``default`` if missing
+
+        Raise TypeError if the value is not a string.
+        """
+        ...
+    def get_int(self, key: str, index: int = 0, default: Optional[int] = None) -> Optional[int]:
+        """Return an integer value, or ``default`` if missing
+
+        Double values are truncated. Raise TypeError for other types.
+        """
+        ...
+    def get_double(self, key: str, index: int = 0, default: Optional[float] = None) -> Optional[float]:
+        """Return a double value, or ``default`` if missing
+
+        Integer values are converted. Raise TypeError for other types.
+        """
+        ...
+    def get_bool(self, key: str, index: int = 0, default: Optional[bool] = None) -> Optional[bool]:
+        """Return a boolean value, or ``default`` if missing
+
+        Raise TypeError if the value is not a boolean.
+        """
+        ...
+    def to_dict(self, select: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Return the first value of each property as a dict
+
+        With ``select``, only the given properties are included, and missing
+        ones are skipped. Unlike ``dict(pattern)``, values are not lists.
+
+        Example::
+
+            fonts = config.font_list(pattern, object_set)
+            rows = [font.to_dict(("family", "file", "weight")) for font in fonts]
+        """
+        ...
+    def __contains__(self, key: object) -> bool: ...
     def delete(self, key: str) -> bool:
         """Delete a property from a pattern"""
         ...
@@ -311,6 +755,25 @@ class FontSet:
     def create(cls) -> FontSet:
         """Create a FontSet"""
         ...
+    @classmethod
+    def from_buffer(cls, buffer: Any, name: str = "") -> FontSet:
+        """Create a FontSet of all faces of font data in memory.
+
+        See :py:func:`query_bytes`.
+        """
+        ...
+    @classmethod
+    def from_bytes(cls, data: bytes) -> FontSet:
+        """Create a FontSet from the output of :py:meth:`to_bytes`."""
+        ...
+    def to_bytes(self) -> bytes:
+        """Serialize the font set in a compact binary format.
+
+        See :py:meth:`Pattern.to_bytes`. The string table is shared by all
+        patterns, so repeated object names, families and styles are stored
+        once. Font sets are also picklable through this format.
+        """
+        ...
     def add(self, pattern: Pattern) -> bool:
         """Add to a font set"""
         ...
@@ -321,12 +784,471 @@ class FontSet:
     def __repr__(self) -> str: ...
     def __len__(self) -> int: ...
     def __getitem__(self, index: int) -> Pattern: ...
+    def filter_by_lang(self, langs: Union[LangSet, Iterable[str]]) -> FontSet:
+        """Return the fonts supporting all of the given languages.
+
+        The ``lang`` property of each font is checked in one pass without the
+        GIL, with :py:meth:`LangSet.__ge__` semantics. Fonts without a ``lang``
+        property are skipped, so include ``lang`` when listing fonts.
+
+        Example::
+
+            fonts = config.get_fonts()
+            for font in fonts.filter_by_lang(["ja", "ko", "zh-cn"]):
+                print(font.get("family"))
+
+        :param langs: LangSet or language tags.
+        :return: New FontSet sharing the matching patterns.
+        """
+        ...
+    def to_columns(self, select: Iterable[str] = ("family", "file", "style")) -> Dict[str, Column]:
+        """Export properties as typed columns, one entry per font.
+
+        Only the first value of each property is exported. See
+        :py:class:`Column` for the layout of each kind.
+
+        Example::
+
+            columns = font_set.to_columns(("family", "slant", "weight"))
+            slants = numpy.frombuffer(columns["slant"].data, dtype="i8")
+            weights = numpy.frombuffer(columns["weight"].data, dtype="f8").reshape(-1, 2)
+        """
+        ...
+
+class Column(NamedTuple):
+    """A property of a :py:class:`FontSet` as contiguous arrays.
+
+    ``kind`` is one of:
+
+    - ``"int"``: ``data`` is an ``array('q')``
+    - ``"double"``: ``data`` is an ``array('d')``
+    - ``"bool"``: ``data`` is an ``array('B')`` of 0 or 1
+    - ``"range"``: ``data`` is an ``array('d')`` of ``begin, end`` pairs
+    - ``"string"``: ``data`` is UTF-8 ``bytes`` and value ``i`` is
+      ``data[offsets[i]:offsets[i + 1]]``
+
+    ``valid`` holds one byte per font, 0 where the font lacks the property.
+    All arrays support the buffer protocol, e.g., ``numpy.frombuffer``.
+    """
+
+    kind: str
+    data: Union[array.array, bytes]
+    offsets: Optional[array.array]
+    valid: bytes
+
+    def to_pylist(self) -> List[Any]:
+        """Convert to a list of Python values, with None for missing ones."""
+        ...
+
+class MatchCache:
+    """
+    LRU cache of :py:func:`match` and :py:func:`sort` results.
+
+    Results are keyed on the requested pattern (compared with
+    ``FcPatternHash`` and ``FcPatternEqual``), the ``select`` properties and
+    the config. The cache drops all entries when the font sets of a config
+    change, for example after :py:meth:`Config.app_font_add_dir` or
+    :py:meth:`Config.build_fonts`, when a config is freed or replaced with
+    :py:meth:`Config.set_current`, since a new config may then reuse its
+    address, or when :py:meth:`Config.upto_date` starts reporting stale
+    configuration files. The latter check touches the file
+    system and runs at most once every ``check_interval`` seconds.
+
+    A cache is thread-safe and can be shared between threads.
+
+    Example::
+
+        cache = fontconfig.MatchCache(maxsize=4096)
+        for text_run in document:
+            font = fontconfig.match(text_run.pattern, cache=cache)
+        print(cache.stats())
+
+    :param int maxsize: Maximum number of cached results.
+    :param float check_interval: Seconds between :py:meth:`Config.upto_date` checks.
+    """
+    maxsize: int
+    check_interval: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    def __init__(self, maxsize: int = 1024, check_interval: float = 1.0) -> None: ...
+    def __len__(self) -> int: ...
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics"""
+        ...
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss, eviction and invalidation counts"""
+        ...
+
+class Cache:
+    """A cache of the fonts in one directory.
+
+    Caches are normally maintained by :py:meth:`Config.build_fonts`. This
+    class reads, validates and rebuilds them explicitly, e.g., to pre-build
+    caches while building a container image, so that the first lookup at
+    runtime does not scan any font file.
+
+    Example::
+
+        # Load the cache of a directory, building it if missing or stale
+        cache = fontconfig.Cache.read("/usr/share/fonts/truetype")
+        print(cache.dir, cache.num_font, cache.subdirs)
+
+        # Fonts of the directory, without building the font database
+        fonts = cache.get_fonts()
+
+        if not fontconfig.Cache.is_valid("/opt/fonts"):
+            fontconfig.Cache.read("/opt/fonts", force=True)
+    """
+    def __init__(self, ptr: int) -> None: ...
+    @classmethod
+    def load(cls, dir: str, config: Optional[Config] = None) -> Optional[Cache]:
+        """Load the cache of a directory, or None if there is no valid cache"""
+        ...
+    @classmethod
+    def read(
+        cls, dir: str, force: bool = False, config: Optional[Config] = None
+    ) -> Optional[Cache]:
+        """Load the cache of a directory, scanning the directory and writing
+        the cache if it is missing or stale, or if ``force`` is True.
+
+        Return None if the directory cannot be scanned.
+        """
+        ...
+    @classmethod
+    def rescan(cls, dir: str, config: Optional[Config] = None) -> Optional[Cache]:
+        """Rescan a directory and update its existing cache.
+
+        Return None if the directory has no cache or cannot be scanned.
+        """
+        ...
+    @staticmethod
+    def is_valid(dir: str) -> bool:
+        """Check whether a directory has a valid cache"""
+        ...
+    @staticmethod
+    def clean(cache_dir: str, verbose: bool = False) -> bool:
+        """Remove invalid and stale cache files from a cache directory"""
+        ...
+    @staticmethod
+    def unlink(dir: str, config: Optional[Config] = None) -> bool:
+        """Remove the cache files of a directory"""
+        ...
+    @property
+    def dir(self) -> str:
+        """Directory of the cache"""
+        ...
+    @property
+    def num_font(self) -> int:
+        """Number of fonts in the cache"""
+        ...
+    @property
+    def subdirs(self) -> List[str]:
+        """Subdirectories of the cached directory"""
+        ...
+    def get_fonts(self) -> FontSet:
+        """Return the fonts in the cache"""
+        ...
+    def __len__(self) -> int: ...
+    def __repr__(self) -> str: ...
+
+def build_caches(
+    dirs: Optional[Iterable[str]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    progress: Optional[Callable[[str, int], None]] = None,
+    config: Optional[Config] = None,
+) -> Dict[str, int]:
+    """
+    Build the caches of font directories and their subdirectories in parallel.
+
+    Directories are read with :py:meth:`Cache.read` on a pool of threads,
+    which scans fonts and writes the caches without holding the GIL.
+    Subdirectories found in a cache are queued as soon as it is read.
+    fontconfig writes each cache file atomically, so readers never see a
+    partial cache. Directories with a valid cache are not scanned again
+    unless ``force`` is True.
+
+    Example::
+
+        # Pre-build the caches of all configured font directories
+        counts = fontconfig.build_caches(workers=8)
+        print(sum(counts.values()), "fonts in", len(counts), "directories")
+
+        # Report progress
+        fontconfig.build_caches(["/opt/fonts"], progress=lambda d, n: print(d, n))
+
+    :param Optional[Iterable[str]] dirs: Directories to cache (default: font directories of the config).
+    :param Optional[int] workers: Number of worker threads (default: number of CPUs).
+    :param bool force: Rescan directories even if their caches are valid.
+    :param progress: Called as ``progress(dir, num_font)`` in the calling thread after each directory.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Dict mapping each cached directory to its number of fonts.
+    """
+    ...
+
+@overload
+def query_file(path: str, index: None = None) -> FontSet:
+    """
+    Read the font properties of a font file, without adding it to a config.
+
+    With ``index=None``, return a :py:class:`FontSet` of all faces in the
+    file, including the faces of font collections and the named instances
+    of variable fonts. The set is empty if the file is not a font.
+
+    With an integer ``index``, return the :py:class:`Pattern` of that face,
+    or None if there is no such face. The lower 16 bits select the face and
+    the upper bits the named instance plus one, as in the ``index`` property.
+
+    Example::
+
+        fonts = fontconfig.query_file("/path/to/NotoSansCJK.ttc")
+        for font in fonts:
+            print(font.get("family"), font.get("index"))
+
+        first = fontconfig.query_file("/path/to/font.ttf", index=0)
+
+    :param str path: Path to the font file.
+    :param Optional[int] index: Face index, or None for all faces.
+    :return: FontSet of all faces, or Pattern of one face.
+    """
+    ...
+@overload
+def query_file(path: str, index: int) -> Optional[Pattern]: ...
+
+def query_files(paths: Iterable[str], workers: Optional[int] = None) -> List[FontSet]:
+    """
+    Read the font properties of many font files in parallel.
+
+    Files are queried with :py:func:`query_file` on a pool of threads, which
+    parse the files without holding the GIL. No config is modified.
+
+    Example::
+
+        for path, fonts in zip(uploads, fontconfig.query_files(uploads, workers=8)):
+            if len(fonts) == 0:
+                print("Not a font:", path)
+
+    :param Iterable[str] paths: Paths to font files.
+    :param Optional[int] workers: Number of worker threads (default: number of CPUs).
+    :return: FontSet of all faces of each file, in input order.
+    """
+    ...
+
+@overload
+def query_bytes(buffer: Any, name: str = "", index: None = None) -> FontSet:
+    """
+    Read the font properties of font data in memory, without a file.
+
+    This is :py:func:`query_file` for fonts held as bytes, e.g., uploads read
+    from object storage. ``bytes`` are parsed in place; other buffers, such as
+    ``bytearray`` or ``memoryview``, are copied once. The ``file`` property of
+    the patterns is set to ``name``, or left unset if ``name`` is empty.
+
+    Example::
+
+        data = blob.download()
+        fonts = fontconfig.query_bytes(data, name="uploads/MyFont.ttf")
+        for font in fonts:
+            print(font.get("family"), font.get("style"), font.get("variable"))
+
+    Fonts in memory cannot be added to a :py:class:`Config` as application
+    fonts; match against the returned set with :py:meth:`Config.font_set_match`
+    instead.
+
+    :param buffer: Font data as bytes or an object supporting the buffer protocol.
+    :param str name: Value of the ``file`` property, or empty for none.
+    :param Optional[int] index: Face index, or None for all faces.
+    :return: FontSet of all faces, or Pattern of one face.
+    """
+    ...
+@overload
+def query_bytes(buffer: Any, name: str = "", *, index: int) -> Optional[Pattern]: ...
+@overload
+def query_bytes(buffer: Any, name: str, index: int) -> Optional[Pattern]: ...
+
+class CoverageIndex:
+    """Index of the characters covered by a set of fonts.
+
+    The index maps each Unicode page (256 codepoints) to a bitmap of the fonts
+    having characters on the page, plus the per-font character bitmaps of the
+    page. Finding the fonts that cover a text is then a few bitmap operations
+    per page of the text, instead of a charset lookup per font and character.
+
+    The index is a snapshot: rebuild it when the fonts of the config change,
+    e.g., after :py:meth:`Config.app_font_add_dir`.
+
+    Example::
+
+        index = fontconfig.CoverageIndex.from_config()
+        index.save("coverage.idx")
+
+        index = fontconfig.CoverageIndex.load("coverage.idx")
+        for font in index.covering("こんにちは"):
+            print(font["family"], font["file"])
+        for font, count in index.best("Hello, 世界", n=3):
+            print(font["family"], count)
+    """
+    def __init__(self) -> None: ...
+    @classmethod
+    def build(
+        cls, font_set: FontSet, select: Iterable[str] = ("family", "style", "file", "index")
+    ) -> CoverageIndex:
+        """Build an index of fonts in a font set.
+
+        Fonts are identified by their position in the set. ``select`` lists
+        the properties kept for each font and returned by queries.
+        """
+        ...
+    @classmethod
+    def from_config(
+        cls,
+        config: Optional[Config] = None,
+        select: Iterable[str] = ("family", "style", "file", "index"),
+    ) -> CoverageIndex:
+        """Build an index of all fonts of a config (default: current config)."""
+        ...
+    @property
+    def fonts(self) -> List[Dict[str, Any]]:
+        """Properties of the indexed fonts, in font id order."""
+        ...
+    def __len__(self) -> int: ...
+    def __repr__(self) -> str: ...
+    def covering(self, text: object) -> List[Dict[str, Any]]:
+        """Return the fonts that cover all characters of a text.
+
+        ``text`` is a string or anything :py:meth:`CharSet.update` accepts.
+        """
+        ...
+    def best(self, text: object, n: int = 10) -> List[Tuple[Dict[str, Any], int]]:
+        """Return up to ``n`` fonts covering the most characters of a text.
+
+        Returns ``(font, count)`` pairs by decreasing count, where ``count`` is
+        the number of distinct characters of ``text`` the font covers. Fonts
+        covering none of them are omitted.
+        """
+        ...
+    def save(self, path: str) -> None:
+        """Write the index to a file.
+
+        Font properties are stored as JSON, so they should be JSON-compatible
+        or :py:class:`LangSet` values, which are stored as lists of tags.
+        """
+        ...
+    @classmethod
+    def load(cls, path: str) -> CoverageIndex:
+        """Read an index written by :py:meth:`save`."""
+        ...
+
+class Snapshot:
+    """Read-only font database in a memory-mapped file.
+
+    :py:meth:`export` writes the fonts of a config, with their charsets and
+    langsets, and an index of family names into a single file. Worker
+    processes :py:meth:`open` the file with ``mmap`` and query it in place, so
+    they share the physical pages instead of each holding a converted copy.
+    Fonts are only decoded into patterns when a query looks at them.
+
+    :py:meth:`match` substitutes the request with a config as
+    :py:func:`match` does. fontconfig ranks fonts of the strongly bound
+    families of the substituted request, those named in the request and their
+    ``binding="same"`` aliases, above all other fonts, so only these fonts are
+    scored, unless the best of them misses a property that fontconfig ranks
+    above the family, such as ``charset`` or ``variable``. Families added
+    with the default weak binding, such as the fallbacks of ``sans-serif``,
+    rank below ``lang``, so requests without a strongly bound family in the
+    snapshot score all fonts. These are decoded once on first use and kept
+    until the snapshot is freed. The result is the same as
+    :py:meth:`Config.font_set_match` on all exported fonts.
+
+    Example::
+
+        # Before forking workers
+        fontconfig.Snapshot.export("/var/cache/app/fonts.snapshot")
+
+        # In each worker
+        snapshot = fontconfig.Snapshot.open("/var/cache/app/fonts.snapshot")
+        font = snapshot.match(":family=sans-serif:weight=200")
+        fonts = snapshot.list(family="DejaVu Sans", select=("style", "file"))
+    """
+
+    def __init__(self) -> None: ...
+    @staticmethod
+    def export(path: str, config: Optional[Config] = None, font_set: Optional[FontSet] = None) -> None:
+        """Write a snapshot of fonts to a file.
+
+        The snapshot holds the fonts of ``font_set``, or the system and
+        application fonts of ``config`` (default: current config). The file is
+        written under a temporary name and renamed, so that readers never see
+        a partial snapshot.
+
+        :param str path: Snapshot file to write.
+        :param Optional[Config] config: Config whose fonts to write.
+        :param Optional[FontSet] font_set: Fonts to write instead of those of a config.
+        """
+        ...
+    @staticmethod
+    def open(path: str) -> Snapshot:
+        """Map a snapshot file written by :py:meth:`export`.
+
+        :param str path: Snapshot file.
+        :return: Snapshot reading the mapped file.
+        """
+        ...
+    def close(self) -> None:
+        """Unmap the snapshot. Results returned earlier stay valid."""
+        ...
+    def __enter__(self) -> Snapshot: ...
+    def __exit__(self, *args: Any) -> None: ...
+    def __len__(self) -> int: ...
+    def __repr__(self) -> str: ...
+    def __getitem__(self, index: int) -> Pattern:
+        """Decode a font into a new pattern."""
+        ...
+    def families(self) -> List[str]:
+        """Return the family names of the fonts, ordered by folded name."""
+        ...
+    def list(
+        self,
+        family: Optional[str] = None,
+        style: Optional[str] = None,
+        select: Iterable[str] = ("family",),
+    ) -> List[Dict[str, Any]]:
+        """List the fonts of a family and style.
+
+        Names are compared ignoring case and blanks, as fontconfig does.
+        Family lookups use the index of the snapshot; only the fonts of the
+        family are decoded.
+
+        :param Optional[str] family: Family name (default: all fonts).
+        :param Optional[str] style: Style name (default: all styles).
+        :param Iterable[str] select: Properties to include in result dicts.
+        :return: List of dicts with selected properties.
+        """
+        ...
+    def match(
+        self,
+        pattern: str = "",
+        properties: Optional[Dict[str, Any]] = None,
+        select: Iterable[str] = ("family", "file", "style"),
+        config: Optional[Config] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Find the best matching font of the snapshot for a given pattern.
+
+        See :py:func:`match` for the arguments. ``config`` is used for
+        substitutions only; the fonts come from the snapshot.
+
+        :return: Dict with selected properties, or None if no match.
+        """
+        ...
 
 def match(
     pattern: str = "",
     properties: Optional[Dict[str, Any]] = None,
     select: Iterable[str] = ("family", "file", "style"),
     config: Optional[Config] = None,
+    cache: Optional[MatchCache] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     Find the best matching font for a given pattern.
@@ -347,10 +1269,15 @@ def match(
         # Custom properties to return
         font = fontconfig.match(":family=Arial", select=("family", "file", "weight"))
 
+        # Reuse results of repeated requests
+        cache = fontconfig.MatchCache()
+        font = fontconfig.match(":family=Arial", cache=cache)
+
     :param str pattern: Pattern string like ``":family=Arial:weight=200"``.
     :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
     :param Iterable[str] select: Properties to include in result dict.
     :param Optional[Config] config: Config instance (default: current config).
+    :param Optional[MatchCache] cache: Cache to look up and store the result in.
     :return: Dict with selected properties, or None if no match.
     """
     ...
@@ -361,6 +1288,8 @@ def sort(
     select: Iterable[str] = ("family", "file", "style"),
     trim: bool = True,
     config: Optional[Config] = None,
+    cache: Optional[MatchCache] = None,
+    limit: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     Get a sorted list of fonts matching a pattern, ordered by quality.
@@ -381,15 +1310,102 @@ def sort(
         # Without trimming (include all fonts even with no common charset)
         fonts = fontconfig.sort(":family=Arial", trim=False)
 
+        # Only convert the 5 best matches
+        fonts = fontconfig.sort(":family=Arial", limit=5)
+
     :param str pattern: Pattern string like ``":family=Arial"``.
     :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
     :param Iterable[str] select: Properties to include in result dicts.
     :param bool trim: Remove fonts with no common charset.
     :param Optional[Config] config: Config instance (default: current config).
+    :param Optional[MatchCache] cache: Cache to look up and store the result in.
+    :param Optional[int] limit: Maximum number of fonts to return (default: all).
     :return: List of dicts with selected properties, sorted by match quality.
     """
     ...
 
+def match_many(
+    patterns: Iterable[Union[str, Dict[str, Any], Pattern]],
+    select: Iterable[str] = ("family", "file", "style"),
+    config: Optional[Config] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Find the best matching font for each of many patterns.
+
+    Equivalent to calling :py:func:`match` for every pattern, but identical
+    requests are resolved only once and the substitution and matching of all
+    requests runs in a single loop without the GIL.
+
+    Example::
+
+        runs = [":family=Arial", {"family": "Noto Sans", "lang": ["ja"]}]
+        fonts = fontconfig.match_many(runs, select=("family", "file"))
+        for run, font in zip(runs, fonts):
+            print(run, font["file"] if font else None)
+
+    :param patterns: Pattern strings, property dicts or Pattern objects.
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of dicts with selected properties (or None if no match), in
+        input order.
+    """
+    ...
+
+def sort_many(
+    patterns: Iterable[Union[str, Dict[str, Any], Pattern]],
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[Config] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Get sorted font lists for many patterns.
+
+    Equivalent to calling :py:func:`sort` for every pattern, but identical
+    requests are resolved only once and the substitution and sorting of all
+    requests runs in a single loop without the GIL.
+
+    Example::
+
+        fallbacks = fontconfig.sort_many([":lang=ja", ":lang=ar"], select=("family",))
+
+    :param patterns: Pattern strings, property dicts or Pattern objects.
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param bool trim: Remove fonts with no common charset.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of sorted font lists, in input order.
+    """
+    ...
+
+def resolve_fallback(
+    text: str,
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    config: Optional[Config] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Find the fonts needed to render a text, in fallback order.
+
+    Walks the :py:func:`sort` result for the pattern and keeps each font that
+    covers a character of ``text`` not covered by an earlier font, stopping
+    as soon as every character is covered. Characters that no font supports
+    are ignored.
+
+    Example::
+
+        fonts = fontconfig.resolve_fallback("Hello, 世界! 🎉", ":family=sans-serif")
+        for font in fonts:
+            print(font["family"], font["file"])
+
+    :param str text: Text to render.
+    :param str pattern: Pattern string like ``":family=Arial"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of dicts with selected properties, in fallback order.
+    """
+    ...
+
 def list(
     pattern: str = "",
     properties: Optional[Dict[str, Any]] = None,
@@ -481,6 +1497,150 @@ def list(
     """
     ...
 
+def iter_list(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family",),
+    config: Optional[Config] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the fonts matching a pattern.
+
+    Like :py:func:`list`, but results are converted one at a time as the
+    iterator advances, so the first font is available without building every
+    dict, and consumed dicts can be freed early. The lookup itself runs when
+    this function is called.
+
+    Example::
+
+        for font in fontconfig.iter_list(select=("family", "file")):
+            inventory.write(font)
+
+    :param str pattern: Pattern string like ``":lang=ja"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Iterator of dicts with selected properties.
+    """
+    ...
+
+def iter_sort(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[Config] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the fonts matching a pattern, best matches first.
+
+    Like :py:func:`sort`, but results are converted one at a time as the
+    iterator advances. Stop iterating once enough fonts are found; the
+    remaining fonts are never converted. The sort itself runs when this
+    function is called.
+
+    Example::
+
+        for font in fontconfig.iter_sort(":lang=ja", trim=False):
+            if is_acceptable(font):
+                break
+
+    :param str pattern: Pattern string like ``":family=Arial"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param bool trim: Remove fonts with no common charset.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Iterator of dicts with selected properties, sorted by match quality.
+    """
+    ...
+
+class Query:
+    """A match, sort or list request prepared for repeated execution.
+
+    Created by :py:func:`prepare`. The pattern is parsed and substituted once,
+    and the ``select`` properties are resolved once, so executing the query
+    only runs the match, sort or list step and the conversion of the results.
+
+    Keyword arguments to :py:meth:`match`, :py:meth:`sort` and :py:meth:`list`
+    replace properties of the prepared pattern for one call, e.g.,
+    ``query.match(weight=200)``. Such calls substitute the modified pattern
+    again.
+
+    A query is bound to the config it was prepared with, and reflects the
+    configuration rules at that time. It can be shared between threads.
+
+    Example::
+
+        query = fontconfig.prepare(":lang=ja", select=("family", "file"))
+        for request in requests:
+            font = query.match()
+            bold = query.match(weight=200)
+    """
+    @property
+    def pattern(self) -> Pattern:
+        """Copy of the pattern before substitution"""
+        ...
+    @property
+    def select(self) -> Tuple[str, ...]:
+        """Properties included in the results"""
+        ...
+    def match(self, **overrides: Any) -> Optional[Dict[str, Any]]:
+        """Return the selected properties of the best matching font, or None.
+
+        :param overrides: Properties replacing those of the prepared pattern.
+        :return: Dict with selected properties, or None if no match.
+        """
+        ...
+    def sort(self, limit: Optional[int] = None, **overrides: Any) -> List[Dict[str, Any]]:
+        """Return the selected properties of the matching fonts, best first.
+
+        :param Optional[int] limit: Maximum number of fonts to return (default: all).
+        :param overrides: Properties replacing those of the prepared pattern.
+        :return: List of dicts with selected properties, sorted by match quality.
+        """
+        ...
+    def list(self, **overrides: Any) -> List[Dict[str, Any]]:
+        """Return the selected properties of all fonts matching the pattern.
+
+        As with :py:func:`list`, the pattern is not substituted.
+
+        :param overrides: Properties replacing those of the prepared pattern.
+        :return: List of dicts with selected properties.
+        """
+        ...
+
+def prepare(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[Config] = None,
+) -> Query:
+    """
+    Prepare a request for repeated :py:func:`match`, :py:func:`sort` or
+    :py:func:`list` calls.
+
+    The pattern is parsed, default-substituted and config-substituted once,
+    and the ``select`` properties are validated once. The returned
+    :py:class:`Query` then only runs the lookup on each call.
+
+    Example::
+
+        query = fontconfig.prepare(":lang=ja", select=("family", "file"))
+        font = query.match()
+        fallbacks = query.sort()
+        bold = query.match(weight=200)
+        fonts = query.list(family="Noto Sans CJK JP")
+
+    :param str pattern: Pattern string like ``":family=Arial:weight=200"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in results.
+    :param bool trim: Remove fonts with no common charset in :py:meth:`Query.sort`.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Prepared query.
+    """
+    ...
+
 def query(where: str = "", select: Iterable[str] = ("family",)) -> List[Dict[str, Any]]:
     """
     High-level function to query fonts.
@@ -1,7 +1,26 @@
+import array
 import atexit
+import heapq
+import json
 import logging
+import os
+import struct
+import sys
+import threading
+import time
 import warnings
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+cimport cython
+from cpython.list cimport PyList_Check
+from cpython.mem cimport PyMem_Free, PyMem_Malloc, PyMem_Realloc
+from libc.stdint cimport int32_t, int64_t, uint32_t, uint64_t
+from libc.errno cimport errno
+from libc.string cimport memcpy, memset, strcmp, strlen
+from posix.mman cimport MAP_FAILED, MAP_SHARED, PROT_READ, mmap, munmap
+from posix.time cimport CLOCK_MONOTONIC, clock_gettime, timespec
 
 cimport fontconfig._fontconfig as c_impl
 
@@ -10,6 +29,22 @@ logger = logging.getLogger(__name__)
 
 ctypedef Py_ssize_t intptr_t
 
+# Modification counter of all configs for result caches. It also advances
+# whenever a config may be freed, as a new config may reuse its address.
+cdef uint64_t _config_generation = 0
+
+# Number of live wrappers owning fontconfig objects. FcFini() must not run
+# while any of them may still reference font caches.
+cdef Py_ssize_t _live_objects = 0
+
+# Sentinel for omitted default arguments.
+cdef object _MISSING = object()
+
+# Whether init() has loaded the default configuration. Fontconfig is not
+# initialized at import, so that importing the package stays cheap.
+cdef bint _initialized = False
+cdef object _init_lock = threading.Lock()
+
 
 def get_version() -> str:
     """Get fontconfig version."""
@@ -20,6 +55,348 @@ def get_version() -> str:
     return "%d.%d.%d" % (major, minor, revision)
 
 
+def init(preload: bool = True) -> None:
+    """
+    Initialize fontconfig and load the default configuration.
+
+    Importing the package does not initialize fontconfig. The default
+    configuration and its font caches are loaded by the first call that needs
+    them, such as :py:meth:`Config.get_current` or :py:func:`match`. Call this
+    function to pay that cost upfront instead, e.g., when a service starts.
+    Calling it again has no effect other than the preload.
+
+    Example::
+
+        import fontconfig
+
+        fontconfig.init()
+
+    :param bool preload: Also read the patterns of all fonts, so that the
+        first lookups do not page in the font caches.
+    """
+    global _initialized
+    cdef c_impl.FcBool result
+    with _init_lock:
+        if not _initialized:
+            with nogil:
+                result = c_impl.FcInit()
+            if not result:
+                raise RuntimeError("Failed to initialize fontconfig")
+            _initialized = True
+    if preload:
+        object_set = ObjectSet.create()
+        object_set.build(("family", "style", "file", "lang"))
+        Config.get_current().font_list(Pattern.create(), object_set)
+
+
+cdef int _ensure_init() except -1:
+    if not _initialized:
+        init(preload=False)
+    return 0
+
+
+# Instrumentation of the lookup hot path. Timers are plain C structs updated
+# while holding the GIL, so recording takes no lock. When statistics are
+# disabled, every instrumented call only tests _stats_enabled.
+cdef enum:
+    _PHASE_PARSE
+    _PHASE_SUBSTITUTE
+    _PHASE_MATCH
+    _PHASE_SORT
+    _PHASE_LIST
+    _PHASE_CONVERT
+    _NUM_PHASES
+
+cdef enum:
+    _CALL_MATCH
+    _CALL_SORT
+    _CALL_LIST
+    _CALL_MATCH_MANY
+    _CALL_SORT_MANY
+    _CALL_ITER_LIST
+    _CALL_ITER_SORT
+    _CALL_RESOLVE_FALLBACK
+    _NUM_CALLS
+
+# Histogram bucket i counts durations up to 2**i microseconds; the last
+# bucket counts longer ones.
+cdef enum:
+    _NUM_BUCKETS = 24
+
+ctypedef struct _Timer:
+    uint64_t count
+    uint64_t total_ns
+    uint64_t max_ns
+    uint64_t buckets[_NUM_BUCKETS]
+
+ctypedef struct _CallCounters:
+    uint64_t results
+    uint64_t cache_hits
+    uint64_t cache_misses
+
+cdef tuple _STATS_PHASES = ("parse", "substitute", "match", "sort", "list", "convert")
+cdef tuple _STATS_CALLS = (
+    "match", "sort", "list", "match_many", "sort_many", "iter_list", "iter_sort", "resolve_fallback"
+)
+cdef bint _stats_enabled = False
+cdef _Timer _phase_timers[_NUM_PHASES]
+cdef _Timer _call_timers[_NUM_CALLS]
+cdef _CallCounters _call_counters[_NUM_CALLS]
+cdef object _stats_hooks = ()
+cdef object _stats_local = threading.local()
+
+
+class CallStats(NamedTuple):
+    """Timings of one lookup call, such as :py:func:`match`.
+
+    Passed to the hooks registered with :py:func:`add_stats_hook`.
+    ``operation`` names the function called, as listed in
+    :py:func:`get_stats`, and ``elapsed`` is the wall time of the call in
+    seconds. ``phases`` maps the phases the call
+    went through, as named by :py:func:`get_stats`, to the seconds spent in
+    them. ``results`` is the number of fonts returned, and ``cache_hit``
+    tells whether the result came from a :py:class:`MatchCache`, or is None
+    for calls without a cache.
+    """
+
+    operation: str
+    elapsed: float
+    phases: Dict[str, float]
+    results: int
+    cache_hit: Optional[bool]
+
+
+@cython.auto_pickle(False)
+cdef class _Call:
+    """Phase timings of an instrumented call in progress."""
+    cdef int operation
+    cdef uint64_t start
+    cdef uint64_t phases[_NUM_PHASES]
+    cdef Py_ssize_t results
+    cdef int cache_hit
+    cdef object outer
+
+
+cdef inline uint64_t _Now() noexcept nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return <uint64_t>ts.tv_sec * 1000000000 + <uint64_t>ts.tv_nsec
+
+
+cdef inline uint64_t _StartPhase() noexcept:
+    """Return a start time for _RecordPhase, or 0 when disabled."""
+    return _Now() if _stats_enabled else 0
+
+
+cdef void _AddTime(_Timer* timer, uint64_t elapsed) noexcept:
+    cdef int i = 0
+    cdef uint64_t bound = 1000
+    while elapsed > bound and i < _NUM_BUCKETS - 1:
+        bound <<= 1
+        i += 1
+    timer.count += 1
+    timer.total_ns += elapsed
+    if elapsed > timer.max_ns:
+        timer.max_ns = elapsed
+    timer.buckets[i] += 1
+
+
+cdef int _RecordPhase(int phase, uint64_t start, Py_ssize_t results=0) except -1:
+    """Record a phase started at start, and the fonts it converted."""
+    return _RecordElapsed(phase, _Now() - start, results)
+
+
+cdef int _RecordElapsed(int phase, uint64_t elapsed, Py_ssize_t results=0) except -1:
+    """Record a phase measured without the GIL, and the fonts it converted."""
+    cdef _Call call
+    _AddTime(&_phase_timers[phase], elapsed)
+    current = getattr(_stats_local, "call", None)
+    if current is not None:
+        call = <_Call>current
+        call.phases[phase] += elapsed
+        call.results += results
+    return 0
+
+
+cdef _Call _BeginCall(int operation):
+    """Start timing a call, or return None when disabled."""
+    if not _stats_enabled:
+        return None
+    cdef _Call call = _Call.__new__(_Call)
+    call.operation = operation
+    call.cache_hit = -1
+    call.outer = getattr(_stats_local, "call", None)
+    _stats_local.call = call
+    call.start = _Now()
+    return call
+
+
+cdef int _RecordCache(_Call call, bint found, Py_ssize_t results) except -1:
+    """Record a cache lookup and the size of a cached result."""
+    if call is not None:
+        call.cache_hit = found
+        if found:
+            call.results += results
+    return 0
+
+
+cdef int _RecordResults(_Call call, Py_ssize_t results) except -1:
+    """Record fonts returned without being converted, e.g., copied results."""
+    if call is not None:
+        call.results += results
+    return 0
+
+
+cdef int _EndCall(_Call call) except -1:
+    """Record a call started by _BeginCall and run the hooks."""
+    cdef int i
+    cdef uint64_t elapsed = _Now() - call.start
+    cdef _CallCounters* counters = &_call_counters[call.operation]
+    _stats_local.call = call.outer
+    _AddTime(&_call_timers[call.operation], elapsed)
+    counters.results += call.results
+    if call.cache_hit == 1:
+        counters.cache_hits += 1
+    elif call.cache_hit == 0:
+        counters.cache_misses += 1
+    if _stats_hooks:
+        phases = {}
+        for i in range(_NUM_PHASES):
+            if call.phases[i]:
+                phases[_STATS_PHASES[i]] = call.phases[i] / 1e9
+        record = CallStats(
+            _STATS_CALLS[call.operation],
+            elapsed / 1e9,
+            phases,
+            call.results,
+            None if call.cache_hit < 0 else bool(call.cache_hit),
+        )
+        for hook in _stats_hooks:
+            hook(record)
+    return 0
+
+
+cdef dict _TimerToDict(const _Timer* timer):
+    cdef int i
+    histogram = []
+    for i in range(_NUM_BUCKETS - 1):
+        histogram.append(((1 << i) / 1e6, timer.buckets[i]))
+    histogram.append((float("inf"), timer.buckets[_NUM_BUCKETS - 1]))
+    return {
+        "count": timer.count,
+        "total": timer.total_ns / 1e9,
+        "max": timer.max_ns / 1e9,
+        "histogram": histogram,
+    }
+
+
+def enable_stats(enabled: bool = True) -> None:
+    """
+    Turn the collection of lookup statistics on or off.
+
+    While enabled, :py:func:`match`, :py:func:`sort`, :py:func:`list`, their
+    batch and iterator variants, :py:func:`resolve_fallback`,
+    :py:class:`Query` and the matching, sorting, listing and substitution
+    methods of :py:class:`Config` record their latencies, and the hooks
+    registered with :py:func:`add_stats_hook` are called. Statistics are
+    disabled by default and then cost a single flag test per call.
+
+    :param bool enabled: Whether to collect statistics.
+    """
+    global _stats_enabled
+    _stats_enabled = enabled
+
+
+def reset_stats() -> None:
+    """Reset all counters and histograms returned by :py:func:`get_stats`."""
+    memset(_phase_timers, 0, sizeof(_phase_timers))
+    memset(_call_timers, 0, sizeof(_call_timers))
+    memset(_call_counters, 0, sizeof(_call_counters))
+
+
+def get_stats() -> Dict[str, Any]:
+    """
+    Return the statistics collected since the last :py:func:`reset_stats`.
+
+    ``"calls"`` holds one entry per lookup helper: ``match``, ``sort`` and
+    ``list``, including the :py:class:`Query` methods, ``match_many``,
+    ``sort_many``, ``iter_list``, ``iter_sort`` and ``resolve_fallback``.
+    ``"phases"`` holds one entry per step of a lookup:
+
+    - ``parse``: parsing pattern strings (``FcNameParse``);
+    - ``substitute``: default and config substitutions;
+    - ``match``, ``sort`` and ``list``: the fontconfig lookups;
+    - ``convert``: building result dicts.
+
+    Phases are also recorded when :py:class:`Config` methods are called
+    directly. The batch helpers record a substitute and a match or sort
+    phase per unique request. The iterator calls only cover the lookup, and
+    their ``results`` count the fonts available to the iterator; the
+    conversion is recorded as one ``convert`` phase when the iterator is
+    exhausted or closed. Each entry has a ``count``, the ``total`` and ``max`` seconds,
+    and a ``histogram`` of ``(upper_bound_seconds, count)`` pairs with
+    doubling bounds from 1 microsecond. Call entries also count the
+    ``results`` returned and the ``cache_hits`` and ``cache_misses`` of
+    calls with a :py:class:`MatchCache`.
+
+    Example::
+
+        fontconfig.enable_stats()
+        ...
+        stats = fontconfig.get_stats()
+        print(stats["calls"]["match"]["count"], stats["phases"]["match"]["total"])
+
+    :return: Dict with ``enabled``, ``calls`` and ``phases`` entries.
+    """
+    cdef int i
+    calls = {}
+    for i in range(_NUM_CALLS):
+        entry = _TimerToDict(&_call_timers[i])
+        entry["results"] = _call_counters[i].results
+        entry["cache_hits"] = _call_counters[i].cache_hits
+        entry["cache_misses"] = _call_counters[i].cache_misses
+        calls[_STATS_CALLS[i]] = entry
+    return {
+        "enabled": _stats_enabled,
+        "calls": calls,
+        "phases": {_STATS_PHASES[i]: _TimerToDict(&_phase_timers[i]) for i in range(_NUM_PHASES)},
+    }
+
+
+def add_stats_hook(hook: Callable[[CallStats], None]) -> None:
+    """
+    Register a function called with a :py:class:`CallStats` after each call.
+
+    Hooks run in the calling thread after each call listed in
+    :py:func:`get_stats`, while statistics are enabled. Exceptions raised by a hook
+    propagate to the caller.
+
+    Example::
+
+        def export(call):
+            histogram.labels(call.operation).observe(call.elapsed)
+
+        fontconfig.add_stats_hook(export)
+        fontconfig.enable_stats()
+
+    :param Callable hook: Function taking a :py:class:`CallStats`.
+    """
+    global _stats_hooks
+    _stats_hooks = _stats_hooks + (hook,)
+
+
+def remove_stats_hook(hook: Callable[[CallStats], None]) -> None:
+    """
+    Unregister a hook added with :py:func:`add_stats_hook`.
+
+    :raises ValueError: If the hook is not registered.
+    """
+    global _stats_hooks
+    hooks = [item for item in _stats_hooks]
+    hooks.remove(hook)
+    _stats_hooks = tuple(hooks)
+
+
 cdef class Blanks:
     """
     A Blanks object holds a list of Unicode chars which are expected to be
@@ -81,21 +458,55 @@ cdef class Config:
         object_set = fontconfig.ObjectSet.create()
         object_set.add("family")
         fonts = config.font_list(pattern, object_set)
+
+    Thread safety:
+
+    Matching, sorting, listing, substitution and font database builds release
+    the GIL while libfontconfig works, so these calls run in parallel when
+    issued from multiple Python threads. Before releasing the GIL, each call
+    takes its own reference to the underlying ``FcConfig`` with
+    ``FcConfigReference``, so the configuration stays alive until the call
+    returns even if another thread replaces the current configuration.
+
+    A Config returned by :py:meth:`Config.get_current` does not own a
+    reference; obtain a fresh one after :py:meth:`set_current` instead of
+    keeping the old object around. Patterns passed to :py:meth:`substitute`
+    are modified in place and must not be shared between threads while doing
+    so. Avoid modifying a configuration (``app_font_*``, ``build_fonts``,
+    ``parse_and_load``) while other threads query it.
     """
     cdef c_impl.FcConfig* _ptr
     cdef bint _owner
 
     def __cinit__(self, ptr: int, owner: bool = True):
+        global _live_objects
         self._ptr = <c_impl.FcConfig*>(<intptr_t>(ptr))
         self._owner = owner
+        if self._ptr is not NULL and self._owner:
+            _live_objects += 1
 
     def __dealloc__(self):
+        global _live_objects, _config_generation
         if self._ptr is not NULL and self._owner:
             c_impl.FcConfigDestroy(self._ptr)
+            _live_objects -= 1
+            _config_generation += 1
 
     cdef intptr_t ptr(self):
         return <intptr_t>self._ptr
 
+    cdef c_impl.FcConfig* _reference(self) except NULL:
+        # Pin the config for the duration of a GIL-free call.
+        cdef c_impl.FcConfig* ptr = c_impl.FcConfigReference(self._ptr)
+        if ptr is NULL:
+            raise RuntimeError("Failed to reference config")
+        return ptr
+
+    cdef _touch(self):
+        # Record a modification of the font database for result caches.
+        global _config_generation
+        _config_generation += 1
+
     @classmethod
     def create(cls) -> Config:
         """Create a configuration"""
@@ -106,11 +517,15 @@ cdef class Config:
 
     def set_current(self) -> bool:
         """Set configuration as default"""
+        global _config_generation
+        # fontconfig releases the previous current config.
+        _config_generation += 1
         return <bint>c_impl.FcConfigSetCurrent(self._ptr)
 
     @classmethod
     def get_current(cls) -> Config:
         """Return current configuration"""
+        _ensure_init()
         return cls(<intptr_t>c_impl.FcConfigGetCurrent(), False)
 
     def upto_date(self) -> bool:
@@ -132,7 +547,13 @@ cdef class Config:
 
     def build_fonts(self) -> bool:
         """Build font database"""
-        return <bint>c_impl.FcConfigBuildFonts(self._ptr)
+        cdef c_impl.FcConfig* ptr = self._reference()
+        cdef c_impl.FcBool result
+        with nogil:
+            result = c_impl.FcConfigBuildFonts(ptr)
+            c_impl.FcConfigDestroy(ptr)
+        self._touch()
+        return <bint>result
 
     def get_config_dirs(self) -> List[str]:
         """Get config directories"""
@@ -191,19 +612,32 @@ cdef class Config:
 
     def app_font_add_file(self, filename: str) -> bool:
         """Add font file to font database"""
-        file_ = filename.encode("utf-8")
-        return <bint>c_impl.FcConfigAppFontAddFile(
-            self._ptr, <const c_impl.FcChar8*>(file_))
+        cdef bytes file_ = filename.encode("utf-8")
+        cdef const c_impl.FcChar8* file_ptr = <const c_impl.FcChar8*>(file_)
+        cdef c_impl.FcConfig* ptr = self._reference()
+        cdef c_impl.FcBool result
+        with nogil:
+            result = c_impl.FcConfigAppFontAddFile(ptr, file_ptr)
+            c_impl.FcConfigDestroy(ptr)
+        self._touch()
+        return <bint>result
 
     def app_font_add_dir(self, dirname: str) -> bool:
         """Add fonts from directory to font database"""
-        dir_ = dirname.encode("utf-8")
-        return <bint>c_impl.FcConfigAppFontAddDir(
-            self._ptr, <const c_impl.FcChar8*>(dir_))
+        cdef bytes dir_ = dirname.encode("utf-8")
+        cdef const c_impl.FcChar8* dir_ptr = <const c_impl.FcChar8*>(dir_)
+        cdef c_impl.FcConfig* ptr = self._reference()
+        cdef c_impl.FcBool result
+        with nogil:
+            result = c_impl.FcConfigAppFontAddDir(ptr, dir_ptr)
+            c_impl.FcConfigDestroy(ptr)
+        self._touch()
+        return <bint>result
 
     def app_font_clear(self) -> None:
         """Remove all app fonts from font database"""
         c_impl.FcConfigAppFontClear(self._ptr)
+        self._touch()
 
     def substitute_with_pat(
         self, p: Pattern, p_pat: Pattern, kind: str = "pattern") -> bool:
@@ -230,12 +664,29 @@ cdef class Config:
         if kind not in kinds:
             raise KeyError("Invalid kind: %s" % kind)
         kind_ = kinds[kind]
-        return c_impl.FcConfigSubstitute(self._ptr, p._ptr, kind_)
+        cdef c_impl.FcPattern* pattern = p._ptr
+        cdef c_impl.FcConfig* ptr = self._reference()
+        cdef c_impl.FcBool result
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            result = c_impl.FcConfigSubstitute(ptr, pattern, kind_)
+            c_impl.FcConfigDestroy(ptr)
+        if start:
+            _RecordPhase(_PHASE_SUBSTITUTE, start)
+        return <bint>result
 
     def font_match(self, p: Pattern) -> Optional[Pattern]:
         """Return best font"""
         cdef c_impl.FcResult result
-        cdef c_impl.FcPattern* ptr = c_impl.FcFontMatch(self._ptr, p._ptr, &result)
+        cdef c_impl.FcPattern* pattern = p._ptr
+        cdef c_impl.FcConfig* config = self._reference()
+        cdef c_impl.FcPattern* ptr
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontMatch(config, pattern, &result)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_MATCH, start)
         if result == c_impl.FcResultMatch:
             return Pattern(<intptr_t>ptr)
         elif result == c_impl.FcResultNoMatch:
@@ -245,20 +696,124 @@ cdef class Config:
         else:
             raise RuntimeError("Match result is %d" % result)
 
-    def font_sort(self, p: Pattern, trim: bool) -> Optional[FontSet]:
-        """Return list of matching fonts"""
+    def font_sort(
+        self, p: Pattern, trim: bool, coverage: bool = False
+    ) -> Union[Optional[FontSet], Tuple[Optional[FontSet], Optional[CharSet]]]:
+        """Return list of matching fonts
+
+        With ``coverage=True``, return a ``(fonts, charset)`` tuple where
+        ``charset`` is the union of the charsets of the returned fonts.
+        """
+        cdef c_impl.FcResult result
+        cdef c_impl.FcPattern* pattern = p._ptr
+        cdef c_impl.FcBool trim_ = <c_impl.FcBool>trim
+        cdef c_impl.FcCharSet* csp = NULL
+        cdef c_impl.FcCharSet** csp_ptr = &csp if coverage else NULL
+        cdef c_impl.FcConfig* config = self._reference()
+        cdef c_impl.FcFontSet* ptr
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontSort(config, pattern, trim_, csp_ptr, &result)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_SORT, start)
+        return _sort_result(ptr, csp, result, coverage)
+
+    def font_set_match(self, sets: Union[FontSet, Iterable[FontSet]], p: Pattern) -> Optional[Pattern]:
+        """Return best font from the given font sets.
+
+        Like :py:meth:`font_match`, but only fonts in ``sets`` are considered.
+        The pattern should be substituted first, as for :py:meth:`font_match`.
+
+        Example::
+
+            # Build a curated catalog once...
+            catalog = fontconfig.FontSet.create()
+            for font in config.get_fonts():
+                if font.get("family") in ("Noto Sans", "Noto Serif"):
+                    catalog.add(font)
+
+            # ...and match every request against it.
+            pattern = fontconfig.Pattern.parse(":family=serif:weight=200")
+            pattern.default_substitute()
+            config.substitute(pattern)
+            font = config.font_set_match(catalog, pattern)
+        """
         cdef c_impl.FcResult result
-        cdef c_impl.FcFontSet* ptr = c_impl.FcFontSort(
-            self._ptr, p._ptr, <c_impl.FcBool>trim, NULL, &result)
-        # TODO: Support csp
+        cdef c_impl.FcPattern* pattern = p._ptr
+        cdef c_impl.FcPattern* ptr
+        cdef c_impl.FcConfig* config
+        cdef int nsets
+        holder = _FontSetArray(sets)
+        nsets = holder.n
+        config = self._reference()
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontSetMatch(config, holder.sets, nsets, pattern, &result)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_MATCH, start)
         if result == c_impl.FcResultMatch:
-            return FontSet(<intptr_t>ptr)
+            return Pattern(<intptr_t>ptr)
         elif result == c_impl.FcResultNoMatch:
             return None
         elif result == c_impl.FcResultOutOfMemory:
             raise MemoryError()
         else:
-            raise RuntimeError("Sort result is %d" % result)
+            raise RuntimeError("Match result is %d" % result)
+
+    def font_set_sort(
+        self,
+        sets: Union[FontSet, Iterable[FontSet]],
+        p: Pattern,
+        trim: bool,
+        coverage: bool = False,
+    ) -> Union[Optional[FontSet], Tuple[Optional[FontSet], Optional[CharSet]]]:
+        """Return list of matching fonts from the given font sets
+
+        See :py:meth:`font_sort` for the ``coverage`` argument.
+        """
+        cdef c_impl.FcResult result
+        cdef c_impl.FcPattern* pattern = p._ptr
+        cdef c_impl.FcBool trim_ = <c_impl.FcBool>trim
+        cdef c_impl.FcCharSet* csp = NULL
+        cdef c_impl.FcCharSet** csp_ptr = &csp if coverage else NULL
+        cdef c_impl.FcFontSet* ptr
+        cdef c_impl.FcConfig* config
+        cdef int nsets
+        holder = _FontSetArray(sets)
+        nsets = holder.n
+        config = self._reference()
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontSetSort(
+                config, holder.sets, nsets, pattern, trim_, csp_ptr, &result)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_SORT, start)
+        return _sort_result(ptr, csp, result, coverage)
+
+    def font_set_list(
+        self, sets: Union[FontSet, Iterable[FontSet]], pattern: Pattern, object_set: ObjectSet
+    ) -> FontSet:
+        """List fonts from the given font sets"""
+        cdef c_impl.FcPattern* pattern_ = pattern._ptr
+        cdef c_impl.FcObjectSet* object_set_ = object_set._ptr
+        cdef c_impl.FcFontSet* ptr
+        cdef c_impl.FcConfig* config
+        cdef int nsets
+        holder = _FontSetArray(sets)
+        nsets = holder.n
+        config = self._reference()
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontSetList(config, holder.sets, nsets, pattern_, object_set_)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_LIST, start)
+        if ptr is NULL:
+            raise MemoryError()
+        return FontSet(<intptr_t>ptr)
 
     def font_render_prepare(self, p: Pattern, font: Pattern) -> Pattern:
         """Prepare pattern for loading font file"""
@@ -270,8 +825,16 @@ cdef class Config:
 
     def font_list(self, pattern: Pattern, object_set: ObjectSet) -> FontSet:
         """List fonts"""
-        cdef c_impl.FcFontSet* ptr = c_impl.FcFontList(
-            self._ptr, pattern._ptr, object_set._ptr)
+        cdef c_impl.FcPattern* pattern_ = pattern._ptr
+        cdef c_impl.FcObjectSet* object_set_ = object_set._ptr
+        cdef c_impl.FcConfig* config = self._reference()
+        cdef c_impl.FcFontSet* ptr
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontList(config, pattern_, object_set_)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_LIST, start)
         if ptr is NULL:
             raise MemoryError()
         return FontSet(<intptr_t>ptr)
@@ -289,11 +852,13 @@ cdef class Config:
     def parse_and_load(self, filename: str, complain: bool = True) -> bool:
         """Load a configuration file"""
         cdef bytes filename_ = filename.encode("utf-8")
+        self._touch()
         return <bint>c_impl.FcConfigParseAndLoad(
             self._ptr, <c_impl.FcChar8*>filename_, <c_impl.FcBool>complain)
 
     def parse_and_load_from_memory(self, buffer: bytes, complain: bool = True) -> bool:
         """Load a configuration from memory"""
+        self._touch()
         return <bint>c_impl.FcConfigParseAndLoad(
             self._ptr, <c_impl.FcChar8*>buffer, <c_impl.FcBool>complain)
 
@@ -313,6 +878,7 @@ cdef class Config:
         """Set the system root directory"""
         sysroot_ = sysroot.encode("utf-8")
         c_impl.FcConfigSetSysRoot(self._ptr, <c_impl.FcChar8*>sysroot_)
+        self._touch()
 
     def __iter__(self) -> Iterator[Tuple[str, str, bool]]:
         """Obtain the configuration file information"""
@@ -365,11 +931,16 @@ cdef class CharSet:
     cdef c_impl.FcCharSet* _ptr
 
     def __cinit__(self, ptr: int):
+        global _live_objects
         self._ptr = <c_impl.FcCharSet*>(<intptr_t>ptr)
+        if self._ptr is not NULL:
+            _live_objects += 1
 
     def __dealloc__(self):
+        global _live_objects
         if self._ptr is not NULL:
             c_impl.FcCharSetDestroy(self._ptr)
+            _live_objects -= 1
 
     cdef intptr_t ptr(self):
         return <intptr_t>self._ptr
@@ -389,21 +960,112 @@ cdef class CharSet:
         Example::
             charset = CharSet.from_string("Hello, World!")
         """
+        if not isinstance(text, str):
+            raise TypeError("Expected str, got %s" % type(text))
         charset = cls.create()
-        for char in text:
-            charset.add(char)
+        charset.update(text)
         return charset
 
     @classmethod
     def from_codepoints(cls, codepoints) -> CharSet:
         """Create charset from iterable of Unicode codepoints.
 
+        Buffers of 32-bit integers, such as ``array('I')`` or a NumPy
+        ``uint32`` array, are read directly without per-item conversion.
+
         Example::
             charset = CharSet.from_codepoints([0x41, 0x42, 0x43])  # A, B, C
         """
         charset = cls.create()
-        for cp in codepoints:
-            charset.add(cp)
+        charset.update(codepoints)
+        return charset
+
+    def update(self, chars: object) -> None:
+        """Add many characters to the charset.
+
+        Args:
+            chars: String, buffer of 32-bit codepoints, or iterable of
+                single characters and integer codepoints
+
+        Example::
+            charset.update("Hello")
+            charset.update(array.array("I", [0x41, 0x42]))
+        """
+        _AddCodepoints(self._ptr, _CodepointsToBytes(chars))
+
+    def has_chars(self, chars: object) -> bytes:
+        """Check many characters at once.
+
+        Args:
+            chars: String, buffer of 32-bit codepoints, or iterable of
+                single characters and integer codepoints
+
+        Returns:
+            One byte per character, 1 if it is in the charset and 0 otherwise
+
+        Example::
+            mask = charset.has_chars("Hello")
+            missing = numpy.frombuffer(mask, dtype=bool) == False
+        """
+        cdef bytes data = _CodepointsToBytes(chars)
+        cdef const char* buf = data
+        cdef Py_ssize_t n = len(data) // 4
+        cdef Py_ssize_t i
+        cdef c_impl.FcChar32 codepoint
+        cdef char* mask = <char*>PyMem_Malloc(n + 1)
+
+        if mask is NULL:
+            raise MemoryError()
+        try:
+            with nogil:
+                for i in range(n):
+                    memcpy(&codepoint, buf + 4 * i, 4)
+                    mask[i] = c_impl.FcCharSetHasChar(self._ptr, codepoint) != 0
+            return <bytes>mask[:n]
+        finally:
+            PyMem_Free(mask)
+
+    def first_missing(self, chars: object) -> int:
+        """Return the index of the first character not in the charset.
+
+        Args:
+            chars: String, buffer of 32-bit codepoints, or iterable of
+                single characters and integer codepoints
+
+        Returns:
+            Index of the first missing character, or -1 if all are present
+
+        Example::
+            if charset.first_missing(text) < 0:
+                print("Fully covered")
+        """
+        cdef bytes data = _CodepointsToBytes(chars)
+        cdef const char* buf = data
+        cdef Py_ssize_t n = len(data) // 4
+        cdef Py_ssize_t i
+        cdef Py_ssize_t missing = -1
+        cdef c_impl.FcChar32 codepoint
+
+        with nogil:
+            for i in range(n):
+                memcpy(&codepoint, buf + 4 * i, 4)
+                if not c_impl.FcCharSetHasChar(self._ptr, codepoint):
+                    missing = i
+                    break
+        return missing
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> CharSet:
+        """Create charset from the output of :py:meth:`to_bytes`.
+
+        Example::
+            charset = CharSet.from_bytes(cached_data)
+        """
+        cdef _Reader reader = _Reader("CharSet")
+        reader.load(data, _CHARSET_MAGIC, False)
+        ptr = reader.read_charset()
+        charset = cls(<intptr_t>ptr)
+        reader.finish()
         return charset
 
     def copy(self) -> CharSet:
@@ -411,14 +1073,92 @@ cdef class CharSet:
 
         Note: Creates a true independent copy to avoid reference-counting issues.
         """
-        # Create a new charset and copy all codepoints
-        # FcCharSetCopy() may return a reference-counted pointer, so we
-        # manually copy to ensure independence
+        # FcCharSetCopy() may return a reference-counted pointer, so merge
+        # the pages into a new charset to ensure independence
         new_charset = CharSet.create()
-        for codepoint in self:
-            new_charset.add(codepoint)
+        if not c_impl.FcCharSetMerge((<CharSet>new_charset)._ptr, self._ptr, NULL):
+            raise MemoryError()
         return new_charset
 
+    def to_bytes(self) -> bytes:
+        """Serialize the charset as page bitmaps.
+
+        The format is ``b"FcCS"``, the number of pages, then for each page its
+        base codepoint and 256-bit bitmap, all as little-endian 32-bit words.
+
+        Example::
+            data = charset.to_bytes()
+            assert CharSet.from_bytes(data) == charset
+        """
+        cdef _Writer writer = _Writer()
+        writer.write_charset(self._ptr)
+        return writer.getvalue(_CHARSET_MAGIC, False)
+
+    def __reduce__(self):
+        return (CharSet.from_bytes, (self.to_bytes(),))
+
+    def iter_pages(self) -> Iterator[Tuple[int, bytes]]:
+        """Iterate over non-empty pages of 256 codepoints.
+
+        Yields ``(base, bitmap)`` pairs, where bit ``j`` of byte ``k`` of the
+        32-byte ``bitmap`` is set when codepoint ``base + 8 * k + j`` is in
+        the charset.
+
+        Example::
+            for base, bitmap in charset.iter_pages():
+                print(f"U+{base:04X}: {bin(int.from_bytes(bitmap, 'little')).count('1')}")
+        """
+        cdef c_impl.FcChar32 map[8]
+        cdef c_impl.FcChar32 next_page
+        cdef c_impl.FcChar32 base
+        cdef unsigned char bitmap[32]
+        cdef int j
+
+        base = c_impl.FcCharSetFirstPage(self._ptr, map, &next_page)
+        while base != _CHARSET_DONE:
+            for j in range(8):
+                _WriteUInt32(bitmap + 4 * j, map[j])
+            yield base, <bytes>(<char*>bitmap)[:32]
+            base = c_impl.FcCharSetNextPage(self._ptr, map, &next_page)
+
+    def iter_ranges(self) -> Iterator[Tuple[int, int]]:
+        """Iterate over runs of consecutive codepoints.
+
+        Yields inclusive ``(start, end)`` pairs in ascending order.
+
+        Example::
+            for start, end in charset.iter_ranges():
+                print(f"U+{start:04X}..U+{end:04X}")
+        """
+        cdef c_impl.FcChar32 map[8]
+        cdef c_impl.FcChar32 next_page
+        cdef c_impl.FcChar32 base, word, codepoint
+        cdef c_impl.FcChar32 start = 0
+        cdef c_impl.FcChar32 end = 0
+        cdef bint in_run = False
+        cdef int j, bit
+
+        base = c_impl.FcCharSetFirstPage(self._ptr, map, &next_page)
+        while base != _CHARSET_DONE:
+            for j in range(8):
+                word = map[j]
+                if word == 0:
+                    continue
+                for bit in range(32):
+                    if not (word >> bit) & 1:
+                        continue
+                    codepoint = base + 32 * j + bit
+                    if in_run and codepoint == end + 1:
+                        end = codepoint
+                        continue
+                    if in_run:
+                        yield start, end
+                    start = end = codepoint
+                    in_run = True
+            base = c_impl.FcCharSetNextPage(self._ptr, map, &next_page)
+        if in_run:
+            yield start, end
+
     def add(self, item: object) -> bool:
         """Add a character to the charset.
 
@@ -542,6 +1282,93 @@ cdef class CharSet:
             return False
         return <bint>c_impl.FcCharSetEqual(self._ptr, (<CharSet>other)._ptr)
 
+    def __le__(self, other: object) -> bool:
+        """Check if every character is also in other."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return <bint>c_impl.FcCharSetIsSubset(self._ptr, (<CharSet>other)._ptr)
+
+    def __ge__(self, other: object) -> bool:
+        """Check if every character of other is also in this charset."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return <bint>c_impl.FcCharSetIsSubset((<CharSet>other)._ptr, self._ptr)
+
+    def __lt__(self, other: object) -> bool:
+        """Check if this is a proper subset of other."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return self <= other and not self == other
+
+    def __gt__(self, other: object) -> bool:
+        """Check if this is a proper superset of other."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return self >= other and not self == other
+
+    def __or__(self, other: object) -> CharSet:
+        """Return the union of two charsets."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return _WrapNewCharSet(
+            c_impl.FcCharSetUnion(self._ptr, (<CharSet>other)._ptr))
+
+    def __and__(self, other: object) -> CharSet:
+        """Return the intersection of two charsets."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return _WrapNewCharSet(
+            c_impl.FcCharSetIntersect(self._ptr, (<CharSet>other)._ptr))
+
+    def __sub__(self, other: object) -> CharSet:
+        """Return the characters not in other."""
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return _WrapNewCharSet(
+            c_impl.FcCharSetSubtract(self._ptr, (<CharSet>other)._ptr))
+
+    def __ior__(self, other: object) -> CharSet:
+        """Add all characters of other in place."""
+        cdef c_impl.FcCharSet* ptr
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        if not c_impl.FcCharSetMerge(self._ptr, (<CharSet>other)._ptr, NULL):
+            # Constant charsets, e.g., those of fonts, cannot be modified.
+            ptr = c_impl.FcCharSetUnion(self._ptr, (<CharSet>other)._ptr)
+            if ptr is NULL:
+                raise MemoryError()
+            c_impl.FcCharSetDestroy(self._ptr)
+            self._ptr = ptr
+        return self
+
+    def intersection_count(self, other: object) -> int:
+        """Return the number of characters also in other.
+
+        Args:
+            other: CharSet, string, or iterable of characters and codepoints
+
+        Example::
+            if font_charset.intersection_count(text) > 0:
+                print("Covers part of the text")
+        """
+        other_charset = _AsCharSet(other)
+        return c_impl.FcCharSetIntersectCount(
+            self._ptr, (<CharSet>other_charset)._ptr)
+
+    def missing_count(self, other: object) -> int:
+        """Return the number of characters of other not in this charset.
+
+        Args:
+            other: CharSet, string, or iterable of characters and codepoints
+
+        Example::
+            if font_charset.missing_count(text) == 0:
+                print("Covers the whole text")
+        """
+        other_charset = _AsCharSet(other)
+        return c_impl.FcCharSetSubtractCount(
+            (<CharSet>other_charset)._ptr, self._ptr)
+
     def __repr__(self) -> str:
         """Return string representation for debugging."""
         count = len(self)
@@ -560,109 +1387,470 @@ cdef class CharSet:
             return "CharSet(%d characters)" % count
 
 
-cdef class Pattern:
-    """A Pattern is an opaque type that holds both patterns to match against
-    the available fonts, as well as the information about each font.
+cdef class LangSet:
+    """A LangSet is a set of language tags, such as the languages a font supports.
 
-    Example::
+    The ``lang`` property of patterns is returned as a LangSet, which keeps
+    the native set and only builds language strings when iterated.
 
-        # Create a new pattern.
-        pattern = fontconfig.Pattern.create()
-        pattern.add("family", "Arial")
+    Example::
 
-        # Create a new pattern from str.
-        pattern = fontconfig.Pattern.parse(":lang=en:family=Arial")
+        font = fontconfig.match(":family=sans-serif", select=("family", "lang"))
+        langs = font["lang"]
+        if "ja" in langs:
+            print("Supports Japanese")
+        print(len(langs), [lang for lang in langs])
 
-        # Pattern is iterable. Can convert to a Python dict.
-        pattern_dict = dict(pattern)
+        # Create from language tags
+        langs = fontconfig.LangSet.from_langs(["en", "fr"])
     """
-    cdef c_impl.FcPattern* _ptr
-    cdef bint _owner
+    cdef c_impl.FcLangSet* _ptr
 
-    def __cinit__(self, ptr: int, owner: bool = True):
-        self._ptr = <c_impl.FcPattern*>(<intptr_t>ptr)
-        self._owner = owner
+    def __cinit__(self, ptr: int):
+        self._ptr = <c_impl.FcLangSet*>(<intptr_t>ptr)
 
     def __dealloc__(self):
-        if self._owner and self._ptr is not NULL:
-            c_impl.FcPatternDestroy(self._ptr)
+        if self._ptr is not NULL:
+            c_impl.FcLangSetDestroy(self._ptr)
 
     cdef intptr_t ptr(self):
         return <intptr_t>self._ptr
 
     @classmethod
-    def create(cls) -> Pattern:
-        """Create a pattern"""
-        ptr = c_impl.FcPatternCreate()
+    def create(cls) -> LangSet:
+        """Create an empty langset"""
+        ptr = c_impl.FcLangSetCreate()
         if ptr is NULL:
             raise MemoryError()
         return cls(<intptr_t>ptr)
 
-    def copy(self) -> Pattern:
-        """Copy a pattern"""
-        ptr = c_impl.FcPatternDuplicate(self._ptr)
-        return Pattern(<intptr_t>ptr)
+    @classmethod
+    def from_langs(cls, langs: Iterable[str]) -> LangSet:
+        """Create a langset from language tags"""
+        return cls(<intptr_t>_ObjectToFcLangSet(langs))
+
+    def copy(self) -> LangSet:
+        """Copy a langset"""
+        return _WrapNewLangSet(c_impl.FcLangSetCopy(self._ptr))
 
     @classmethod
-    def parse(cls, name: str) -> Pattern:
-        """Parse a pattern string"""
-        ptr = c_impl.FcNameParse(name.encode("utf-8"))
-        if ptr is NULL:
-            raise ValueError("Invalid name: %s" % name)
-        return cls(<intptr_t>ptr)
+    def from_bytes(cls, data: bytes) -> LangSet:
+        """Create a langset from the output of :py:meth:`to_bytes`."""
+        cdef _Reader reader = _Reader("LangSet")
+        reader.load(data, _LANGSET_MAGIC)
+        lang_set = cls(<intptr_t>reader.read_langset())
+        reader.finish()
+        return lang_set
 
-    def unparse(self) -> str:
-        """Convert a pattern back into a string that can be parsed."""
-        name = <bytes>(c_impl.FcNameUnparse(self._ptr))
-        return name.decode("utf-8")
+    def to_bytes(self) -> bytes:
+        """Serialize the langset in a compact binary format.
 
-    def __len__(self) -> int:
-        return c_impl.FcPatternObjectCount(self._ptr)
+        Example::
+            data = langset.to_bytes()
+            assert LangSet.from_bytes(data) == langset
+        """
+        cdef _Writer writer = _Writer()
+        writer.write_langset(self._ptr)
+        return writer.getvalue(_LANGSET_MAGIC)
 
-    def __eq__(self, pattern: Pattern) -> bool:
-        return <bint>c_impl.FcPatternEqual(self._ptr, pattern._ptr)
+    def __reduce__(self):
+        return (LangSet.from_bytes, (self.to_bytes(),))
 
-    def equal_subset(self, pattern: Pattern, object_set: ObjectSet) -> bool:
-        """Compare portions of patterns"""
-        return <bint>c_impl.FcPatternEqualSubset(self._ptr, pattern._ptr, object_set._ptr)
+    def __contains__(self, lang: object) -> bool:
+        """Check if the langset has exactly the language tag.
 
-    def subset(self, object_set: ObjectSet) -> Pattern:
-        """Filter the objects of pattern"""
-        ptr = c_impl.FcPatternFilter(self._ptr, object_set._ptr)
-        return Pattern(<intptr_t>ptr)
+        Example::
+            if "en" in langset:
+                print("Has English")
+        """
+        cdef bytes lang_
+        if not isinstance(lang, str):
+            return False
+        lang_ = (<str>lang).encode("utf-8")
+        return c_impl.FcLangSetHasLang(
+            self._ptr, <const c_impl.FcChar8*>lang_) == c_impl.FcLangEqual
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over language tags."""
+        return iter(_FcLangSetToObject(self._ptr))
+
+    def __len__(self) -> int:
+        """Return the number of language tags."""
+        cdef c_impl.FcStrSet* str_set = c_impl.FcLangSetGetLangs(self._ptr)
+        cdef c_impl.FcStrList* str_list
+        cdef int count = 0
+        if str_set is NULL:
+            raise MemoryError()
+        str_list = c_impl.FcStrListCreate(str_set)
+        while c_impl.FcStrListNext(str_list) is not NULL:
+            count += 1
+        c_impl.FcStrListDone(str_list)
+        c_impl.FcStrSetDestroy(str_set)
+        return count
+
+    def __eq__(self, other: object) -> bool:
+        """Check if two langsets are equal.
+
+        A langset also compares equal to a list of the same tags, in any
+        order. Other containers compare unequal, as they hash differently.
+        """
+        if isinstance(other, LangSet):
+            return <bint>c_impl.FcLangSetEqual(self._ptr, (<LangSet>other)._ptr)
+        if PyList_Check(other):
+            return set(_FcLangSetToObject(self._ptr)) == set(other)
+        return NotImplemented
 
     def __hash__(self) -> int:
-        return <int>c_impl.FcPatternHash(self._ptr)
+        return <int>c_impl.FcLangSetHash(self._ptr)
 
-    def add(self, key: str, value: object, append: bool = True) -> bool:
-        """Add a value to a pattern"""
-        cdef c_impl.FcValue fc_value
-        cdef c_impl.FcObjectType* object_type
-        key_ = key.encode("utf-8")
-        object_type = c_impl.FcNameGetObjectType(key_)
-        if object_type is NULL or object_type.type == c_impl.FcTypeUnknown:
-            raise KeyError("Invalid key %s" % key)
-        fc_value.type = object_type.type
-        _ObjectToFcValue(value, &fc_value)
-        result = <bint>c_impl.FcPatternAdd(self._ptr, key_, fc_value, append)
-        c_impl.FcValueDestroy(fc_value)
-        return result
+    def has_lang(self, lang: str) -> str:
+        """Check how well the langset supports a language tag.
 
-    def get(self, key: str, index: int = 0) -> Any:
-        """Return a value from a pattern"""
+        Return ``"equal"`` if the langset has the tag, ``"different_territory"``
+        if it has the language with another or no territory, and
+        ``"different_lang"`` otherwise.
+        """
+        cdef bytes lang_ = lang.encode("utf-8")
+        return _LANG_RESULTS[
+            c_impl.FcLangSetHasLang(self._ptr, <const c_impl.FcChar8*>lang_)]
+
+    def compare(self, other: LangSet) -> str:
+        """Compare the languages of two langsets.
+
+        Return ``"equal"`` if they share a language tag, ``"different_territory"``
+        if they only share a language with different territories, and
+        ``"different_lang"`` otherwise.
+        """
+        return _LANG_RESULTS[c_impl.FcLangSetCompare(self._ptr, other._ptr)]
+
+    def __le__(self, other: object) -> bool:
+        """Check if other covers every language of this langset.
+
+        A tag without territory covers the same language with any territory.
+        """
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        return <bint>c_impl.FcLangSetContains((<LangSet>other)._ptr, self._ptr)
+
+    def __ge__(self, other: object) -> bool:
+        """Check if this langset covers every language of other."""
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        return <bint>c_impl.FcLangSetContains(self._ptr, (<LangSet>other)._ptr)
+
+    def __lt__(self, other: object) -> bool:
+        """Check if other covers this langset and more."""
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        return self <= other and not self == other
+
+    def __gt__(self, other: object) -> bool:
+        """Check if this langset covers other and more."""
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        return self >= other and not self == other
+
+    def __or__(self, other: object) -> LangSet:
+        """Return the union of two langsets."""
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        return _WrapNewLangSet(
+            c_impl.FcLangSetUnion(self._ptr, (<LangSet>other)._ptr))
+
+    def __sub__(self, other: object) -> LangSet:
+        """Return the language tags not in other."""
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        return _WrapNewLangSet(
+            c_impl.FcLangSetSubtract(self._ptr, (<LangSet>other)._ptr))
+
+    def __and__(self, other: object) -> LangSet:
+        """Return the language tags in both langsets."""
+        if not isinstance(other, LangSet):
+            return NotImplemented
+        difference = _WrapNewLangSet(
+            c_impl.FcLangSetSubtract(self._ptr, (<LangSet>other)._ptr))
+        return _WrapNewLangSet(
+            c_impl.FcLangSetSubtract(self._ptr, (<LangSet>difference)._ptr))
+
+    def __repr__(self) -> str:
+        return "LangSet(%r)" % (_FcLangSetToObject(self._ptr),)
+
+
+cdef dict _LANG_RESULTS = {
+    c_impl.FcLangEqual: "equal",
+    c_impl.FcLangDifferentTerritory: "different_territory",
+    c_impl.FcLangDifferentLang: "different_lang",
+}
+
+
+def lang_charset(lang: str) -> Optional[CharSet]:
+    """
+    Return the characters of the orthography of a language.
+
+    The charset is the one fontconfig uses to decide whether a font supports
+    the language.
+
+    Example::
+
+        charset = fontconfig.lang_charset("ja")
+        print(f"{len(charset)} characters")
+
+    :param str lang: Language tag like ``"ja"`` or ``"zh-tw"``.
+    :return: CharSet of the orthography, or None if the language is unknown.
+    """
+    cdef bytes lang_ = lang.encode("utf-8")
+    return _FcCharSetToObject(c_impl.FcLangGetCharSet(<const c_impl.FcChar8*>lang_))
+
+
+def normalize_lang(lang: str) -> Optional[str]:
+    """
+    Normalize a language tag, e.g., ``"ja_JP.UTF-8"`` to ``"ja"``.
+
+    :param str lang: Language tag or locale name.
+    :return: Normalized tag, or None if the tag is invalid.
+    """
+    cdef bytes lang_ = lang.encode("utf-8")
+    cdef c_impl.FcChar8* result = c_impl.FcLangNormalize(<const c_impl.FcChar8*>lang_)
+    if result is NULL:
+        return None
+    normalized = (<bytes>result).decode("utf-8")
+    c_impl.FcStrFree(result)
+    return normalized
+
+
+cdef LangSet _WrapNewLangSet(c_impl.FcLangSet* ptr):
+    """Wrap a newly allocated FcLangSet, raising MemoryError on NULL."""
+    if ptr is NULL:
+        raise MemoryError()
+    return LangSet(<intptr_t>ptr)
+
+
+cdef class Pattern:
+    """A Pattern is an opaque type that holds both patterns to match against
+    the available fonts, as well as the information about each font.
+
+    Example::
+
+        # Create a new pattern.
+        pattern = fontconfig.Pattern.create()
+        pattern.add("family", "Arial")
+
+        # Create a new pattern from str.
+        pattern = fontconfig.Pattern.parse(":lang=en:family=Arial")
+
+        # Pattern is iterable. Can convert to a Python dict.
+        pattern_dict = dict(pattern)
+    """
+    cdef c_impl.FcPattern* _ptr
+    cdef bint _owner
+
+    def __cinit__(self, ptr: int, owner: bool = True):
+        global _live_objects
+        self._ptr = <c_impl.FcPattern*>(<intptr_t>ptr)
+        self._owner = owner
+        if self._owner and self._ptr is not NULL:
+            _live_objects += 1
+
+    def __dealloc__(self):
+        global _live_objects
+        if self._owner and self._ptr is not NULL:
+            c_impl.FcPatternDestroy(self._ptr)
+            _live_objects -= 1
+
+    cdef intptr_t ptr(self):
+        return <intptr_t>self._ptr
+
+    @classmethod
+    def create(cls) -> Pattern:
+        """Create a pattern"""
+        ptr = c_impl.FcPatternCreate()
+        if ptr is NULL:
+            raise MemoryError()
+        return cls(<intptr_t>ptr)
+
+    def copy(self) -> Pattern:
+        """Copy a pattern"""
+        ptr = c_impl.FcPatternDuplicate(self._ptr)
+        return Pattern(<intptr_t>ptr)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Pattern:
+        """Create a pattern from the output of :py:meth:`to_bytes`.
+
+        Example::
+            pattern = Pattern.from_bytes(cached_data)
+        """
+        cdef _Reader reader = _Reader("Pattern")
+        reader.load(data, _PATTERN_MAGIC)
+        pattern = cls(<intptr_t>reader.read_pattern())
+        reader.finish()
+        return pattern
+
+    def to_bytes(self) -> bytes:
+        """Serialize the pattern in a compact binary format.
+
+        Unlike :py:meth:`unparse`, all values are kept, including charsets,
+        langsets and value bindings. Object names and strings are stored once
+        in a string table, and charsets as page bitmaps. Patterns are also
+        picklable through this format.
+
+        Example::
+            data = pattern.to_bytes()
+            assert Pattern.from_bytes(data) == pattern
+        """
+        cdef _Writer writer = _Writer()
+        writer.write_pattern(self._ptr)
+        return writer.getvalue(_PATTERN_MAGIC)
+
+    def __reduce__(self):
+        return (Pattern.from_bytes, (self.to_bytes(),))
+
+    @classmethod
+    def parse(cls, name: str) -> Pattern:
+        """Parse a pattern string"""
+        cdef uint64_t start = _StartPhase()
+        ptr = c_impl.FcNameParse(name.encode("utf-8"))
+        if start:
+            _RecordPhase(_PHASE_PARSE, start)
+        if ptr is NULL:
+            raise ValueError("Invalid name: %s" % name)
+        return cls(<intptr_t>ptr)
+
+    def unparse(self) -> str:
+        """Convert a pattern back into a string that can be parsed."""
+        name = <bytes>(c_impl.FcNameUnparse(self._ptr))
+        return name.decode("utf-8")
+
+    def __len__(self) -> int:
+        return c_impl.FcPatternObjectCount(self._ptr)
+
+    def __eq__(self, pattern: Pattern) -> bool:
+        return <bint>c_impl.FcPatternEqual(self._ptr, pattern._ptr)
+
+    def equal_subset(self, pattern: Pattern, object_set: ObjectSet) -> bool:
+        """Compare portions of patterns"""
+        return <bint>c_impl.FcPatternEqualSubset(self._ptr, pattern._ptr, object_set._ptr)
+
+    def subset(self, object_set: ObjectSet) -> Pattern:
+        """Filter the objects of pattern"""
+        ptr = c_impl.FcPatternFilter(self._ptr, object_set._ptr)
+        return Pattern(<intptr_t>ptr)
+
+    def __hash__(self) -> int:
+        return <int>c_impl.FcPatternHash(self._ptr)
+
+    def add(self, key: str, value: object, append: bool = True) -> bool:
+        """Add a value to a pattern"""
+        cdef c_impl.FcValue fc_value
+        cdef c_impl.FcObjectType* object_type
+        key_ = key.encode("utf-8")
+        object_type = c_impl.FcNameGetObjectType(key_)
+        if object_type is NULL or object_type.type == c_impl.FcTypeUnknown:
+            raise KeyError("Invalid key %s" % key)
+        fc_value.type = object_type.type
+        _ObjectToFcValue(value, &fc_value)
+        result = <bint>c_impl.FcPatternAdd(self._ptr, key_, fc_value, append)
+        c_impl.FcValueDestroy(fc_value)
+        return result
+
+    def get(self, key: str, index: int = 0, default: Any = _MISSING) -> Any:
+        """Return a value from a pattern
+
+        Raise KeyError if the property or index is missing, unless a
+        ``default`` is given, which is then returned instead.
+        """
         cdef c_impl.FcValue fc_value
         result = c_impl.FcPatternGet(self._ptr, key.encode("utf-8"), index, &fc_value)
         if result == c_impl.FcResultMatch:
             return _FcValueToObject(&fc_value)
-        elif result == c_impl.FcResultNoMatch:
-            raise KeyError("Invalid key %s" % key)
-        elif result == c_impl.FcResultNoId:
+        elif result == c_impl.FcResultNoMatch or result == c_impl.FcResultNoId:
+            if default is not _MISSING:
+                return default
+            if result == c_impl.FcResultNoMatch:
+                raise KeyError("Invalid key %s" % key)
             raise KeyError("Invalid index %d" % index)
         elif result == c_impl.FcResultOutOfMemory:
             raise MemoryError()
         else:
             raise RuntimeError()
 
+    def get_string(self, key: str, index: int = 0, default: Optional[str] = None) -> Optional[str]:
+        """Return a string value, or ``default`` if missing
+
+        Raise TypeError if the value is not a string.
+        """
+        cdef c_impl.FcChar8* value
+        result = c_impl.FcPatternGetString(self._ptr, key.encode("utf-8"), index, &value)
+        if result == c_impl.FcResultMatch:
+            return (<bytes>value).decode("utf-8")
+        return _TypedGetDefault(result, key, "a string", default)
+
+    def get_int(self, key: str, index: int = 0, default: Optional[int] = None) -> Optional[int]:
+        """Return an integer value, or ``default`` if missing
+
+        Double values are truncated. Raise TypeError for other types.
+        """
+        cdef int value
+        result = c_impl.FcPatternGetInteger(self._ptr, key.encode("utf-8"), index, &value)
+        if result == c_impl.FcResultMatch:
+            return value
+        return _TypedGetDefault(result, key, "a number", default)
+
+    def get_double(self, key: str, index: int = 0, default: Optional[float] = None) -> Optional[float]:
+        """Return a double value, or ``default`` if missing
+
+        Integer values are converted. Raise TypeError for other types.
+        """
+        cdef double value
+        result = c_impl.FcPatternGetDouble(self._ptr, key.encode("utf-8"), index, &value)
+        if result == c_impl.FcResultMatch:
+            return value
+        return _TypedGetDefault(result, key, "a number", default)
+
+    def get_bool(self, key: str, index: int = 0, default: Optional[bool] = None) -> Optional[bool]:
+        """Return a boolean value, or ``default`` if missing
+
+        Raise TypeError if the value is not a boolean.
+        """
+        cdef c_impl.FcBool value
+        result = c_impl.FcPatternGetBool(self._ptr, key.encode("utf-8"), index, &value)
+        if result == c_impl.FcResultMatch:
+            return <bint>value
+        return _TypedGetDefault(result, key, "a boolean", default)
+
+    def to_dict(self, select: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Return the first value of each property as a dict
+
+        With ``select``, only the given properties are included, and missing
+        ones are skipped. Unlike ``dict(pattern)``, values are not lists.
+
+        Example::
+
+            fonts = config.font_list(pattern, object_set)
+            rows = [font.to_dict(("family", "file", "weight")) for font in fonts]
+        """
+        cdef c_impl.FcPatternIter it
+        cdef c_impl.FcValue value
+        cdef dict result
+        if select is not None:
+            return _FcPatternToDict(self._ptr, _SelectKeys(select))
+        result = {}
+        c_impl.FcPatternIterStart(self._ptr, &it)
+        while <bint>c_impl.FcPatternIterIsValid(self._ptr, &it):
+            if c_impl.FcPatternIterGetValue(self._ptr, &it, 0, &value, NULL) == c_impl.FcResultMatch:
+                key = <bytes>c_impl.FcPatternIterGetObject(self._ptr, &it)
+                result[key.decode("utf-8")] = _FcValueToObject(&value)
+            if not <bint>c_impl.FcPatternIterNext(self._ptr, &it):
+                break
+        return result
+
+    def __contains__(self, key: object) -> bool:
+        cdef c_impl.FcPatternIter it
+        if not isinstance(key, str):
+            return False
+        return <bint>c_impl.FcPatternFindIter(self._ptr, &it, (<str>key).encode("utf-8"))
+
     def delete(self, key: str) -> bool:
         """Delete a property from a pattern"""
         return <bint>c_impl.FcPatternDel(self._ptr, key.encode("utf-8"))
@@ -707,7 +1895,10 @@ cdef class Pattern:
           any specified point size (default 12), dpi (default 75) and scale
           (default 1).
         """
+        cdef uint64_t start = _StartPhase()
         c_impl.FcDefaultSubstitute(self._ptr)
+        if start:
+            _RecordPhase(_PHASE_SUBSTITUTE, start)
 
     def format(self, fmt: str) -> None:
         """Format a pattern into a string according to a format specifier"""
@@ -722,6 +1913,32 @@ cdef class Pattern:
         return dict(self).__repr__()
 
 
+cdef object _TypedGetDefault(c_impl.FcResult result, str key, str kind, object default):
+    """Handle a failed typed FcPatternGet call."""
+    if result == c_impl.FcResultNoMatch or result == c_impl.FcResultNoId:
+        return default
+    elif result == c_impl.FcResultTypeMismatch:
+        raise TypeError("Property %s is not %s" % (key, kind))
+    elif result == c_impl.FcResultOutOfMemory:
+        raise MemoryError()
+    raise RuntimeError()
+
+
+cdef tuple _SelectKeys(object select):
+    """Encode property names once for _FcPatternToDict."""
+    return tuple([(name, name.encode("utf-8")) for name in select])
+
+
+cdef dict _FcPatternToDict(const c_impl.FcPattern* pattern, tuple keys):
+    """Convert the first value of the selected properties to a dict."""
+    cdef c_impl.FcValue value
+    cdef dict result = {}
+    for name, key in keys:
+        if c_impl.FcPatternGet(pattern, <bytes>key, 0, &value) == c_impl.FcResultMatch:
+            result[name] = _FcValueToObject(&value)
+    return result
+
+
 cdef void _ObjectToFcValue(object value, c_impl.FcValue* fc_value):
     assert fc_value is not NULL
     if fc_value.type == c_impl.FcTypeBool:
@@ -754,8 +1971,16 @@ cdef c_impl.FcChar8* _ObjectToFcFcStr(object value):
 
 
 cdef c_impl.FcLangSet* _ObjectToFcLangSet(object value):
-    cdef c_impl.FcLangSet* lang_set = c_impl.FcLangSetCreate()
+    cdef c_impl.FcLangSet* lang_set
     cdef c_impl.FcBool result;
+    if isinstance(value, LangSet):
+        lang_set = c_impl.FcLangSetCopy((<LangSet>value)._ptr)
+        if lang_set is NULL:
+            raise MemoryError()
+        return lang_set
+    lang_set = c_impl.FcLangSetCreate()
+    if lang_set is NULL:
+        raise MemoryError()
     for item in value:
         lang = item.encode("utf-8") if isinstance(item, str) else item
         result = c_impl.FcLangSetAdd(lang_set, <c_impl.FcChar8*>(lang))
@@ -816,14 +2041,13 @@ cdef c_impl.FcCharSet* _ObjectToFcCharSet(object value):
     if charset is NULL:
         raise MemoryError()
 
-    # Case 3: String - iterate characters
+    # Case 3: String - add all characters at once
     if isinstance(value, str):
-        for char in value:
-            codepoint = ord(char)
-            result = c_impl.FcCharSetAddChar(charset, <c_impl.FcChar32>codepoint)
-            if not result:
-                c_impl.FcCharSetDestroy(charset)
-                raise ValueError("Failed to add character: %s" % char)
+        try:
+            _AddCodepoints(charset, _CodepointsToBytes(value))
+        except ValueError:
+            c_impl.FcCharSetDestroy(charset)
+            raise
         return charset
 
     # Case 4: Iterable - try to iterate
@@ -853,6 +2077,529 @@ cdef c_impl.FcCharSet* _ObjectToFcCharSet(object value):
     return charset
 
 
+cdef bytes _CHARSET_MAGIC = b"FcCS"
+cdef Py_ssize_t _CHARSET_PAGE_SIZE = 36
+cdef c_impl.FcChar32 _CHARSET_DONE = <c_impl.FcChar32>(-1)
+
+
+cdef inline c_impl.FcChar32 _ReadUInt32(const unsigned char* buf) noexcept nogil:
+    return (
+        <c_impl.FcChar32>buf[0]
+        | (<c_impl.FcChar32>buf[1] << 8)
+        | (<c_impl.FcChar32>buf[2] << 16)
+        | (<c_impl.FcChar32>buf[3] << 24)
+    )
+
+
+cdef inline void _WriteUInt32(unsigned char* buf, c_impl.FcChar32 value) noexcept nogil:
+    buf[0] = value & 0xFF
+    buf[1] = (value >> 8) & 0xFF
+    buf[2] = (value >> 16) & 0xFF
+    buf[3] = (value >> 24) & 0xFF
+
+
+# Binary encoding of patterns, font sets and langsets. A blob starts with a
+# 4-byte magic and a table of the strings it uses, each stored once with a
+# 32-bit length and a NUL terminator. The body refers to strings by index, so
+# that object names and repeated values, such as family names in a font set,
+# are interned. Language tags are stored inline like the table entries, and
+# charsets as page bitmaps as in CharSet.to_bytes(). All numbers are
+# little-endian.
+cdef bytes _PATTERN_MAGIC = b"FcPt"
+cdef bytes _FONTSET_MAGIC = b"FcFS"
+cdef bytes _LANGSET_MAGIC = b"FcLS"
+
+
+cdef class _Writer:
+    cdef unsigned char* data
+    cdef size_t size
+    cdef size_t capacity
+    cdef dict strings
+    cdef dict lang_sets
+
+    def __cinit__(self):
+        self.strings = {}
+        # Encoded langsets by FcLangSetHash, each a list of (LangSet, bytes).
+        self.lang_sets = {}
+
+    def __dealloc__(self):
+        PyMem_Free(self.data)
+
+    cdef unsigned char* reserve(self, size_t n) except NULL:
+        cdef size_t capacity
+        cdef unsigned char* data
+        if self.size + n > self.capacity:
+            capacity = max(2 * self.capacity, self.size + n, 256)
+            data = <unsigned char*>PyMem_Realloc(self.data, capacity)
+            if data is NULL:
+                raise MemoryError()
+            self.data = data
+            self.capacity = capacity
+        data = self.data + self.size
+        self.size += n
+        return data
+
+    cdef int write_u8(self, unsigned char value) except -1:
+        self.reserve(1)[0] = value
+        return 0
+
+    cdef int write_u32(self, c_impl.FcChar32 value) except -1:
+        _WriteUInt32(self.reserve(4), value)
+        return 0
+
+    cdef int write_double(self, double value) except -1:
+        cdef uint64_t bits
+        cdef unsigned char* buf = self.reserve(8)
+        memcpy(&bits, &value, 8)
+        _WriteUInt32(buf, <c_impl.FcChar32>(bits & 0xFFFFFFFF))
+        _WriteUInt32(buf + 4, <c_impl.FcChar32>(bits >> 32))
+        return 0
+
+    cdef c_impl.FcChar32 intern(self, bytes value) except? 0xFFFFFFFF:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    cdef int write_string(self, const c_impl.FcChar8* value) except -1:
+        return self.write_u32(self.intern(<bytes>(<const char*>value)))
+
+    cdef int write_inline_string(self, const c_impl.FcChar8* value) except -1:
+        # Short strings, such as language tags, are cheaper to copy than to
+        # intern.
+        cdef size_t size = strlen(<const char*>value)
+        self.write_u32(<c_impl.FcChar32>size)
+        memcpy(self.reserve(size + 1), value, size + 1)
+        return 0
+
+    cdef int write_charset(self, const c_impl.FcCharSet* charset) except -1:
+        cdef c_impl.FcChar32 map[8]
+        cdef c_impl.FcChar32 next_page
+        cdef c_impl.FcChar32 base
+        cdef c_impl.FcChar32 count = 0
+        cdef unsigned char* page
+        cdef int j
+
+        base = c_impl.FcCharSetFirstPage(charset, map, &next_page)
+        while base != _CHARSET_DONE:
+            count += 1
+            base = c_impl.FcCharSetNextPage(charset, map, &next_page)
+        self.write_u32(count)
+        page = self.reserve(<size_t>count * _CHARSET_PAGE_SIZE)
+        base = c_impl.FcCharSetFirstPage(charset, map, &next_page)
+        while base != _CHARSET_DONE:
+            _WriteUInt32(page, base)
+            for j in range(8):
+                _WriteUInt32(page + 4 + 4 * j, map[j])
+            page += _CHARSET_PAGE_SIZE
+            base = c_impl.FcCharSetNextPage(charset, map, &next_page)
+        return 0
+
+    cdef int write_langset(self, const c_impl.FcLangSet* lang_set) except -1:
+        cdef c_impl.FcStrSet* str_set
+        cdef c_impl.FcStrList* str_list
+        cdef c_impl.FcChar8* lang
+        cdef c_impl.FcChar32 count = 0
+        cdef size_t start = self.size
+        cdef bytes data
+
+        # Fonts of a family usually share a langset, and expanding one into
+        # tags is slow, so reuse the encoding of an equal langset.
+        bucket = self.lang_sets.setdefault(c_impl.FcLangSetHash(lang_set), [])
+        for other, data in bucket:
+            if c_impl.FcLangSetEqual(lang_set, (<LangSet>other)._ptr):
+                memcpy(self.reserve(len(data)), <const char*>data, len(data))
+                return 0
+
+        str_set = c_impl.FcLangSetGetLangs(lang_set)
+        if str_set is NULL:
+            raise MemoryError()
+        str_list = c_impl.FcStrListCreate(str_set)
+        c_impl.FcStrSetDestroy(str_set)
+        if str_list is NULL:
+            raise MemoryError()
+        try:
+            while c_impl.FcStrListNext(str_list) is not NULL:
+                count += 1
+            self.write_u32(count)
+            c_impl.FcStrListFirst(str_list)
+            while True:
+                lang = c_impl.FcStrListNext(str_list)
+                if lang is NULL:
+                    break
+                self.write_inline_string(lang)
+        finally:
+            c_impl.FcStrListDone(str_list)
+        bucket.append((
+            _WrapNewLangSet(c_impl.FcLangSetCopy(lang_set)),
+            <bytes>(<char*>self.data + start)[:self.size - start],
+        ))
+        return 0
+
+    cdef int write_value(self, c_impl.FcValue* value, c_impl.FcValueBinding binding) except -1:
+        cdef double begin, end
+        self.write_u8(value.type)
+        self.write_u8(binding)
+        if value.type == c_impl.FcTypeVoid:
+            pass
+        elif value.type == c_impl.FcTypeInteger:
+            self.write_u32(<c_impl.FcChar32>value.u.i)
+        elif value.type == c_impl.FcTypeDouble:
+            self.write_double(value.u.d)
+        elif value.type == c_impl.FcTypeString:
+            self.write_string(value.u.s)
+        elif value.type == c_impl.FcTypeBool:
+            self.write_u32(<c_impl.FcChar32>value.u.b)
+        elif value.type == c_impl.FcTypeMatrix:
+            self.write_double(value.u.m.xx)
+            self.write_double(value.u.m.xy)
+            self.write_double(value.u.m.yx)
+            self.write_double(value.u.m.yy)
+        elif value.type == c_impl.FcTypeCharSet:
+            self.write_charset(value.u.c)
+        elif value.type == c_impl.FcTypeLangSet:
+            self.write_langset(value.u.l)
+        elif value.type == c_impl.FcTypeRange:
+            if not c_impl.FcRangeGetDouble(value.u.r, &begin, &end):
+                raise RuntimeError()
+            self.write_double(begin)
+            self.write_double(end)
+        else:
+            raise ValueError("Cannot serialize value of type %d" % value.type)
+        return 0
+
+    cdef int write_pattern(self, const c_impl.FcPattern* pattern) except -1:
+        cdef c_impl.FcPatternIter it
+        cdef c_impl.FcValue value
+        cdef c_impl.FcValueBinding binding
+        cdef int i, count
+
+        self.write_u32(c_impl.FcPatternObjectCount(pattern))
+        c_impl.FcPatternIterStart(pattern, &it)
+        while <bint>c_impl.FcPatternIterIsValid(pattern, &it):
+            count = c_impl.FcPatternIterValueCount(pattern, &it)
+            self.write_string(<const c_impl.FcChar8*>c_impl.FcPatternIterGetObject(pattern, &it))
+            self.write_u32(count)
+            for i in range(count):
+                if c_impl.FcPatternIterGetValue(pattern, &it, i, &value, &binding) != c_impl.FcResultMatch:
+                    raise RuntimeError()
+                self.write_value(&value, binding)
+            if not <bint>c_impl.FcPatternIterNext(pattern, &it):
+                break
+        return 0
+
+    cdef bytes body(self):
+        return <bytes>(<char*>self.data)[:self.size] if self.size else b""
+
+    cdef bytes getvalue(self, bytes magic, bint strings=True):
+        cdef bytes body = self.body()
+        if not strings:
+            return magic + body
+        parts = [magic, struct.pack("<I", len(self.strings))]
+        for value in self.strings:
+            parts.append(struct.pack("<I", len(<bytes>value)))
+            parts.append(value)
+            parts.append(b"\0")
+        parts.append(body)
+        return b"".join(parts)
+
+
+cdef class _Reader:
+    cdef bytes data
+    cdef str kind
+    cdef const unsigned char* pos
+    cdef const unsigned char* end
+    cdef const char** strings
+    cdef c_impl.FcChar32 count
+    # String table of a mapped snapshot, used instead of ``strings``.
+    cdef const unsigned char* string_data
+    cdef const unsigned char* string_offsets
+
+    def __cinit__(self, str kind):
+        self.kind = kind
+
+    cdef int load(self, data, bytes magic, bint strings=True) except -1:
+        cdef c_impl.FcChar32 count, i
+        self.data = bytes(data)
+        self.pos = <const unsigned char*><const char*>self.data
+        self.end = self.pos + len(self.data)
+        if self.data[:4] != magic:
+            self.invalid()
+        self.pos += 4
+        if not strings:
+            return 0
+        count = self.read_u32()
+        # Each string takes at least 5 bytes, which bounds the allocation.
+        if count > <size_t>(self.end - self.pos) // 5:
+            self.invalid()
+        self.strings = <const char**>PyMem_Malloc(max(count, 1) * sizeof(const char*))
+        if self.strings is NULL:
+            raise MemoryError()
+        for i in range(count):
+            self.strings[i] = <const char*>self.read_inline_string()
+        self.count = count
+        return 0
+
+    def __dealloc__(self):
+        PyMem_Free(self.strings)
+
+    cdef int invalid(self) except -1:
+        raise ValueError("Invalid %s data" % self.kind)
+
+    cdef const unsigned char* take(self, size_t n) except NULL:
+        cdef const unsigned char* value = self.pos
+        if <size_t>(self.end - self.pos) < n:
+            self.invalid()
+        self.pos += n
+        return value
+
+    cdef int finish(self) except -1:
+        if self.pos != self.end:
+            self.invalid()
+        return 0
+
+    cdef unsigned char read_u8(self) except? 0xFF:
+        return self.take(1)[0]
+
+    cdef c_impl.FcChar32 read_u32(self) except? 0xFFFFFFFF:
+        return _ReadUInt32(self.take(4))
+
+    cdef double read_double(self) except? -1:
+        cdef const unsigned char* buf = self.take(8)
+        cdef uint64_t bits = _ReadUInt32(buf) | (<uint64_t>_ReadUInt32(buf + 4) << 32)
+        cdef double value
+        memcpy(&value, &bits, 8)
+        return value
+
+    cdef const c_impl.FcChar8* read_string(self) except NULL:
+        cdef c_impl.FcChar32 index = self.read_u32()
+        if index >= self.count:
+            self.invalid()
+        if self.string_offsets is not NULL:
+            return <const c_impl.FcChar8*>(
+                self.string_data + _ReadUInt32(self.string_offsets + 4 * <size_t>index))
+        return <const c_impl.FcChar8*>self.strings[index]
+
+    cdef const c_impl.FcChar8* read_inline_string(self) except NULL:
+        cdef c_impl.FcChar32 size = self.read_u32()
+        cdef const unsigned char* value = self.take(<size_t>size + 1)
+        if value[size] != 0:
+            self.invalid()
+        return <const c_impl.FcChar8*>value
+
+    cdef c_impl.FcCharSet* read_charset(self) except NULL:
+        cdef const unsigned char* start
+        cdef const unsigned char* buf
+        cdef c_impl.FcCharSet* charset
+        cdef c_impl.FcChar32 count, base, word, i
+        cdef int j, bit
+        cdef bint ok = True
+
+        count = self.read_u32()
+        if count > <size_t>(self.end - self.pos) // _CHARSET_PAGE_SIZE:
+            self.invalid()
+        start = self.take(<size_t>count * _CHARSET_PAGE_SIZE)
+        for i in range(count):
+            base = _ReadUInt32(start + i * _CHARSET_PAGE_SIZE)
+            if base & 0xFF or base > 0x10FF00:
+                self.invalid()
+
+        charset = c_impl.FcCharSetCreate()
+        if charset is NULL:
+            raise MemoryError()
+        with nogil:
+            for i in range(count):
+                buf = start + i * _CHARSET_PAGE_SIZE
+                base = _ReadUInt32(buf)
+                for j in range(8):
+                    word = _ReadUInt32(buf + 4 + 4 * j)
+                    bit = 0
+                    while word:
+                        if word & 1:
+                            if not c_impl.FcCharSetAddChar(charset, base + 32 * j + bit):
+                                ok = False
+                        word >>= 1
+                        bit += 1
+        if not ok:
+            c_impl.FcCharSetDestroy(charset)
+            raise MemoryError()
+        return charset
+
+    cdef c_impl.FcLangSet* read_langset(self) except NULL:
+        cdef c_impl.FcChar32 count, i
+        cdef c_impl.FcLangSet* lang_set = c_impl.FcLangSetCreate()
+        if lang_set is NULL:
+            raise MemoryError()
+        try:
+            count = self.read_u32()
+            for i in range(count):
+                if not c_impl.FcLangSetAdd(lang_set, self.read_inline_string()):
+                    raise MemoryError()
+        except BaseException:
+            c_impl.FcLangSetDestroy(lang_set)
+            raise
+        return lang_set
+
+    cdef int read_value(self, c_impl.FcPattern* pattern, const char* object) except -1:
+        cdef c_impl.FcValue value
+        cdef c_impl.FcMatrix matrix
+        cdef c_impl.FcCharSet* charset = NULL
+        cdef c_impl.FcLangSet* lang_set = NULL
+        cdef c_impl.FcRange* range = NULL
+        cdef double begin, end
+        cdef c_impl.FcBool ok
+        cdef unsigned char binding
+
+        value.type = <c_impl.FcType>self.read_u8()
+        binding = self.read_u8()
+        if value.type == c_impl.FcTypeVoid:
+            value.u.s = NULL
+        elif value.type == c_impl.FcTypeInteger:
+            value.u.i = <int32_t>self.read_u32()
+        elif value.type == c_impl.FcTypeDouble:
+            value.u.d = self.read_double()
+        elif value.type == c_impl.FcTypeString:
+            value.u.s = self.read_string()
+        elif value.type == c_impl.FcTypeBool:
+            value.u.b = <c_impl.FcBool>self.read_u32()
+        elif value.type == c_impl.FcTypeMatrix:
+            matrix.xx = self.read_double()
+            matrix.xy = self.read_double()
+            matrix.yx = self.read_double()
+            matrix.yy = self.read_double()
+            value.u.m = &matrix
+        elif value.type == c_impl.FcTypeCharSet:
+            charset = self.read_charset()
+            value.u.c = charset
+        elif value.type == c_impl.FcTypeLangSet:
+            lang_set = self.read_langset()
+            value.u.l = lang_set
+        elif value.type == c_impl.FcTypeRange:
+            begin = self.read_double()
+            end = self.read_double()
+            range = c_impl.FcRangeCreateDouble(begin, end)
+            if range is NULL:
+                raise MemoryError()
+            value.u.r = range
+        else:
+            self.invalid()
+
+        # Values are copied into the pattern.
+        if binding == c_impl.FcValueBindingWeak:
+            ok = c_impl.FcPatternAddWeak(pattern, object, value, True)
+        else:
+            ok = c_impl.FcPatternAdd(pattern, object, value, True)
+        if charset is not NULL:
+            c_impl.FcCharSetDestroy(charset)
+        if lang_set is not NULL:
+            c_impl.FcLangSetDestroy(lang_set)
+        if range is not NULL:
+            c_impl.FcRangeDestroy(range)
+        if not ok:
+            # The value type does not match the object.
+            self.invalid()
+        return 0
+
+    cdef c_impl.FcPattern* read_pattern(self) except NULL:
+        cdef c_impl.FcChar32 count, i, n, j
+        cdef const char* object
+        cdef c_impl.FcPattern* pattern = c_impl.FcPatternCreate()
+        if pattern is NULL:
+            raise MemoryError()
+        try:
+            count = self.read_u32()
+            for i in range(count):
+                object = <const char*>self.read_string()
+                n = self.read_u32()
+                for j in range(n):
+                    self.read_value(pattern, object)
+        except BaseException:
+            c_impl.FcPatternDestroy(pattern)
+            raise
+        return pattern
+
+
+cdef str _UTF32 = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+cdef tuple _NATIVE_PREFIXES = ("@", "=", "<" if sys.byteorder == "little" else ">")
+
+
+cdef bytes _CodepointsToBytes(object chars):
+    """Pack characters into native-endian 32-bit codepoints."""
+    if isinstance(chars, str):
+        return (<str>chars).encode(_UTF32, "surrogatepass")
+    try:
+        view = memoryview(chars)
+    except TypeError:
+        view = None
+    if view is not None and view.ndim == 1 and view.itemsize == 4:
+        fmt = view.format
+        if fmt[:1] in _NATIVE_PREFIXES:
+            fmt = fmt[1:]
+        if fmt in ("I", "i", "L", "l"):
+            data = view.tobytes()
+            _CheckCodepoints(data, fmt.islower())
+            return data
+
+    packed = array.array("I")
+    for item in chars:
+        if isinstance(item, str):
+            if len(item) != 1:
+                raise ValueError("String must be exactly one character")
+            packed.append(ord(item))
+        elif isinstance(item, int):
+            if item < 0 or item > 0x10FFFF:
+                raise ValueError("Codepoint %d out of valid range (0-0x10FFFF)" % item)
+            packed.append(item)
+        else:
+            raise TypeError("Expected str or int, got %s" % type(item))
+    return packed.tobytes()
+
+
+cdef CharSet _WrapNewCharSet(c_impl.FcCharSet* ptr):
+    if ptr is NULL:
+        raise MemoryError()
+    return CharSet(<intptr_t>ptr)
+
+
+cdef CharSet _AsCharSet(object value):
+    if isinstance(value, CharSet):
+        return <CharSet>value
+    return CharSet(<intptr_t>_ObjectToFcCharSet(value))
+
+
+cdef int _CheckCodepoints(bytes data, bint signed) except -1:
+    """Raise ValueError unless all packed codepoints are valid."""
+    cdef const char* buf = data
+    cdef Py_ssize_t i
+    cdef c_impl.FcChar32 codepoint
+    for i in range(len(data) // 4):
+        memcpy(&codepoint, buf + 4 * i, 4)
+        if codepoint > 0x10FFFF:
+            raise ValueError(
+                "Codepoint %d out of valid range (0-0x10FFFF)"
+                % (<int32_t>codepoint if signed else codepoint)
+            )
+    return 0
+
+
+cdef int _AddCodepoints(c_impl.FcCharSet* charset, bytes data) except -1:
+    """Add packed codepoints from _CodepointsToBytes to a charset."""
+    cdef const char* buf = data
+    cdef Py_ssize_t n = len(data) // 4
+    cdef Py_ssize_t i
+    cdef bint ok = True
+    cdef c_impl.FcChar32 codepoint
+    with nogil:
+        for i in range(n):
+            memcpy(&codepoint, buf + 4 * i, 4)
+            if not c_impl.FcCharSetAddChar(charset, codepoint):
+                ok = False
+                break
+    if not ok:
+        raise ValueError("Failed to add codepoint: %d" % codepoint)
+    return 0
+
+
 cdef object _FcCharSetToObject(const c_impl.FcCharSet* charset):
     cdef c_impl.FcCharSet* charset_copy
 
@@ -881,7 +2628,7 @@ cdef object _FcValueToObject(c_impl.FcValue* value):
     elif value.type == c_impl.FcTypeCharSet:
         return _FcCharSetToObject(value.u.c)
     elif value.type == c_impl.FcTypeLangSet:
-        return _FcLangSetToObject(value.u.l)
+        return _WrapNewLangSet(c_impl.FcLangSetCopy(value.u.l))
     elif value.type == c_impl.FcTypeFTFace:
         logger.warning("FTFace is not supported yet")
         return None
@@ -1017,12 +2764,17 @@ cdef class FontSet:
     cdef bint _owner
 
     def __cinit__(self, ptr: int, owner: bool = True):
+        global _live_objects
         self._ptr = <c_impl.FcFontSet*>(<intptr_t>ptr)
         self._owner = owner
+        if self._owner and self._ptr is not NULL:
+            _live_objects += 1
 
     def __dealloc__(self):
+        global _live_objects
         if self._owner and self._ptr is not NULL:
             c_impl.FcFontSetDestroy(self._ptr)
+            _live_objects -= 1
 
     cdef intptr_t ptr(self):
         return <intptr_t>self._ptr
@@ -1035,9 +2787,65 @@ cdef class FontSet:
             raise MemoryError()
         return cls(<intptr_t>ptr)
 
-    def add(self, pattern: Pattern) -> bool:
-        """Add to a font set"""
-        return c_impl.FcFontSetAdd(self._ptr, pattern._ptr)
+    @classmethod
+    def from_buffer(cls, buffer, name: str = "") -> FontSet:
+        """Create a FontSet of all faces of font data in memory.
+
+        See :py:func:`query_bytes`.
+        """
+        return query_bytes(buffer, name=name)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> FontSet:
+        """Create a FontSet from the output of :py:meth:`to_bytes`.
+
+        Example::
+            fonts = FontSet.from_bytes(cached_data)
+        """
+        cdef _Reader reader = _Reader("FontSet")
+        cdef c_impl.FcPattern* pattern
+        cdef c_impl.FcChar32 count, i
+        reader.load(data, _FONTSET_MAGIC)
+        font_set = cls.create()
+        count = reader.read_u32()
+        for i in range(count):
+            pattern = reader.read_pattern()
+            if not c_impl.FcFontSetAdd((<FontSet>font_set)._ptr, pattern):
+                c_impl.FcPatternDestroy(pattern)
+                raise MemoryError()
+        reader.finish()
+        return font_set
+
+    def to_bytes(self) -> bytes:
+        """Serialize the font set in a compact binary format.
+
+        See :py:meth:`Pattern.to_bytes`. The string table is shared by all
+        patterns, so repeated object names, families and styles are stored
+        once. Font sets are also picklable through this format.
+
+        Example::
+            fonts = config.font_sort(pattern, trim=True)
+            data = fonts.to_bytes()
+            assert len(FontSet.from_bytes(data)) == len(fonts)
+        """
+        cdef _Writer writer = _Writer()
+        cdef int i
+        writer.write_u32(self._ptr.nfont)
+        for i in range(self._ptr.nfont):
+            writer.write_pattern(self._ptr.fonts[i])
+        return writer.getvalue(_FONTSET_MAGIC)
+
+    def __reduce__(self):
+        return (FontSet.from_bytes, (self.to_bytes(),))
+
+    def add(self, pattern: Pattern) -> bool:
+        """Add to a font set"""
+        # The font set takes ownership of a reference to the pattern.
+        c_impl.FcPatternReference(pattern._ptr)
+        if not c_impl.FcFontSetAdd(self._ptr, pattern._ptr):
+            c_impl.FcPatternDestroy(pattern._ptr)
+            return False
+        return True
 
     def print(self) -> None:
         """Print a set of patterns to stdout"""
@@ -1060,6 +2868,1788 @@ cdef class FontSet:
             index += self._ptr.nfont
         return Pattern(<intptr_t>self._ptr.fonts[index], owner=False)
 
+    def filter_by_lang(self, langs: Union[LangSet, Iterable[str]]) -> FontSet:
+        """Return the fonts supporting all of the given languages.
+
+        The ``lang`` property of each font is checked in one pass without the
+        GIL, with :py:meth:`LangSet.__ge__` semantics. Fonts without a ``lang``
+        property are skipped, so include ``lang`` when listing fonts.
+
+        Example::
+
+            fonts = config.get_fonts()
+            for font in fonts.filter_by_lang(["ja", "ko", "zh-cn"]):
+                print(font.get("family"))
+
+        :param langs: LangSet or language tags.
+        :return: New FontSet sharing the matching patterns.
+        """
+        cdef c_impl.FcLangSet* required = _ObjectToFcLangSet(langs)
+        cdef c_impl.FcFontSet* result = c_impl.FcFontSetCreate()
+        cdef c_impl.FcFontSet* fonts = self._ptr
+        cdef c_impl.FcLangSet* font_langs
+        cdef c_impl.FcPattern* font
+        cdef bint ok = True
+        cdef int i
+        if result is NULL:
+            c_impl.FcLangSetDestroy(required)
+            raise MemoryError()
+        with nogil:
+            for i in range(fonts.nfont):
+                font = fonts.fonts[i]
+                if c_impl.FcPatternGetLangSet(font, b"lang", 0, &font_langs) != c_impl.FcResultMatch:
+                    continue
+                if not c_impl.FcLangSetContains(font_langs, required):
+                    continue
+                c_impl.FcPatternReference(font)
+                if not c_impl.FcFontSetAdd(result, font):
+                    c_impl.FcPatternDestroy(font)
+                    ok = False
+                    break
+            c_impl.FcLangSetDestroy(required)
+        font_set = FontSet(<intptr_t>result)
+        if not ok:
+            raise MemoryError()
+        return font_set
+
+    def to_columns(
+        self, select: Iterable[str] = ("family", "file", "style")
+    ) -> Dict[str, Column]:
+        """Export properties as typed columns, one entry per font.
+
+        Only the first value of each property is exported. See
+        :py:class:`Column` for the layout of each kind.
+
+        Example::
+
+            columns = font_set.to_columns(("family", "slant", "weight"))
+            slants = numpy.frombuffer(columns["slant"].data, dtype="i8")
+            weights = numpy.frombuffer(columns["weight"].data, dtype="f8").reshape(-1, 2)
+        """
+        return {name: _FcFontSetToColumn(self._ptr, name) for name in select}
+
+
+class Column(NamedTuple):
+    """A property of a :py:class:`FontSet` as contiguous arrays.
+
+    ``kind`` is one of:
+
+    - ``"int"``: ``data`` is an ``array('q')``
+    - ``"double"``: ``data`` is an ``array('d')``
+    - ``"bool"``: ``data`` is an ``array('B')`` of 0 or 1
+    - ``"range"``: ``data`` is an ``array('d')`` of ``begin, end`` pairs
+    - ``"string"``: ``data`` is UTF-8 ``bytes`` and value ``i`` is
+      ``data[offsets[i]:offsets[i + 1]]``
+
+    ``valid`` holds one byte per font, 0 where the font lacks the property.
+    All arrays support the buffer protocol, e.g., ``numpy.frombuffer``.
+    """
+
+    kind: str
+    data: Union[array.array, bytes]
+    offsets: Optional[array.array]
+    valid: bytes
+
+    def to_pylist(self) -> List[Any]:
+        """Convert to a list of Python values, with None for missing ones."""
+        if self.kind == "string":
+            values = [
+                self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+                for i in range(len(self.valid))
+            ]
+        elif self.kind == "range":
+            values = [
+                (self.data[2 * i], self.data[2 * i + 1]) for i in range(len(self.valid))
+            ]
+        elif self.kind == "bool":
+            values = [bool(value) for value in self.data]
+        else:
+            values = self.data.tolist()
+        return [value if ok else None for value, ok in zip(values, self.valid)]
+
+
+cdef object _FcFontSetToColumn(c_impl.FcFontSet* font_set, str name):
+    """Collect the first value of a property across a font set.
+
+    Values of another type than the property's, which fontconfig does not
+    convert, are marked invalid.
+    """
+    cdef bytes key = name.encode("utf-8")
+    cdef const c_impl.FcObjectType* object_type = c_impl.FcNameGetObjectType(key)
+    cdef c_impl.FcType kind
+    cdef c_impl.FcValue value
+    cdef int n = font_set.nfont
+    cdef int i
+    cdef int width
+    cdef bint ok
+    cdef size_t size
+    cdef Py_ssize_t total = 0
+    cdef Py_ssize_t capacity = 0
+    cdef char* data = NULL
+    cdef char* grown
+    cdef char* out = NULL
+    cdef int64_t* offsets = NULL
+    cdef double begin, end
+    cdef bytearray valid
+    cdef bytearray fixed = None
+    cdef bytearray offset_bytes = None
+
+    if object_type is NULL:
+        raise ValueError("Unknown property: %s" % name)
+    kind = object_type.type
+    if kind == c_impl.FcTypeInteger or kind == c_impl.FcTypeDouble:
+        width = 8
+    elif kind == c_impl.FcTypeBool:
+        width = 1
+    elif kind == c_impl.FcTypeRange:
+        width = 16
+    elif kind == c_impl.FcTypeString:
+        width = 0
+    else:
+        raise ValueError("Unsupported property type for columns: %s" % name)
+
+    # Zero-filled, so fonts without a valid value need no writes.
+    valid = bytearray(n)
+    if kind == c_impl.FcTypeString:
+        offset_bytes = bytearray((n + 1) * sizeof(int64_t))
+        offsets = <int64_t*><char*>offset_bytes
+    else:
+        fixed = bytearray(<Py_ssize_t>n * width)
+        out = <char*>fixed
+    try:
+        for i in range(n):
+            if c_impl.FcPatternGet(font_set.fonts[i], key, 0, &value) != c_impl.FcResultMatch:
+                ok = False
+            elif kind == c_impl.FcTypeString:
+                ok = value.type == c_impl.FcTypeString
+                if ok:
+                    size = strlen(<const char*>value.u.s)
+                    if total + <Py_ssize_t>size > capacity:
+                        capacity = max(2 * capacity, total + <Py_ssize_t>size, 256)
+                        grown = <char*>PyMem_Realloc(data, capacity)
+                        if grown is NULL:
+                            raise MemoryError()
+                        data = grown
+                    memcpy(data + total, value.u.s, size)
+                    total += size
+            elif kind == c_impl.FcTypeInteger:
+                ok = value.type == c_impl.FcTypeInteger or value.type == c_impl.FcTypeDouble
+                if ok:
+                    (<int64_t*>out)[i] = (
+                        value.u.i if value.type == c_impl.FcTypeInteger
+                        else <int64_t>value.u.d
+                    )
+            elif kind == c_impl.FcTypeDouble:
+                ok = value.type == c_impl.FcTypeDouble or value.type == c_impl.FcTypeInteger
+                if ok:
+                    (<double*>out)[i] = (
+                        value.u.d if value.type == c_impl.FcTypeDouble
+                        else <double>value.u.i
+                    )
+            elif kind == c_impl.FcTypeBool:
+                ok = value.type == c_impl.FcTypeBool
+                if ok:
+                    out[i] = value.u.b != 0
+            else:
+                ok = True
+                if value.type == c_impl.FcTypeRange:
+                    c_impl.FcRangeGetDouble(value.u.r, &begin, &end)
+                elif value.type == c_impl.FcTypeInteger:
+                    begin = end = value.u.i
+                elif value.type == c_impl.FcTypeDouble:
+                    begin = end = value.u.d
+                else:
+                    ok = False
+                if ok:
+                    (<double*>out)[2 * i] = begin
+                    (<double*>out)[2 * i + 1] = end
+            if ok:
+                valid[i] = 1
+            if offsets is not NULL:
+                offsets[i + 1] = total
+
+        if kind == c_impl.FcTypeString:
+            offsets_array = array.array("q")
+            offsets_array.frombytes(offset_bytes)
+            return Column("string", data[:total] if total else b"", offsets_array, bytes(valid))
+        if kind == c_impl.FcTypeInteger:
+            column_kind, typecode = "int", "q"
+        elif kind == c_impl.FcTypeDouble:
+            column_kind, typecode = "double", "d"
+        elif kind == c_impl.FcTypeBool:
+            column_kind, typecode = "bool", "B"
+        else:
+            column_kind, typecode = "range", "d"
+        values = array.array(typecode)
+        values.frombytes(fixed)
+        return Column(column_kind, values, None, bytes(valid))
+    finally:
+        PyMem_Free(data)
+
+
+cdef tuple _config_fingerprint(Config config):
+    """Return a cheap summary of the font sets of a config."""
+    cdef c_impl.FcConfig* ptr = config._reference()
+    cdef c_impl.FcFontSet* system = c_impl.FcConfigGetFonts(ptr, c_impl.FcSetSystem)
+    cdef c_impl.FcFontSet* application = c_impl.FcConfigGetFonts(
+        ptr, c_impl.FcSetApplication)
+    c_impl.FcConfigDestroy(ptr)
+    return (
+        _config_generation,
+        <intptr_t>system,
+        system.nfont if system is not NULL else 0,
+        <intptr_t>application,
+        application.nfont if application is not NULL else 0,
+    )
+
+
+class MatchCache:
+    """
+    LRU cache of :py:func:`match` and :py:func:`sort` results.
+
+    Results are keyed on the requested pattern (compared with
+    ``FcPatternHash`` and ``FcPatternEqual``), the ``select`` properties and
+    the config. The cache drops all entries when the font sets of a config
+    change, for example after :py:meth:`Config.app_font_add_dir` or
+    :py:meth:`Config.build_fonts`, when a config is freed or replaced with
+    :py:meth:`Config.set_current`, since a new config may then reuse its
+    address, or when :py:meth:`Config.upto_date` starts reporting stale
+    configuration files. The latter check touches the file
+    system and runs at most once every ``check_interval`` seconds.
+
+    A cache is thread-safe and can be shared between threads.
+
+    Example::
+
+        cache = fontconfig.MatchCache(maxsize=4096)
+        for text_run in document:
+            font = fontconfig.match(text_run.pattern, cache=cache)
+        print(cache.stats())
+
+    :param int maxsize: Maximum number of cached results.
+    :param float check_interval: Seconds between :py:meth:`Config.upto_date` checks.
+    """
+
+    def __init__(self, maxsize: int = 1024, check_interval: float = 1.0) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive: %d" % maxsize)
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._upto_date = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self._upto_date.clear()
+            self._checked.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss, eviction and invalidation counts"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def _validate(self, config: Config) -> None:
+        # Must be called with the lock held.
+        key = config.ptr()
+        fingerprint = _config_fingerprint(config)
+        stale = self._fingerprints.get(key, fingerprint) != fingerprint
+        if stale:
+            # Configs seen before may have been freed, and their addresses
+            # reused, so forget them along with the entries.
+            self._fingerprints.clear()
+            self._upto_date.clear()
+            self._checked.clear()
+        self._fingerprints[key] = fingerprint
+
+        now = time.monotonic()
+        if now - self._checked.get(key, -self.check_interval) >= self.check_interval:
+            self._checked[key] = now
+            upto_date = config.upto_date()
+            if self._upto_date.get(key, True) and not upto_date:
+                stale = True
+            self._upto_date[key] = upto_date
+
+        if stale and self._entries:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def _get(self, config: Config, key: tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            self._validate(config)
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def _put(self, key: tuple, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+cdef class Cache:
+    """A cache of the fonts in one directory.
+
+    Caches are normally maintained by :py:meth:`Config.build_fonts`. This
+    class reads, validates and rebuilds them explicitly, e.g., to pre-build
+    caches while building a container image, so that the first lookup at
+    runtime does not scan any font file.
+
+    Example::
+
+        # Load the cache of a directory, building it if missing or stale
+        cache = fontconfig.Cache.read("/usr/share/fonts/truetype")
+        print(cache.dir, cache.num_font, cache.subdirs)
+
+        # Fonts of the directory, without building the font database
+        fonts = cache.get_fonts()
+
+        if not fontconfig.Cache.is_valid("/opt/fonts"):
+            fontconfig.Cache.read("/opt/fonts", force=True)
+    """
+    cdef c_impl.FcCache* _ptr
+
+    def __cinit__(self, ptr: int):
+        global _live_objects
+        self._ptr = <c_impl.FcCache*>(<intptr_t>ptr)
+        if self._ptr is not NULL:
+            _live_objects += 1
+
+    def __dealloc__(self):
+        global _live_objects
+        if self._ptr is not NULL:
+            c_impl.FcDirCacheUnload(self._ptr)
+            _live_objects -= 1
+
+    cdef intptr_t ptr(self):
+        return <intptr_t>self._ptr
+
+    @classmethod
+    def load(cls, dir: str, config: Optional[Config] = None) -> Optional[Cache]:
+        """Load the cache of a directory, or None if there is no valid cache"""
+        cdef bytes dir_ = dir.encode("utf-8")
+        cdef const c_impl.FcChar8* dir_ptr = <const c_impl.FcChar8*>(dir_)
+        cdef c_impl.FcConfig* config_ptr = _CacheConfig(config)
+        cdef c_impl.FcCache* ptr
+        with nogil:
+            ptr = c_impl.FcDirCacheLoad(dir_ptr, config_ptr, NULL)
+            c_impl.FcConfigDestroy(config_ptr)
+        if ptr is NULL:
+            return None
+        return cls(<intptr_t>ptr)
+
+    @classmethod
+    def read(
+        cls, dir: str, force: bool = False, config: Optional[Config] = None
+    ) -> Optional[Cache]:
+        """Load the cache of a directory, scanning the directory and writing
+        the cache if it is missing or stale, or if ``force`` is True.
+
+        Return None if the directory cannot be scanned.
+        """
+        cdef bytes dir_ = dir.encode("utf-8")
+        cdef const c_impl.FcChar8* dir_ptr = <const c_impl.FcChar8*>(dir_)
+        cdef c_impl.FcBool force_ = <c_impl.FcBool>force
+        cdef c_impl.FcConfig* config_ptr = _CacheConfig(config)
+        cdef c_impl.FcCache* ptr
+        with nogil:
+            ptr = c_impl.FcDirCacheRead(dir_ptr, force_, config_ptr)
+            c_impl.FcConfigDestroy(config_ptr)
+        if ptr is NULL:
+            return None
+        return cls(<intptr_t>ptr)
+
+    @classmethod
+    def rescan(cls, dir: str, config: Optional[Config] = None) -> Optional[Cache]:
+        """Rescan a directory and update its existing cache.
+
+        Return None if the directory has no cache or cannot be scanned.
+        """
+        cdef bytes dir_ = dir.encode("utf-8")
+        cdef const c_impl.FcChar8* dir_ptr = <const c_impl.FcChar8*>(dir_)
+        cdef c_impl.FcConfig* config_ptr = _CacheConfig(config)
+        cdef c_impl.FcCache* ptr
+        with nogil:
+            ptr = c_impl.FcDirCacheRescan(dir_ptr, config_ptr)
+            c_impl.FcConfigDestroy(config_ptr)
+        if ptr is NULL:
+            return None
+        return cls(<intptr_t>ptr)
+
+    @staticmethod
+    def is_valid(dir: str) -> bool:
+        """Check whether a directory has a valid cache"""
+        cdef bytes dir_ = dir.encode("utf-8")
+        return <bint>c_impl.FcDirCacheValid(<const c_impl.FcChar8*>(dir_))
+
+    @staticmethod
+    def clean(cache_dir: str, verbose: bool = False) -> bool:
+        """Remove invalid and stale cache files from a cache directory"""
+        cdef bytes dir_ = cache_dir.encode("utf-8")
+        cdef const c_impl.FcChar8* dir_ptr = <const c_impl.FcChar8*>(dir_)
+        cdef c_impl.FcBool verbose_ = <c_impl.FcBool>verbose
+        cdef c_impl.FcBool result
+        with nogil:
+            result = c_impl.FcDirCacheClean(dir_ptr, verbose_)
+        return <bint>result
+
+    @staticmethod
+    def unlink(dir: str, config: Optional[Config] = None) -> bool:
+        """Remove the cache files of a directory"""
+        cdef bytes dir_ = dir.encode("utf-8")
+        cdef const c_impl.FcChar8* dir_ptr = <const c_impl.FcChar8*>(dir_)
+        cdef c_impl.FcConfig* config_ptr = _CacheConfig(config)
+        cdef c_impl.FcBool result
+        with nogil:
+            result = c_impl.FcDirCacheUnlink(dir_ptr, config_ptr)
+            c_impl.FcConfigDestroy(config_ptr)
+        return <bint>result
+
+    @property
+    def dir(self) -> str:
+        """Directory of the cache"""
+        return (<bytes>(c_impl.FcCacheDir(self._ptr))).decode("utf-8")
+
+    @property
+    def num_font(self) -> int:
+        """Number of fonts in the cache"""
+        return c_impl.FcCacheNumFont(self._ptr)
+
+    @property
+    def subdirs(self) -> List[str]:
+        """Subdirectories of the cached directory"""
+        return [
+            (<bytes>(c_impl.FcCacheSubdir(self._ptr, i))).decode("utf-8")
+            for i in range(c_impl.FcCacheNumSubdir(self._ptr))
+        ]
+
+    def get_fonts(self) -> FontSet:
+        """Return the fonts in the cache"""
+        ptr = c_impl.FcCacheCopySet(self._ptr)
+        if ptr is NULL:
+            raise MemoryError()
+        return FontSet(<intptr_t>ptr)
+
+    def __len__(self) -> int:
+        return c_impl.FcCacheNumFont(self._ptr)
+
+    def __repr__(self) -> str:
+        return "<Cache: %s, %d fonts>" % (self.dir, self.num_font)
+
+
+cdef c_impl.FcConfig* _CacheConfig(object config) except NULL:
+    """Return a new reference to the given or current config."""
+    if config is None:
+        config = Config.get_current()
+    return (<Config?>config)._reference()
+
+
+def build_caches(
+    dirs: Optional[Iterable[str]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    progress: Optional[Callable[[str, int], None]] = None,
+    config: Optional[Config] = None,
+) -> Dict[str, int]:
+    """
+    Build the caches of font directories and their subdirectories in parallel.
+
+    Directories are read with :py:meth:`Cache.read` on a pool of threads,
+    which scans fonts and writes the caches without holding the GIL.
+    Subdirectories found in a cache are queued as soon as it is read.
+    fontconfig writes each cache file atomically, so readers never see a
+    partial cache. Directories with a valid cache are not scanned again
+    unless ``force`` is True.
+
+    Example::
+
+        # Pre-build the caches of all configured font directories
+        counts = fontconfig.build_caches(workers=8)
+        print(sum(counts.values()), "fonts in", len(counts), "directories")
+
+        # Report progress
+        fontconfig.build_caches(["/opt/fonts"], progress=lambda d, n: print(d, n))
+
+    :param Optional[Iterable[str]] dirs: Directories to cache (default: font directories of the config).
+    :param Optional[int] workers: Number of worker threads (default: number of CPUs).
+    :param bool force: Rescan directories even if their caches are valid.
+    :param progress: Called as ``progress(dir, num_font)`` in the calling thread after each directory.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Dict mapping each cached directory to its number of fonts.
+    """
+    if config is None:
+        config = Config.get_current()
+    if dirs is None:
+        dirs = config.get_font_dirs()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 0:
+        raise ValueError("workers must be positive: %d" % workers)
+
+    def scan(path):
+        cache = Cache.read(path, force, config)
+        if cache is None:
+            return None
+        return cache.num_font, cache.subdirs
+
+    results = {}
+    seen = set()
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def submit(path):
+            if path not in seen and os.path.isdir(path):
+                seen.add(path)
+                pending[executor.submit(scan, path)] = path
+
+        for path in dirs:
+            submit(path)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                result = future.result()
+                if result is None:
+                    logger.warning("Failed to cache font directory: %s", path)
+                    continue
+                results[path] = result[0]
+                for subdir in result[1]:
+                    submit(subdir)
+                if progress is not None:
+                    progress(path, result[0])
+    return results
+
+
+def query_file(path: str, index: Optional[int] = None) -> Union[FontSet, Optional[Pattern]]:
+    """
+    Read the font properties of a font file, without adding it to a config.
+
+    With ``index=None``, return a :py:class:`FontSet` of all faces in the
+    file, including the faces of font collections and the named instances
+    of variable fonts. The set is empty if the file is not a font.
+
+    With an integer ``index``, return the :py:class:`Pattern` of that face,
+    or None if there is no such face. The lower 16 bits select the face and
+    the upper bits the named instance plus one, as in the ``index`` property.
+
+    Example::
+
+        fonts = fontconfig.query_file("/path/to/NotoSansCJK.ttc")
+        for font in fonts:
+            print(font.get("family"), font.get("index"))
+
+        first = fontconfig.query_file("/path/to/font.ttf", index=0)
+
+    :param str path: Path to the font file.
+    :param Optional[int] index: Face index, or None for all faces.
+    :return: FontSet of all faces, or Pattern of one face.
+    """
+    cdef bytes file_ = path.encode("utf-8")
+    cdef const c_impl.FcChar8* file_ptr = <const c_impl.FcChar8*>(file_)
+    cdef unsigned int id_
+    cdef int count = 0
+    cdef c_impl.FcPattern* pattern
+    cdef c_impl.FcFontSet* fonts
+
+    if index is not None:
+        if index < 0:
+            raise ValueError("Invalid index: %d" % index)
+        id_ = <unsigned int>index
+        with nogil:
+            pattern = c_impl.FcFreeTypeQuery(file_ptr, id_, NULL, &count)
+        if pattern is NULL:
+            return None
+        return Pattern(<intptr_t>pattern)
+
+    fonts = c_impl.FcFontSetCreate()
+    if fonts is NULL:
+        raise MemoryError()
+    font_set = FontSet(<intptr_t>fonts)
+    with nogil:
+        c_impl.FcFreeTypeQueryAll(file_ptr, <unsigned int>-1, NULL, &count, fonts)
+    return font_set
+
+
+def query_files(paths: Iterable[str], workers: Optional[int] = None) -> List[FontSet]:
+    """
+    Read the font properties of many font files in parallel.
+
+    Files are queried with :py:func:`query_file` on a pool of threads, which
+    parse the files without holding the GIL. No config is modified.
+
+    Example::
+
+        for path, fonts in zip(uploads, fontconfig.query_files(uploads, workers=8)):
+            if len(fonts) == 0:
+                print("Not a font:", path)
+
+    :param Iterable[str] paths: Paths to font files.
+    :param Optional[int] workers: Number of worker threads (default: number of CPUs).
+    :return: FontSet of all faces of each file, in input order.
+    """
+    paths = tuple(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 0:
+        raise ValueError("workers must be positive: %d" % workers)
+    if workers == 1 or len(paths) <= 1:
+        return [query_file(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [fonts for fonts in executor.map(query_file, paths)]
+
+
+cdef c_impl.FcPattern* _QueryMemoryFace(
+    c_impl.FT_Library library,
+    const unsigned char* data,
+    long size,
+    const c_impl.FcChar8* file,
+    unsigned int id,
+) noexcept nogil:
+    """Query one face of font data, or return NULL if there is no such face."""
+    cdef c_impl.FT_Face face
+    cdef c_impl.FcPattern* pattern
+    # The variable font pattern (instance 0x8000) is queried on the default face.
+    cdef long face_index = id & 0xFFFF if (id >> 16) == 0x8000 else id
+    if c_impl.FT_New_Memory_Face(library, data, size, face_index, &face) != 0:
+        return NULL
+    pattern = c_impl.FcFreeTypeQueryFace(face, file, id, NULL)
+    c_impl.FT_Done_Face(face)
+    return pattern
+
+
+cdef bint _AddFacePattern(
+    c_impl.FT_Face face,
+    const c_impl.FcChar8* file,
+    unsigned int id,
+    c_impl.FcFontSet* fonts,
+) noexcept nogil:
+    """Query a face and add its pattern if any; return False on allocation failure."""
+    cdef c_impl.FcPattern* pattern = c_impl.FcFreeTypeQueryFace(face, file, id, NULL)
+    if pattern is not NULL and not c_impl.FcFontSetAdd(fonts, pattern):
+        c_impl.FcPatternDestroy(pattern)
+        return False
+    return True
+
+
+cdef bint _QueryMemoryFaces(
+    c_impl.FT_Library library,
+    const unsigned char* data,
+    long size,
+    const c_impl.FcChar8* file,
+    c_impl.FcFontSet* fonts,
+) noexcept nogil:
+    """Add the patterns of all faces of font data, as FcFreeTypeQueryAll does."""
+    cdef c_impl.FT_Face face
+    cdef c_impl.FT_MM_Var* mm_var
+    cdef unsigned int face_num, instance_num, axis
+    cdef bint ok = True, is_default
+
+    for face_num in range(0x10000):
+        if c_impl.FT_New_Memory_Face(library, data, size, face_num, &face) != 0:
+            break
+        # Default instance, then named instances, then the variable font.
+        ok = _AddFacePattern(face, file, face_num, fonts)
+        if ok and c_impl.FT_Get_MM_Var(face, &mm_var) == 0:
+            for instance_num in range(1, mm_var.num_namedstyles + 1):
+                # Skip named instances that coincide with the default instance.
+                is_default = True
+                for axis in range(mm_var.num_axis):
+                    if mm_var.namedstyle[instance_num - 1].coords[axis] != mm_var.axis[axis].def_:
+                        is_default = False
+                        break
+                if is_default:
+                    continue
+                c_impl.FT_Set_Var_Design_Coordinates(
+                    face, mm_var.num_axis, mm_var.namedstyle[instance_num - 1].coords
+                )
+                ok = _AddFacePattern(face, file, (instance_num << 16) | face_num, fonts)
+                if not ok:
+                    break
+            if ok:
+                c_impl.FT_Set_Var_Design_Coordinates(face, 0, NULL)
+                ok = _AddFacePattern(face, file, (<unsigned int>0x8000 << 16) | face_num, fonts)
+            c_impl.FT_Done_MM_Var(library, mm_var)
+        c_impl.FT_Done_Face(face)
+        if not ok:
+            break
+    return ok
+
+
+def query_bytes(
+    buffer, name: str = "", index: Optional[int] = None
+) -> Union[FontSet, Optional[Pattern]]:
+    """
+    Read the font properties of font data in memory, without a file.
+
+    This is :py:func:`query_file` for fonts held as bytes, e.g., uploads read
+    from object storage. ``bytes`` are parsed in place; other buffers, such as
+    ``bytearray`` or ``memoryview``, are copied once. The ``file`` property of
+    the patterns is set to ``name``, or left unset if ``name`` is empty.
+
+    Example::
+
+        data = blob.download()
+        fonts = fontconfig.query_bytes(data, name="uploads/MyFont.ttf")
+        for font in fonts:
+            print(font.get("family"), font.get("style"), font.get("variable"))
+
+    Fonts in memory cannot be added to a :py:class:`Config` as application
+    fonts; match against the returned set with :py:meth:`Config.font_set_match`
+    instead.
+
+    :param buffer: Font data as bytes or an object supporting the buffer protocol.
+    :param str name: Value of the ``file`` property, or empty for none.
+    :param Optional[int] index: Face index, or None for all faces.
+    :return: FontSet of all faces, or Pattern of one face.
+    """
+    cdef bytes data = buffer if type(buffer) is bytes else memoryview(buffer).tobytes()
+    cdef const unsigned char* data_ptr = <const unsigned char*>(<const char*>data)
+    cdef long size = len(data)
+    cdef bytes name_ = name.encode("utf-8")
+    cdef const c_impl.FcChar8* name_ptr = NULL
+    cdef c_impl.FT_Library library
+    cdef c_impl.FcPattern* pattern = NULL
+    cdef c_impl.FcFontSet* fonts
+    cdef unsigned int id_
+    cdef bint ok = True
+    cdef bint single = index is not None
+
+    if name_:
+        name_ptr = <const c_impl.FcChar8*>(name_)
+    if single:
+        if index < 0:
+            raise ValueError("Invalid index: %d" % index)
+        id_ = <unsigned int>index
+    else:
+        fonts = c_impl.FcFontSetCreate()
+        if fonts is NULL:
+            raise MemoryError()
+        font_set = FontSet(<intptr_t>fonts)
+
+    # A FreeType library per call, as FT_Library handles are not thread-safe.
+    if c_impl.FT_Init_FreeType(&library) != 0:
+        raise RuntimeError("Failed to initialize FreeType")
+    with nogil:
+        if single:
+            pattern = _QueryMemoryFace(library, data_ptr, size, name_ptr, id_)
+        else:
+            ok = _QueryMemoryFaces(library, data_ptr, size, name_ptr, fonts)
+        c_impl.FT_Done_FreeType(library)
+
+    if single:
+        if pattern is NULL:
+            return None
+        return Pattern(<intptr_t>pattern)
+    if not ok:
+        raise MemoryError()
+    return font_set
+
+
+cdef int _NUM_PAGES = 0x110000 >> 8
+cdef bytes _COVERAGE_MAGIC = b"FcCI"
+cdef int _COVERAGE_VERSION = 1
+
+
+cdef inline int _PopCount32(uint32_t x) noexcept nogil:
+    x = x - ((x >> 1) & 0x55555555)
+    x = (x & 0x33333333) + ((x >> 2) & 0x33333333)
+    x = (x + (x >> 4)) & 0x0F0F0F0F
+    return <int>((x * 0x01010101) >> 24)
+
+
+def _coverage_json_default(value: Any) -> Any:
+    """Encode LangSet values of CoverageIndex fonts for JSON."""
+    if isinstance(value, LangSet):
+        return {"__langset__": sorted(value)}
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def _coverage_json_object(obj: Dict[str, Any]) -> Any:
+    """Decode values encoded by _coverage_json_default."""
+    if len(obj) == 1 and "__langset__" in obj:
+        return LangSet.from_langs(obj["__langset__"])
+    return obj
+
+
+cdef bytes _LittleEndianWords(bytes data):
+    """Convert between native and little-endian 32-bit words."""
+    if sys.byteorder == "little":
+        return data
+    words = array.array("I")
+    words.frombytes(data)
+    words.byteswap()
+    return words.tobytes()
+
+
+cdef class CoverageIndex:
+    """Index of the characters covered by a set of fonts.
+
+    The index maps each Unicode page (256 codepoints) to a bitmap of the fonts
+    having characters on the page, plus the per-font character bitmaps of the
+    page. Finding the fonts that cover a text is then a few bitmap operations
+    per page of the text, instead of a charset lookup per font and character.
+
+    The index is a snapshot: rebuild it when the fonts of the config change,
+    e.g., after :py:meth:`Config.app_font_add_dir`.
+
+    Example::
+
+        index = fontconfig.CoverageIndex.from_config()
+        index.save("coverage.idx")
+
+        index = fontconfig.CoverageIndex.load("coverage.idx")
+        for font in index.covering("こんにちは"):
+            print(font["family"], font["file"])
+        for font, count in index.best("Hello, 世界", n=3):
+            print(font["family"], count)
+    """
+    cdef int _nfonts
+    cdef int _words
+    cdef int _npages
+    cdef Py_ssize_t _nleaves
+    cdef int32_t* _slots
+    cdef uint32_t* _pages
+    cdef uint32_t* _offsets
+    cdef uint32_t* _leaf_fonts
+    cdef uint32_t* _leaf_bits
+    cdef uint64_t* _presence
+    cdef tuple _fonts
+
+    def __cinit__(self):
+        self._fonts = ()
+        self._allocate(0, 0, 0)
+        self._index_pages()
+
+    def __dealloc__(self):
+        self._release()
+
+    cdef void _release(self):
+        PyMem_Free(self._slots)
+        PyMem_Free(self._pages)
+        PyMem_Free(self._offsets)
+        PyMem_Free(self._leaf_fonts)
+        PyMem_Free(self._leaf_bits)
+        PyMem_Free(self._presence)
+        self._slots = NULL
+        self._pages = NULL
+        self._offsets = NULL
+        self._leaf_fonts = NULL
+        self._leaf_bits = NULL
+        self._presence = NULL
+
+    cdef int _allocate(self, int nfonts, int npages, Py_ssize_t nleaves) except -1:
+        self._release()
+        self._nfonts = nfonts
+        self._words = (nfonts + 63) // 64
+        self._npages = npages
+        self._nleaves = nleaves
+        self._slots = <int32_t*>PyMem_Malloc(_NUM_PAGES * sizeof(int32_t))
+        self._pages = <uint32_t*>PyMem_Malloc((npages + 1) * sizeof(uint32_t))
+        self._offsets = <uint32_t*>PyMem_Malloc((npages + 1) * sizeof(uint32_t))
+        self._leaf_fonts = <uint32_t*>PyMem_Malloc((nleaves + 1) * sizeof(uint32_t))
+        self._leaf_bits = <uint32_t*>PyMem_Malloc((8 * nleaves + 1) * sizeof(uint32_t))
+        self._presence = <uint64_t*>PyMem_Malloc(
+            (<Py_ssize_t>npages * self._words + 1) * sizeof(uint64_t))
+        if (
+            self._slots is NULL or self._pages is NULL or self._offsets is NULL
+            or self._leaf_fonts is NULL or self._leaf_bits is NULL
+            or self._presence is NULL
+        ):
+            self._release()
+            raise MemoryError()
+        self._offsets[0] = 0
+        return 0
+
+    cdef void _index_pages(self) noexcept nogil:
+        """Fill the page slots and font bitmaps from the leaves."""
+        cdef int i
+        cdef uint32_t k, font
+        memset(self._slots, 0xFF, _NUM_PAGES * sizeof(int32_t))
+        memset(self._presence, 0, <Py_ssize_t>self._npages * self._words * sizeof(uint64_t))
+        for i in range(self._npages):
+            self._slots[self._pages[i]] = i
+            for k in range(self._offsets[i], self._offsets[i + 1]):
+                font = self._leaf_fonts[k]
+                self._presence[<Py_ssize_t>i * self._words + font // 64] |= (
+                    (<uint64_t>1) << (font % 64))
+
+    @classmethod
+    def build(
+        cls, font_set: FontSet, select: Iterable[str] = ("family", "style", "file", "index")
+    ) -> CoverageIndex:
+        """Build an index of fonts in a font set.
+
+        Fonts are identified by their position in the set. ``select`` lists
+        the properties kept for each font and returned by queries.
+        """
+        cdef CoverageIndex index = cls()
+        cdef c_impl.FcFontSet* fonts = font_set._ptr
+        cdef c_impl.FcCharSet* charset
+        cdef c_impl.FcChar32 map[8]
+        cdef c_impl.FcChar32 next_page, base
+        cdef uint32_t* counts
+        cdef Py_ssize_t nleaves = 0
+        cdef uint32_t k
+        cdef int i, j, page, npages = 0
+
+        select = tuple(select)
+        index._fonts = tuple(_pattern_to_dict(pattern, select) for pattern in font_set)
+
+        counts = <uint32_t*>PyMem_Malloc(_NUM_PAGES * sizeof(uint32_t))
+        if counts is NULL:
+            raise MemoryError()
+        try:
+            # First pass: count leaves per page.
+            memset(counts, 0, _NUM_PAGES * sizeof(uint32_t))
+            for i in range(fonts.nfont):
+                if c_impl.FcPatternGetCharSet(
+                    fonts.fonts[i], b"charset", 0, &charset
+                ) != c_impl.FcResultMatch:
+                    continue
+                base = c_impl.FcCharSetFirstPage(charset, map, &next_page)
+                while base != _CHARSET_DONE:
+                    counts[base >> 8] += 1
+                    nleaves += 1
+                    base = c_impl.FcCharSetNextPage(charset, map, &next_page)
+            for page in range(_NUM_PAGES):
+                if counts[page]:
+                    npages += 1
+
+            index._allocate(fonts.nfont, npages, nleaves)
+            j = 0
+            for page in range(_NUM_PAGES):
+                if counts[page]:
+                    index._pages[j] = page
+                    index._offsets[j + 1] = index._offsets[j] + counts[page]
+                    # Reuse counts as the fill position of the page.
+                    counts[page] = index._offsets[j]
+                    j += 1
+
+            # Second pass: copy the leaves, ordered by page then font.
+            for i in range(fonts.nfont):
+                if c_impl.FcPatternGetCharSet(
+                    fonts.fonts[i], b"charset", 0, &charset
+                ) != c_impl.FcResultMatch:
+                    continue
+                base = c_impl.FcCharSetFirstPage(charset, map, &next_page)
+                while base != _CHARSET_DONE:
+                    k = counts[base >> 8]
+                    counts[base >> 8] += 1
+                    index._leaf_fonts[k] = i
+                    memcpy(&index._leaf_bits[8 * <Py_ssize_t>k], map, 8 * sizeof(uint32_t))
+                    base = c_impl.FcCharSetNextPage(charset, map, &next_page)
+        finally:
+            PyMem_Free(counts)
+        index._index_pages()
+        return index
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Optional[Config] = None,
+        select: Iterable[str] = ("family", "style", "file", "index"),
+    ) -> CoverageIndex:
+        """Build an index of all fonts of a config (default: current config)."""
+        if config is None:
+            config = Config.get_current()
+        select = tuple(select)
+        object_set = ObjectSet.create()
+        object_set.build(select + ("charset",))
+        return cls.build(config.font_list(Pattern.create(), object_set), select)
+
+    @property
+    def fonts(self) -> List[Dict[str, Any]]:
+        """Properties of the indexed fonts, in font id order."""
+        return [dict(font) for font in self._fonts]
+
+    def __len__(self) -> int:
+        return self._nfonts
+
+    def __repr__(self) -> str:
+        return "<CoverageIndex: %d fonts, %d pages>" % (self._nfonts, self._npages)
+
+    def covering(self, text: object) -> List[Dict[str, Any]]:
+        """Return the fonts that cover all characters of a text.
+
+        ``text`` is a string or anything :py:meth:`CharSet.update` accepts.
+        """
+        cdef bytes data = _CodepointsToBytes(text)
+        cdef uint64_t* candidates = <uint64_t*>PyMem_Malloc((self._words + 1) * sizeof(uint64_t))
+        cdef _TextPages pages
+        cdef uint32_t k, font
+        cdef Py_ssize_t t
+        cdef int32_t slot
+        cdef int w, j
+
+        if candidates is NULL:
+            raise MemoryError()
+        try:
+            pages = _TextPages(data)
+            with nogil:
+                memset(candidates, 0xFF, self._words * sizeof(uint64_t))
+                if self._nfonts % 64:
+                    candidates[self._words - 1] = ((<uint64_t>1) << (self._nfonts % 64)) - 1
+                for t in range(pages.n):
+                    slot = self._slots[pages.pages[t]]
+                    if slot < 0:
+                        memset(candidates, 0, self._words * sizeof(uint64_t))
+                        break
+                    for w in range(self._words):
+                        candidates[w] &= self._presence[<Py_ssize_t>slot * self._words + w]
+                    for k in range(self._offsets[slot], self._offsets[slot + 1]):
+                        font = self._leaf_fonts[k]
+                        if not (candidates[font // 64] >> (font % 64)) & 1:
+                            continue
+                        for j in range(8):
+                            if (self._leaf_bits[8 * <Py_ssize_t>k + j] & pages.masks[8 * t + j]) != pages.masks[8 * t + j]:
+                                candidates[font // 64] &= ~((<uint64_t>1) << (font % 64))
+                                break
+            return [
+                dict(self._fonts[i]) for i in range(self._nfonts)
+                if (candidates[i // 64] >> (i % 64)) & 1
+            ]
+        finally:
+            PyMem_Free(candidates)
+
+    def best(self, text: object, n: int = 10) -> List[Tuple[Dict[str, Any], int]]:
+        """Return up to ``n`` fonts covering the most characters of a text.
+
+        Returns ``(font, count)`` pairs by decreasing count, where ``count`` is
+        the number of distinct characters of ``text`` the font covers. Fonts
+        covering none of them are omitted.
+        """
+        cdef bytes data = _CodepointsToBytes(text)
+        cdef uint32_t* counts = <uint32_t*>PyMem_Malloc((self._nfonts + 1) * sizeof(uint32_t))
+        cdef _TextPages pages
+        cdef uint32_t k
+        cdef Py_ssize_t t
+        cdef int32_t slot
+        cdef int j
+
+        if counts is NULL:
+            raise MemoryError()
+        try:
+            pages = _TextPages(data)
+            with nogil:
+                memset(counts, 0, self._nfonts * sizeof(uint32_t))
+                for t in range(pages.n):
+                    slot = self._slots[pages.pages[t]]
+                    if slot < 0:
+                        continue
+                    for k in range(self._offsets[slot], self._offsets[slot + 1]):
+                        for j in range(8):
+                            counts[self._leaf_fonts[k]] += _PopCount32(
+                                self._leaf_bits[8 * <Py_ssize_t>k + j] & pages.masks[8 * t + j])
+            ranked = heapq.nlargest(
+                n,
+                [i for i in range(self._nfonts) if counts[i]],
+                key=lambda i: (counts[i], -i),
+            )
+            return [(dict(self._fonts[i]), counts[i]) for i in ranked]
+        finally:
+            PyMem_Free(counts)
+
+    def save(self, path: str) -> None:
+        """Write the index to a file.
+
+        Font properties are stored as JSON, so they should be JSON-compatible
+        or :py:class:`LangSet` values, which are stored as lists of tags.
+        """
+        meta = json.dumps(self._fonts, default=_coverage_json_default).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_COVERAGE_MAGIC)
+            f.write(struct.pack(
+                "<IIIqI", _COVERAGE_VERSION, self._nfonts, self._npages,
+                self._nleaves, len(meta)))
+            f.write(meta)
+            f.write(_LittleEndianWords(
+                (<char*>self._pages)[:self._npages * sizeof(uint32_t)]))
+            f.write(_LittleEndianWords(
+                (<char*>self._offsets)[:(self._npages + 1) * sizeof(uint32_t)]))
+            f.write(_LittleEndianWords(
+                (<char*>self._leaf_fonts)[:self._nleaves * sizeof(uint32_t)]))
+            f.write(_LittleEndianWords(
+                (<char*>self._leaf_bits)[:8 * self._nleaves * sizeof(uint32_t)]))
+
+    @classmethod
+    def load(cls, path: str) -> CoverageIndex:
+        """Read an index written by :py:meth:`save`."""
+        cdef CoverageIndex index = cls()
+        cdef Py_ssize_t nleaves, size
+        cdef int nfonts, npages, i
+        cdef uint32_t k
+
+        with open(path, "rb") as f:
+            data = f.read()
+        header = struct.calcsize("<IIIqI")
+        if len(data) < 4 + header or data[:4] != _COVERAGE_MAGIC:
+            raise ValueError("Invalid CoverageIndex data")
+        version, nfonts, npages, nleaves, meta_size = struct.unpack_from("<IIIqI", data, 4)
+        if version != _COVERAGE_VERSION:
+            raise ValueError("Unsupported CoverageIndex version: %d" % version)
+        offset = 4 + header
+        size = offset + meta_size + 4 * (2 * npages + 1 + 9 * nleaves)
+        if len(data) != size or npages > _NUM_PAGES:
+            raise ValueError("Invalid CoverageIndex data")
+
+        fonts = json.loads(
+            data[offset:offset + meta_size].decode("utf-8"),
+            object_hook=_coverage_json_object)
+        if len(fonts) != nfonts:
+            raise ValueError("Invalid CoverageIndex data")
+        index._fonts = tuple(fonts)
+        index._allocate(nfonts, npages, nleaves)
+        offset += meta_size
+        for target, count in (
+            (<intptr_t>index._pages, npages),
+            (<intptr_t>index._offsets, npages + 1),
+            (<intptr_t>index._leaf_fonts, nleaves),
+            (<intptr_t>index._leaf_bits, 8 * nleaves),
+        ):
+            words = _LittleEndianWords(data[offset:offset + 4 * count])
+            memcpy(<void*><intptr_t>target, <const char*>words, 4 * count)
+            offset += 4 * count
+
+        for i in range(npages):
+            if (
+                index._pages[i] >= <uint32_t>_NUM_PAGES
+                or (i and index._pages[i] <= index._pages[i - 1])
+                or index._offsets[i] > index._offsets[i + 1]
+            ):
+                raise ValueError("Invalid CoverageIndex data")
+        if index._offsets[0] != 0 or index._offsets[npages] != nleaves:
+            raise ValueError("Invalid CoverageIndex data")
+        for k in range(nleaves):
+            if index._leaf_fonts[k] >= <uint32_t>nfonts:
+                raise ValueError("Invalid CoverageIndex data")
+        index._index_pages()
+        return index
+
+
+cdef class _TextPages:
+    """Characters of a text grouped by page, as 256-bit masks."""
+    cdef Py_ssize_t n
+    cdef uint32_t* pages
+    cdef uint32_t* masks
+
+    def __cinit__(self, bytes data):
+        cdef const char* buf = data
+        cdef Py_ssize_t count = len(data) // 4
+        cdef Py_ssize_t capacity = min(count, _NUM_PAGES)
+        cdef int32_t* seen = <int32_t*>PyMem_Malloc(_NUM_PAGES * sizeof(int32_t))
+        cdef c_impl.FcChar32 codepoint
+        cdef Py_ssize_t i
+        cdef int32_t t
+
+        self.n = 0
+        self.pages = <uint32_t*>PyMem_Malloc((capacity + 1) * sizeof(uint32_t))
+        self.masks = <uint32_t*>PyMem_Malloc((8 * capacity + 1) * sizeof(uint32_t))
+        if seen is NULL or self.pages is NULL or self.masks is NULL:
+            PyMem_Free(seen)
+            raise MemoryError()
+        with nogil:
+            memset(seen, 0xFF, _NUM_PAGES * sizeof(int32_t))
+            for i in range(count):
+                memcpy(&codepoint, buf + 4 * i, 4)
+                t = seen[codepoint >> 8]
+                if t < 0:
+                    t = <int32_t>self.n
+                    seen[codepoint >> 8] = t
+                    self.pages[t] = codepoint >> 8
+                    memset(&self.masks[8 * t], 0, 8 * sizeof(uint32_t))
+                    self.n += 1
+                self.masks[8 * t + ((codepoint & 0xFF) >> 5)] |= (
+                    (<uint32_t>1) << (codepoint & 31))
+        PyMem_Free(seen)
+
+    def __dealloc__(self):
+        PyMem_Free(self.pages)
+        PyMem_Free(self.masks)
+
+
+cdef bytes _SNAPSHOT_MAGIC = b"FcSn"
+cdef int _SNAPSHOT_VERSION = 1
+# Magic, version, counts of fonts, strings, families and family members, then
+# the offsets of the sections and the file size.
+cdef str _SNAPSHOT_HEADER = "<4sIIIII7Q"
+
+# Request properties that fontconfig ranks above the family when matching.
+# Requests having any of them are matched against all fonts of a snapshot.
+cdef tuple _SNAPSHOT_PRIORITY_KEYS = (
+    b"file", b"fontformat", b"variable", b"color", b"scalable", b"foundry", b"charset",
+)
+
+# FcDontCare, a bool value matching both true and false.
+cdef enum:
+    _FC_DONT_CARE = 2
+
+
+cdef bint _MatchesPriorityKeys(c_impl.FcPattern* request, c_impl.FcPattern* font):
+    """Whether no font can score better than font on the properties that
+    fontconfig ranks above the family.
+
+    This holds when the font lacks each requested property or has the first
+    requested value. The check is stricter than fontconfig's scores, e.g.,
+    it compares strings case-sensitively.
+    """
+    cdef c_impl.FcValue wanted, value
+    cdef int n
+    cdef bint found
+    for key in _SNAPSHOT_PRIORITY_KEYS:
+        if c_impl.FcPatternGet(request, key, 0, &wanted) != c_impl.FcResultMatch:
+            continue
+        if wanted.type == c_impl.FcTypeBool and wanted.u.b == _FC_DONT_CARE:
+            continue
+        n = 0
+        found = False
+        while c_impl.FcPatternGet(font, key, n, &value) == c_impl.FcResultMatch:
+            if wanted.type == c_impl.FcTypeCharSet and value.type == c_impl.FcTypeCharSet:
+                found = c_impl.FcCharSetIsSubset(wanted.u.c, value.u.c)
+            else:
+                found = c_impl.FcValueEqual(wanted, value)
+            if found:
+                break
+            n += 1
+        if n > 0 and not found:
+            return False
+    return True
+
+
+cdef bytes _FoldName(object name):
+    """Fold a family or style name as FcStrCmpIgnoreBlanksAndCase compares."""
+    return (<str>name).replace(" ", "").lower().encode("utf-8")
+
+
+cdef bint _HasFoldedString(const c_impl.FcPattern* pattern, const char* object, bytes key):
+    cdef c_impl.FcChar8* value
+    cdef int i = 0
+    while c_impl.FcPatternGetString(pattern, object, i, &value) == c_impl.FcResultMatch:
+        if _FoldName((<bytes>value).decode("utf-8")) == key:
+            return True
+        i += 1
+    return False
+
+
+cdef class Snapshot:
+    """Read-only font database in a memory-mapped file.
+
+    :py:meth:`export` writes the fonts of a config, with their charsets and
+    langsets, and an index of family names into a single file. Worker
+    processes :py:meth:`open` the file with ``mmap`` and query it in place, so
+    they share the physical pages instead of each holding a converted copy.
+    Fonts are only decoded into patterns when a query looks at them.
+
+    :py:meth:`match` substitutes the request with a config as
+    :py:func:`match` does. fontconfig ranks fonts of the strongly bound
+    families of the substituted request, those named in the request and their
+    ``binding="same"`` aliases, above all other fonts, so only these fonts are
+    scored, unless the best of them misses a property that fontconfig ranks
+    above the family, such as ``charset`` or ``variable``. Families added
+    with the default weak binding, such as the fallbacks of ``sans-serif``,
+    rank below ``lang``, so requests without a strongly bound family in the
+    snapshot score all fonts. These are decoded once on first use and kept
+    until the snapshot is freed. The result is the same as
+    :py:meth:`Config.font_set_match` on all exported fonts.
+
+    Example::
+
+        # Before forking workers
+        fontconfig.Snapshot.export("/var/cache/app/fonts.snapshot")
+
+        # In each worker
+        snapshot = fontconfig.Snapshot.open("/var/cache/app/fonts.snapshot")
+        font = snapshot.match(":family=sans-serif:weight=200")
+        fonts = snapshot.list(family="DejaVu Sans", select=("style", "file"))
+    """
+    cdef const unsigned char* _data
+    cdef size_t _size
+    cdef c_impl.FcChar32 _nfonts
+    cdef c_impl.FcChar32 _nfamilies
+    cdef const unsigned char* _font_offsets
+    cdef const unsigned char* _records
+    cdef const unsigned char* _families
+    cdef const unsigned char* _members
+    cdef const unsigned char* _string_data
+    cdef const unsigned char* _string_offsets
+    cdef c_impl.FcChar32 _nstrings
+    cdef FontSet _fonts
+
+    def __init__(self):
+        raise TypeError("Use Snapshot.open() to open a snapshot")
+
+    def __dealloc__(self):
+        self._unmap()
+
+    cdef void _unmap(self):
+        if self._data is not NULL:
+            munmap(<void*>self._data, self._size)
+            self._data = NULL
+
+    cdef int _check_open(self) except -1:
+        if self._data is NULL:
+            raise ValueError("Snapshot is closed")
+        return 0
+
+    @staticmethod
+    def export(path: str, config: Optional[Config] = None, font_set: Optional[FontSet] = None) -> None:
+        """Write a snapshot of fonts to a file.
+
+        The snapshot holds the fonts of ``font_set``, or the system and
+        application fonts of ``config`` (default: current config). The file is
+        written under a temporary name and renamed, so that readers never see
+        a partial snapshot.
+
+        :param str path: Snapshot file to write.
+        :param Optional[Config] config: Config whose fonts to write.
+        :param Optional[FontSet] font_set: Fonts to write instead of those of a config.
+        """
+        cdef _Writer writer = _Writer()
+        cdef c_impl.FcConfig* ptr
+        cdef c_impl.FcFontSet* fonts
+        cdef c_impl.FcChar8* family
+        cdef int j, n
+        cdef c_impl.FcChar32 i = 0
+
+        sets = []
+        if font_set is not None:
+            sets.append(font_set)
+        else:
+            if config is None:
+                config = Config.get_current()
+            for set_name in (c_impl.FcSetName.FcSetSystem, c_impl.FcSetName.FcSetApplication):
+                ptr = (<Config>config)._reference()
+                fonts = c_impl.FcConfigGetFonts(ptr, set_name)
+                c_impl.FcConfigDestroy(ptr)
+                if fonts is not NULL:
+                    sets.append(FontSet(<intptr_t>fonts, owner=False))
+
+        offsets = array.array("I")
+        families = {}
+        for item in sets:
+            fonts = (<FontSet>item)._ptr
+            for j in range(fonts.nfont):
+                offsets.append(writer.size)
+                writer.write_pattern(fonts.fonts[j])
+                n = 0
+                while c_impl.FcPatternGetString(
+                    fonts.fonts[j], b"family", n, &family
+                ) == c_impl.FcResultMatch:
+                    name = (<bytes>family).decode("utf-8")
+                    entry = families.setdefault(_FoldName(name), (name, []))
+                    if not entry[1] or entry[1][-1] != i:
+                        entry[1].append(i)
+                    n += 1
+                i += 1
+        offsets.append(writer.size)
+        if writer.size > 0xFFFFFFFF:
+            raise ValueError("Too many fonts for a snapshot")
+
+        index = array.array("I")
+        members = array.array("I")
+        for key in sorted(families):
+            name, ids = families[key]
+            index.extend((
+                writer.intern(key), writer.intern(name.encode("utf-8")), len(members), len(ids)
+            ))
+            members.extend(ids)
+
+        string_offsets = array.array("I")
+        strings = []
+        size = 0
+        for value in writer.strings:
+            string_offsets.append(size)
+            strings.append(value + b"\0")
+            size += len(value) + 1
+        strings = b"".join(strings)
+
+        sections = [
+            _LittleEndianWords(string_offsets.tobytes()),
+            strings,
+            _LittleEndianWords(offsets.tobytes()),
+            writer.body(),
+            _LittleEndianWords(index.tobytes()),
+            _LittleEndianWords(members.tobytes()),
+        ]
+        positions = []
+        position = struct.calcsize(_SNAPSHOT_HEADER)
+        for section in sections:
+            positions.append(position)
+            position += len(section)
+        header = struct.pack(
+            _SNAPSHOT_HEADER, _SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, i,
+            len(writer.strings), len(families), len(members), *positions, position)
+
+        temp = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(temp, "wb") as f:
+                f.write(header)
+                for section in sections:
+                    f.write(section)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.unlink(temp)
+            raise
+
+    @staticmethod
+    def open(path: str) -> Snapshot:
+        """Map a snapshot file written by :py:meth:`export`.
+
+        :param str path: Snapshot file.
+        :return: Snapshot reading the mapped file.
+        """
+        cdef Snapshot snapshot = Snapshot.__new__(Snapshot)
+        cdef void* data
+        cdef size_t size
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < <size_t>struct.calcsize(_SNAPSHOT_HEADER):
+                raise ValueError("Invalid Snapshot data")
+            data = mmap(NULL, size, PROT_READ, MAP_SHARED, f.fileno(), 0)
+            if data == MAP_FAILED:
+                raise OSError(errno, os.strerror(errno), path)
+        snapshot._data = <const unsigned char*>data
+        snapshot._size = size
+        snapshot._parse()
+        return snapshot
+
+    cdef int _parse(self) except -1:
+        cdef const unsigned char* key
+        cdef const unsigned char* previous = NULL
+        cdef size_t strings_size, records_size, size
+        cdef size_t nfonts, nstrings, nfamilies, nmembers
+        cdef size_t string_offsets, strings, font_offsets, records, families, members
+        cdef c_impl.FcChar32 i, start, count
+
+        (
+            magic, version, nfonts, nstrings, nfamilies, nmembers,
+            string_offsets, strings, font_offsets, records, families, members, size,
+        ) = struct.unpack(
+            _SNAPSHOT_HEADER,
+            (<const char*>self._data)[:struct.calcsize(_SNAPSHOT_HEADER)])
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError("Invalid Snapshot data")
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError("Unsupported Snapshot version: %d" % version)
+        if (
+            size != self._size
+            or string_offsets != struct.calcsize(_SNAPSHOT_HEADER)
+            or strings != string_offsets + 4 * nstrings
+            or not strings <= font_offsets <= size
+            or records != font_offsets + 4 * (nfonts + 1)
+            or not records <= families <= size
+            or members != families + 16 * nfamilies
+            or members + 4 * nmembers != size
+        ):
+            raise ValueError("Invalid Snapshot data")
+
+        # Every string ends with a NUL before the end of the string section.
+        strings_size = font_offsets - strings
+        if nstrings and (strings_size == 0 or self._data[font_offsets - 1] != 0):
+            raise ValueError("Invalid Snapshot data")
+        for i in range(nstrings):
+            if _ReadUInt32(self._data + string_offsets + 4 * <size_t>i) >= strings_size:
+                raise ValueError("Invalid Snapshot data")
+
+        records_size = families - records
+        self._font_offsets = self._data + font_offsets
+        if _ReadUInt32(self._font_offsets) != 0:
+            raise ValueError("Invalid Snapshot data")
+        for i in range(nfonts):
+            if (
+                _ReadUInt32(self._font_offsets + 4 * <size_t>i)
+                > _ReadUInt32(self._font_offsets + 4 * <size_t>(i + 1))
+            ):
+                raise ValueError("Invalid Snapshot data")
+        if _ReadUInt32(self._font_offsets + 4 * <size_t>nfonts) != records_size:
+            raise ValueError("Invalid Snapshot data")
+
+        self._families = self._data + families
+        self._members = self._data + members
+        for i in range(nmembers):
+            if _ReadUInt32(self._members + 4 * <size_t>i) >= nfonts:
+                raise ValueError("Invalid Snapshot data")
+
+        self._string_data = self._data + strings
+        self._string_offsets = self._data + string_offsets
+        self._nstrings = nstrings
+        self._records = self._data + records
+        self._nfonts = nfonts
+        self._nfamilies = nfamilies
+        for i in range(nfamilies):
+            start = _ReadUInt32(self._families + 16 * <size_t>i + 8)
+            count = _ReadUInt32(self._families + 16 * <size_t>i + 12)
+            if (
+                _ReadUInt32(self._families + 16 * <size_t>i) >= nstrings
+                or _ReadUInt32(self._families + 16 * <size_t>i + 4) >= nstrings
+                or count == 0 or start > nmembers or count > nmembers - start
+            ):
+                raise ValueError("Invalid Snapshot data")
+            key = <const unsigned char*>self._family_string(i, 0)
+            if previous is not NULL and strcmp(<const char*>previous, <const char*>key) >= 0:
+                raise ValueError("Invalid Snapshot data")
+            previous = key
+        return 0
+
+    cdef const char* _family_string(self, c_impl.FcChar32 i, int field) noexcept:
+        cdef c_impl.FcChar32 index = _ReadUInt32(self._families + 16 * <size_t>i + 4 * field)
+        return <const char*>(self._string_data + _ReadUInt32(
+            self._string_offsets + 4 * <size_t>index))
+
+    cdef Py_ssize_t _find_family(self, bytes key):
+        cdef Py_ssize_t low = 0
+        cdef Py_ssize_t high = self._nfamilies
+        cdef Py_ssize_t middle
+        cdef int order
+        while low < high:
+            middle = (low + high) // 2
+            order = strcmp(<const char*>key, self._family_string(middle, 0))
+            if order == 0:
+                return middle
+            if order < 0:
+                high = middle
+            else:
+                low = middle + 1
+        return -1
+
+    cdef c_impl.FcPattern* _decode(self, c_impl.FcChar32 i) except NULL:
+        # Each call reads with its own cursor: reading charsets releases the
+        # GIL, and a Snapshot may be shared between threads.
+        cdef _Reader reader = _Reader("Snapshot")
+        cdef c_impl.FcPattern* pattern
+        reader.string_data = self._string_data
+        reader.string_offsets = self._string_offsets
+        reader.count = self._nstrings
+        reader.pos = self._records + _ReadUInt32(self._font_offsets + 4 * <size_t>i)
+        reader.end = self._records + _ReadUInt32(self._font_offsets + 4 * <size_t>(i + 1))
+        pattern = reader.read_pattern()
+        if reader.pos != reader.end:
+            c_impl.FcPatternDestroy(pattern)
+            reader.invalid()
+        return pattern
+
+    cdef FontSet _all_fonts(self):
+        """Decode all fonts on first use, and keep them for later matches."""
+        cdef FontSet fonts
+        cdef c_impl.FcPattern* font
+        if self._fonts is None:
+            fonts = FontSet.create()
+            for i in range(self._nfonts):
+                font = self._decode(i)
+                if not c_impl.FcFontSetAdd(fonts._ptr, font):
+                    c_impl.FcPatternDestroy(font)
+                    raise MemoryError()
+            # Another thread may have decoded the fonts in the meantime.
+            if self._fonts is None:
+                self._fonts = fonts
+        return self._fonts
+
+    cdef object _font_ids(self, object family):
+        cdef Py_ssize_t k
+        cdef c_impl.FcChar32 start, count
+        if family is None:
+            return range(self._nfonts)
+        k = self._find_family(_FoldName(family))
+        if k < 0:
+            return ()
+        start = _ReadUInt32(self._families + 16 * <size_t>k + 8)
+        count = _ReadUInt32(self._families + 16 * <size_t>k + 12)
+        return [_ReadUInt32(self._members + 4 * <size_t>j) for j in range(start, start + count)]
+
+    def close(self) -> None:
+        """Unmap the snapshot. Results returned earlier stay valid."""
+        self._unmap()
+        self._fonts = None
+
+    def __enter__(self) -> Snapshot:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._nfonts
+
+    def __repr__(self) -> str:
+        return "<Snapshot: %d fonts, %d families>" % (self._nfonts, self._nfamilies)
+
+    def __getitem__(self, index: int) -> Pattern:
+        """Decode a font into a new pattern."""
+        self._check_open()
+        if index < 0:
+            index += self._nfonts
+        if not 0 <= index < self._nfonts:
+            raise IndexError("Invalid index: %d" % index)
+        return Pattern(<intptr_t>self._decode(index))
+
+    def families(self) -> List[str]:
+        """Return the family names of the fonts, ordered by folded name."""
+        self._check_open()
+        return [
+            (<bytes>self._family_string(i, 1)).decode("utf-8")
+            for i in range(self._nfamilies)
+        ]
+
+    def list(
+        self,
+        family: Optional[str] = None,
+        style: Optional[str] = None,
+        select: Iterable[str] = ("family",),
+    ) -> List[Dict[str, Any]]:
+        """List the fonts of a family and style.
+
+        Names are compared ignoring case and blanks, as fontconfig does.
+        Family lookups use the index of the snapshot; only the fonts of the
+        family are decoded.
+
+        :param Optional[str] family: Family name (default: all fonts).
+        :param Optional[str] style: Style name (default: all styles).
+        :param Iterable[str] select: Properties to include in result dicts.
+        :return: List of dicts with selected properties.
+        """
+        cdef c_impl.FcPattern* pattern
+        self._check_open()
+        keys = _SelectKeys(select)
+        style_key = None if style is None else _FoldName(style)
+        results = []
+        for i in self._font_ids(family):
+            pattern = self._decode(i)
+            try:
+                if style_key is None or _HasFoldedString(pattern, b"style", style_key):
+                    results.append(_FcPatternToDict(pattern, keys))
+            finally:
+                c_impl.FcPatternDestroy(pattern)
+        return results
+
+    def match(
+        self,
+        pattern: str = "",
+        properties: Optional[Dict[str, Any]] = None,
+        select: Iterable[str] = ("family", "file", "style"),
+        config: Optional[Config] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Find the best matching font of the snapshot for a given pattern.
+
+        See :py:func:`match` for the arguments. ``config`` is used for
+        substitutions only; the fonts come from the snapshot.
+
+        :return: Dict with selected properties, or None if no match.
+        """
+        cdef c_impl.FcValue value
+        cdef c_impl.FcValueBinding binding
+        cdef c_impl.FcPattern* font
+        cdef FontSet candidates
+        cdef int n = 0
+        self._check_open()
+        if config is None:
+            config = Config.get_current()
+
+        p = _create_pattern(pattern, properties)
+        p.default_substitute()
+        config.substitute(p)
+
+        # Fonts of strongly bound families outrank all others, while weakly
+        # bound ones rank below lang, where any font may win.
+        ids = {}
+        while c_impl.FcPatternGetWithBinding(
+            (<Pattern>p)._ptr, b"family", n, &value, &binding
+        ) == c_impl.FcResultMatch:
+            if binding == c_impl.FcValueBindingStrong and value.type == c_impl.FcTypeString:
+                for i in self._font_ids((<bytes>value.u.s).decode("utf-8")):
+                    ids[i] = None
+            n += 1
+        if ids:
+            candidates = FontSet.create()
+            for i in ids:
+                if self._fonts is not None:
+                    font = self._fonts._ptr.fonts[i]
+                    c_impl.FcPatternReference(font)
+                else:
+                    font = self._decode(i)
+                if not c_impl.FcFontSetAdd(candidates._ptr, font):
+                    c_impl.FcPatternDestroy(font)
+                    raise MemoryError()
+            matched = config.font_set_match(candidates, p)
+            # Properties ranked above the family may still favor another font.
+            if matched is not None and _MatchesPriorityKeys(
+                (<Pattern>p)._ptr, (<Pattern>matched)._ptr
+            ):
+                return _pattern_to_dict(matched, select)
+
+        matched = config.font_set_match(self._all_fonts(), p)
+        return None if matched is None else _pattern_to_dict(matched, select)
+
+
+cdef object _sort_result(
+    c_impl.FcFontSet* ptr, c_impl.FcCharSet* csp, c_impl.FcResult result, bint coverage
+):
+    """Wrap the outputs of FcFontSort or FcFontSetSort."""
+    charset = CharSet(<intptr_t>csp) if csp is not NULL else None
+    if result == c_impl.FcResultMatch:
+        fonts = FontSet(<intptr_t>ptr)
+    elif result == c_impl.FcResultNoMatch:
+        if ptr is not NULL:
+            c_impl.FcFontSetDestroy(ptr)
+        fonts = None
+    elif result == c_impl.FcResultOutOfMemory:
+        raise MemoryError()
+    else:
+        raise RuntimeError("Sort result is %d" % result)
+    return (fonts, charset) if coverage else fonts
+
+
+cdef class _FontSetArray:
+    """C array of FcFontSet pointers that keeps its FontSets alive."""
+    cdef c_impl.FcFontSet** sets
+    cdef int n
+    cdef object font_sets
+
+    def __cinit__(self, sets):
+        cdef int i
+        if isinstance(sets, FontSet):
+            sets = (sets,)
+        self.font_sets = tuple(sets)
+        self.n = len(self.font_sets)
+        self.sets = <c_impl.FcFontSet**>PyMem_Malloc(
+            max(self.n, 1) * sizeof(c_impl.FcFontSet*))
+        if self.sets is NULL:
+            raise MemoryError()
+        for i in range(self.n):
+            if not isinstance(self.font_sets[i], FontSet):
+                raise TypeError("Expected FontSet, got %s" % type(self.font_sets[i]))
+            self.sets[i] = (<FontSet>self.font_sets[i])._ptr
+
+    def __dealloc__(self):
+        PyMem_Free(self.sets)
+
 
 def _create_pattern(pattern: str = "", properties: Optional[Dict[str, Any]] = None) -> Pattern:
     """
@@ -1089,14 +4679,7 @@ def _pattern_to_dict(pattern: Pattern, select: Iterable[str]) -> Dict[str, Any]:
     :param Iterable[str] select: Properties to include in the result.
     :return: Dict with selected properties.
     """
-    result = {}
-    for prop in select:
-        try:
-            value = pattern.get(prop)
-            result[prop] = value
-        except KeyError:
-            pass  # Property doesn't exist in this pattern
-    return result
+    return _FcPatternToDict(pattern._ptr, _SelectKeys(select))
 
 
 def match(
@@ -1104,6 +4687,7 @@ def match(
     properties: Optional[Dict[str, Any]] = None,
     select: Iterable[str] = ("family", "file", "style"),
     config: Optional[Config] = None,
+    cache: Optional[MatchCache] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     Find the best matching font for a given pattern.
@@ -1124,24 +4708,46 @@ def match(
         # Custom properties to return
         font = fontconfig.match(":family=Arial", select=("family", "file", "weight"))
 
+        # Reuse results of repeated requests
+        cache = fontconfig.MatchCache()
+        font = fontconfig.match(":family=Arial", cache=cache)
+
     :param str pattern: Pattern string like ``":family=Arial:weight=200"``.
     :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
     :param Iterable[str] select: Properties to include in result dict.
     :param Optional[Config] config: Config instance (default: current config).
+    :param Optional[MatchCache] cache: Cache to look up and store the result in.
     :return: Dict with selected properties, or None if no match.
     """
-    if config is None:
-        config = Config.get_current()
-
-    p = _create_pattern(pattern, properties)
-    p.default_substitute()
-    config.substitute(p)
-
-    matched = config.font_match(p)
-    if matched is None:
-        return None
-
-    return _pattern_to_dict(matched, select)
+    cdef _Call call = _BeginCall(_CALL_MATCH)
+    try:
+        if config is None:
+            config = Config.get_current()
+
+        p = _create_pattern(pattern, properties)
+        if cache is not None:
+            select = tuple(select)
+            key = ("match", config.ptr(), p, select)
+            found, value = cache._get(config, key)
+            _RecordCache(call, found, value is not None)
+            if found:
+                return None if value is None else dict(value)
+            p = p.copy()
+        p.default_substitute()
+        config.substitute(p)
+
+        matched = config.font_match(p)
+        start = _StartPhase()
+        result = None if matched is None else _pattern_to_dict(matched, select)
+        if start:
+            _RecordPhase(_PHASE_CONVERT, start, result is not None)
+        if cache is not None:
+            cache._put(key, result)
+            return None if result is None else dict(result)
+        return result
+    finally:
+        if call is not None:
+            _EndCall(call)
 
 
 def sort(
@@ -1150,6 +4756,8 @@ def sort(
     select: Iterable[str] = ("family", "file", "style"),
     trim: bool = True,
     config: Optional[Config] = None,
+    cache: Optional[MatchCache] = None,
+    limit: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     Get a sorted list of fonts matching a pattern, ordered by quality.
@@ -1170,25 +4778,397 @@ def sort(
         # Without trimming (include all fonts even with no common charset)
         fonts = fontconfig.sort(":family=Arial", trim=False)
 
+        # Only convert the 5 best matches
+        fonts = fontconfig.sort(":family=Arial", limit=5)
+
     :param str pattern: Pattern string like ``":family=Arial"``.
     :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
     :param Iterable[str] select: Properties to include in result dicts.
     :param bool trim: Remove fonts with no common charset.
     :param Optional[Config] config: Config instance (default: current config).
+    :param Optional[MatchCache] cache: Cache to look up and store the result in.
+    :param Optional[int] limit: Maximum number of fonts to return (default: all).
     :return: List of dicts with selected properties, sorted by match quality.
     """
-    if config is None:
-        config = Config.get_current()
+    if limit is not None and limit < 0:
+        raise ValueError("limit must not be negative: %d" % limit)
+    cdef _Call call = _BeginCall(_CALL_SORT)
+    try:
+        if config is None:
+            config = Config.get_current()
+
+        p = _create_pattern(pattern, properties)
+        if cache is not None:
+            select = tuple(select)
+            key = ("sort", config.ptr(), p, select, bool(trim), limit)
+            found, value = cache._get(config, key)
+            _RecordCache(call, found, len(value) if found else 0)
+            if found:
+                return [dict(font) for font in value]
+            p = p.copy()
+        p.default_substitute()
+        config.substitute(p)
+
+        font_set = config.font_sort(p, trim)
+        if font_set is None:
+            results = []
+        else:
+            results = _FontSetToDicts(font_set, _SelectKeys(select), limit)
+        if cache is not None:
+            cache._put(key, results)
+            return [dict(font) for font in results]
+        return results
+    finally:
+        if call is not None:
+            _EndCall(call)
+
+
+cdef tuple _dedupe_patterns(patterns):
+    """Build unique Patterns from requests and the index of each request."""
+    unique = []
+    indices = []
+    cdef dict by_string = {}
+    cdef dict by_pattern = {}
+    for item in patterns:
+        if isinstance(item, str):
+            index = by_string.get(item)
+            if index is not None:
+                indices.append(index)
+                continue
+            p = Pattern.parse(item) if item else Pattern.create()
+        elif isinstance(item, dict):
+            p = _create_pattern(properties=item)
+        elif isinstance(item, Pattern):
+            p = item.copy()
+        else:
+            raise TypeError("Expected str, dict or Pattern, got %s" % type(item))
+        index = by_pattern.setdefault(p, len(unique))
+        if index == len(unique):
+            unique.append(p)
+        if isinstance(item, str):
+            by_string[item] = index
+        indices.append(index)
+    return unique, indices
+
+
+def match_many(
+    patterns: Iterable[Union[str, Dict[str, Any], Pattern]],
+    select: Iterable[str] = ("family", "file", "style"),
+    config: Optional[Config] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Find the best matching font for each of many patterns.
+
+    Equivalent to calling :py:func:`match` for every pattern, but identical
+    requests are resolved only once and the substitution and matching of all
+    requests runs in a single loop without the GIL.
+
+    Example::
+
+        runs = [":family=Arial", {"family": "Noto Sans", "lang": ["ja"]}]
+        fonts = fontconfig.match_many(runs, select=("family", "file"))
+        for run, font in zip(runs, fonts):
+            print(run, font["file"] if font else None)
+
+    :param patterns: Pattern strings, property dicts or Pattern objects.
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of dicts with selected properties (or None if no match), in
+        input order.
+    """
+    cdef Py_ssize_t i, n, converted = 0
+    cdef c_impl.FcPattern** requests
+    cdef c_impl.FcPattern** matched
+    cdef uint64_t* timings = NULL
+    cdef uint64_t start
+    cdef c_impl.FcResult result
+    cdef c_impl.FcConfig* ptr
+    cdef bint out_of_memory = False
+    cdef _Call call = _BeginCall(_CALL_MATCH_MANY)
+
+    try:
+        if config is None:
+            config = Config.get_current()
+        select = tuple(select)
+        unique, indices = _dedupe_patterns(patterns)
+        n = len(unique)
+
+        requests = <c_impl.FcPattern**>PyMem_Malloc(max(n, 1) * sizeof(c_impl.FcPattern*))
+        matched = <c_impl.FcPattern**>PyMem_Malloc(max(n, 1) * sizeof(c_impl.FcPattern*))
+        if call is not None:
+            timings = <uint64_t*>PyMem_Malloc(2 * max(n, 1) * sizeof(uint64_t))
+        if requests is NULL or matched is NULL or (call is not None and timings is NULL):
+            PyMem_Free(requests)
+            PyMem_Free(matched)
+            PyMem_Free(timings)
+            raise MemoryError()
+        memset(requests, 0, max(n, 1) * sizeof(c_impl.FcPattern*))
+        memset(matched, 0, max(n, 1) * sizeof(c_impl.FcPattern*))
+        for i in range(n):
+            requests[i] = (<Pattern>unique[i])._ptr
+
+        try:
+            ptr = config._reference()
+            with nogil:
+                for i in range(n):
+                    if timings is not NULL:
+                        start = _Now()
+                    c_impl.FcDefaultSubstitute(requests[i])
+                    c_impl.FcConfigSubstitute(ptr, requests[i], c_impl.FcMatchPattern)
+                    if timings is not NULL:
+                        timings[2 * i] = _Now() - start
+                        start = _Now()
+                    matched[i] = c_impl.FcFontMatch(ptr, requests[i], &result)
+                    if timings is not NULL:
+                        timings[2 * i + 1] = _Now() - start
+                    if result == c_impl.FcResultOutOfMemory:
+                        out_of_memory = True
+                    if result != c_impl.FcResultMatch and matched[i] is not NULL:
+                        c_impl.FcPatternDestroy(matched[i])
+                        matched[i] = NULL
+                c_impl.FcConfigDestroy(ptr)
+            if timings is not NULL:
+                for i in range(n):
+                    _RecordElapsed(_PHASE_SUBSTITUTE, timings[2 * i])
+                    _RecordElapsed(_PHASE_MATCH, timings[2 * i + 1])
+
+            fonts = []
+            start = _StartPhase()
+            for i in range(n):
+                if matched[i] is NULL:
+                    fonts.append(None)
+                else:
+                    font = Pattern(<intptr_t>matched[i])
+                    matched[i] = NULL
+                    fonts.append(_pattern_to_dict(font, select))
+                    converted += 1
+            if start:
+                _RecordPhase(_PHASE_CONVERT, start, converted)
+        finally:
+            for i in range(n):
+                if matched[i] is not NULL:
+                    c_impl.FcPatternDestroy(matched[i])
+            PyMem_Free(requests)
+            PyMem_Free(matched)
+            PyMem_Free(timings)
+
+        if out_of_memory:
+            raise MemoryError()
+        results = _expand_results(fonts, indices, lambda font: dict(font) if font else font)
+        if call is not None:
+            _RecordResults(call, sum(font is not None for font in results) - converted)
+        return results
+    finally:
+        if call is not None:
+            _EndCall(call)
+
+
+def sort_many(
+    patterns: Iterable[Union[str, Dict[str, Any], Pattern]],
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[Config] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Get sorted font lists for many patterns.
+
+    Equivalent to calling :py:func:`sort` for every pattern, but identical
+    requests are resolved only once and the substitution and sorting of all
+    requests runs in a single loop without the GIL.
+
+    Example::
+
+        fallbacks = fontconfig.sort_many([":lang=ja", ":lang=ar"], select=("family",))
+
+    :param patterns: Pattern strings, property dicts or Pattern objects.
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param bool trim: Remove fonts with no common charset.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of sorted font lists, in input order.
+    """
+    cdef Py_ssize_t i, n, converted = 0
+    cdef c_impl.FcPattern** requests
+    cdef c_impl.FcFontSet** sorted_
+    cdef uint64_t* timings = NULL
+    cdef uint64_t start
+    cdef c_impl.FcResult result
+    cdef c_impl.FcConfig* ptr
+    cdef c_impl.FcBool trim_ = <c_impl.FcBool>trim
+    cdef bint out_of_memory = False
+    cdef _Call call = _BeginCall(_CALL_SORT_MANY)
+
+    try:
+        if config is None:
+            config = Config.get_current()
+        select = tuple(select)
+        unique, indices = _dedupe_patterns(patterns)
+        n = len(unique)
+
+        requests = <c_impl.FcPattern**>PyMem_Malloc(max(n, 1) * sizeof(c_impl.FcPattern*))
+        sorted_ = <c_impl.FcFontSet**>PyMem_Malloc(max(n, 1) * sizeof(c_impl.FcFontSet*))
+        if call is not None:
+            timings = <uint64_t*>PyMem_Malloc(2 * max(n, 1) * sizeof(uint64_t))
+        if requests is NULL or sorted_ is NULL or (call is not None and timings is NULL):
+            PyMem_Free(requests)
+            PyMem_Free(sorted_)
+            PyMem_Free(timings)
+            raise MemoryError()
+        memset(requests, 0, max(n, 1) * sizeof(c_impl.FcPattern*))
+        memset(sorted_, 0, max(n, 1) * sizeof(c_impl.FcFontSet*))
+        for i in range(n):
+            requests[i] = (<Pattern>unique[i])._ptr
+
+        try:
+            ptr = config._reference()
+            with nogil:
+                for i in range(n):
+                    if timings is not NULL:
+                        start = _Now()
+                    c_impl.FcDefaultSubstitute(requests[i])
+                    c_impl.FcConfigSubstitute(ptr, requests[i], c_impl.FcMatchPattern)
+                    if timings is not NULL:
+                        timings[2 * i] = _Now() - start
+                        start = _Now()
+                    sorted_[i] = c_impl.FcFontSort(ptr, requests[i], trim_, NULL, &result)
+                    if timings is not NULL:
+                        timings[2 * i + 1] = _Now() - start
+                    if result == c_impl.FcResultOutOfMemory:
+                        out_of_memory = True
+                    if result != c_impl.FcResultMatch and sorted_[i] is not NULL:
+                        c_impl.FcFontSetDestroy(sorted_[i])
+                        sorted_[i] = NULL
+                c_impl.FcConfigDestroy(ptr)
+            if timings is not NULL:
+                for i in range(n):
+                    _RecordElapsed(_PHASE_SUBSTITUTE, timings[2 * i])
+                    _RecordElapsed(_PHASE_SORT, timings[2 * i + 1])
+
+            font_lists = []
+            start = _StartPhase()
+            for i in range(n):
+                if sorted_[i] is NULL:
+                    font_lists.append([])
+                else:
+                    font_set = FontSet(<intptr_t>sorted_[i])
+                    sorted_[i] = NULL
+                    font_lists.append([_pattern_to_dict(font, select) for font in font_set])
+                    converted += len(font_lists[i])
+            if start:
+                _RecordPhase(_PHASE_CONVERT, start, converted)
+        finally:
+            for i in range(n):
+                if sorted_[i] is not NULL:
+                    c_impl.FcFontSetDestroy(sorted_[i])
+            PyMem_Free(requests)
+            PyMem_Free(sorted_)
+            PyMem_Free(timings)
+
+        if out_of_memory:
+            raise MemoryError()
+        results = _expand_results(
+            font_lists, indices, lambda fonts: [dict(font) for font in fonts])
+        if call is not None:
+            _RecordResults(call, sum(len(fonts) for fonts in results) - converted)
+        return results
+    finally:
+        if call is not None:
+            _EndCall(call)
+
+
+cdef object _expand_results(results, indices, copy):
+    """Map unique results back to request order, copying duplicates."""
+    expanded = []
+    cdef set seen = set()
+    for index in indices:
+        if index in seen:
+            expanded.append(copy(results[index]))
+        else:
+            seen.add(index)
+            expanded.append(results[index])
+    return expanded
 
-    p = _create_pattern(pattern, properties)
-    p.default_substitute()
-    config.substitute(p)
 
-    font_set = config.font_sort(p, trim)
-    if font_set is None:
-        return []
+def resolve_fallback(
+    text: str,
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    config: Optional[Config] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Find the fonts needed to render a text, in fallback order.
+
+    Walks the :py:func:`sort` result for the pattern and keeps each font that
+    covers a character of ``text`` not covered by an earlier font, stopping
+    as soon as every character is covered. Characters that no font supports
+    are ignored.
+
+    Example::
 
-    return [_pattern_to_dict(font, select) for font in font_set]
+        fonts = fontconfig.resolve_fallback("Hello, 世界! 🎉", ":family=sans-serif")
+        for font in fonts:
+            print(font["family"], font["file"])
+
+    :param str text: Text to render.
+    :param str pattern: Pattern string like ``":family=Arial"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: List of dicts with selected properties, in fallback order.
+    """
+    cdef c_impl.FcFontSet* fonts
+    cdef c_impl.FcCharSet* remaining
+    cdef c_impl.FcCharSet* font_charset
+    cdef c_impl.FcCharSet* rest
+    cdef int i
+    cdef _Call call = _BeginCall(_CALL_RESOLVE_FALLBACK)
+
+    try:
+        if config is None:
+            config = Config.get_current()
+
+        p = _create_pattern(pattern, properties)
+        p.default_substitute()
+        config.substitute(p)
+
+        font_set = config.font_sort(p, True)
+        if font_set is None:
+            return []
+        fonts = (<FontSet>font_set)._ptr
+
+        required = CharSet.from_string(text)
+        remaining = c_impl.FcCharSetUnion((<CharSet>required)._ptr, (<CharSet>required)._ptr)
+        if remaining is NULL:
+            raise MemoryError()
+
+        selected = []
+        try:
+            for i in range(fonts.nfont):
+                if c_impl.FcCharSetCount(remaining) == 0:
+                    break
+                if c_impl.FcPatternGetCharSet(
+                    fonts.fonts[i], b"charset", 0, &font_charset
+                ) != c_impl.FcResultMatch:
+                    continue
+                if c_impl.FcCharSetIntersectCount(remaining, font_charset) == 0:
+                    continue
+                rest = c_impl.FcCharSetSubtract(remaining, font_charset)
+                if rest is NULL:
+                    raise MemoryError()
+                c_impl.FcCharSetDestroy(remaining)
+                remaining = rest
+                selected.append(i)
+        finally:
+            c_impl.FcCharSetDestroy(remaining)
+
+        start = _StartPhase()
+        results = [_pattern_to_dict(font_set[i], select) for i in selected]
+        if start:
+            _RecordPhase(_PHASE_CONVERT, start, len(results))
+        return results
+    finally:
+        if call is not None:
+            _EndCall(call)
 
 
 def list(
@@ -1280,14 +5260,361 @@ def list(
     order           Int      Order number of the font
     ==============  =======  =======================================================
     """
-    if config is None:
-        config = Config.get_current()
+    cdef _Call call = _BeginCall(_CALL_LIST)
+    try:
+        if config is None:
+            config = Config.get_current()
+
+        p = _create_pattern(pattern, properties)
+        object_set = ObjectSet.create()
+        object_set.build(select)
+        font_set = config.font_list(p, object_set)
+        return _FontSetToDicts(font_set, _SelectKeys(select), None)
+    finally:
+        if call is not None:
+            _EndCall(call)
+
+
+cdef object _FontSetToDicts(FontSet font_set, tuple keys, object limit):
+    """Convert up to limit fonts of a FontSet to dicts."""
+    cdef c_impl.FcFontSet* ptr = font_set._ptr
+    cdef int i, n = ptr.nfont
+    cdef uint64_t start = _StartPhase()
+    if limit is not None and limit < n:
+        n = limit
+    results = [_FcPatternToDict(ptr.fonts[i], keys) for i in range(n)]
+    if start:
+        _RecordPhase(_PHASE_CONVERT, start, n)
+    return results
+
+
+def _iter_font_set(FontSet font_set, tuple keys) -> Iterator[Dict[str, Any]]:
+    """Yield the fonts of a FontSet as dicts, keeping the set alive.
+
+    The conversion time is recorded as one convert phase when the iterator
+    is exhausted or closed.
+    """
+    cdef int i, converted = 0
+    cdef uint64_t start, elapsed = 0
+    try:
+        for i in range(font_set._ptr.nfont):
+            start = _StartPhase()
+            font = _FcPatternToDict(font_set._ptr.fonts[i], keys)
+            if start:
+                elapsed += _Now() - start
+                converted += 1
+            yield font
+    finally:
+        if converted:
+            _RecordElapsed(_PHASE_CONVERT, elapsed, converted)
+
+
+def iter_list(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family",),
+    config: Optional[Config] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the fonts matching a pattern.
 
-    p = _create_pattern(pattern, properties)
-    object_set = ObjectSet.create()
-    object_set.build(select)
-    font_set = config.font_list(p, object_set)
-    return [_pattern_to_dict(font, select) for font in font_set]
+    Like :py:func:`list`, but results are converted one at a time as the
+    iterator advances, so the first font is available without building every
+    dict, and consumed dicts can be freed early. The lookup itself runs when
+    this function is called.
+
+    Example::
+
+        for font in fontconfig.iter_list(select=("family", "file")):
+            inventory.write(font)
+
+    :param str pattern: Pattern string like ``":lang=ja"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Iterator of dicts with selected properties.
+    """
+    cdef _Call call = _BeginCall(_CALL_ITER_LIST)
+    try:
+        if config is None:
+            config = Config.get_current()
+
+        select = tuple(select)
+        p = _create_pattern(pattern, properties)
+        object_set = ObjectSet.create()
+        object_set.build(select)
+        font_set = config.font_list(p, object_set)
+        _RecordResults(call, len(font_set))
+        return _iter_font_set(font_set, _SelectKeys(select))
+    finally:
+        if call is not None:
+            _EndCall(call)
+
+
+def iter_sort(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[Config] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the fonts matching a pattern, best matches first.
+
+    Like :py:func:`sort`, but results are converted one at a time as the
+    iterator advances. Stop iterating once enough fonts are found; the
+    remaining fonts are never converted. The sort itself runs when this
+    function is called.
+
+    Example::
+
+        for font in fontconfig.iter_sort(":lang=ja", trim=False):
+            if is_acceptable(font):
+                break
+
+    :param str pattern: Pattern string like ``":family=Arial"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in result dicts.
+    :param bool trim: Remove fonts with no common charset.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Iterator of dicts with selected properties, sorted by match quality.
+    """
+    cdef _Call call = _BeginCall(_CALL_ITER_SORT)
+    try:
+        if config is None:
+            config = Config.get_current()
+
+        p = _create_pattern(pattern, properties)
+        p.default_substitute()
+        config.substitute(p)
+        font_set = config.font_sort(p, trim)
+        if font_set is None:
+            return iter(())
+        _RecordResults(call, len(font_set))
+        return _iter_font_set(font_set, _SelectKeys(select))
+    finally:
+        if call is not None:
+            _EndCall(call)
+
+
+cdef class Query:
+    """A match, sort or list request prepared for repeated execution.
+
+    Created by :py:func:`prepare`. The pattern is parsed and substituted once,
+    and the ``select`` properties are resolved once, so executing the query
+    only runs the match, sort or list step and the conversion of the results.
+
+    Keyword arguments to :py:meth:`match`, :py:meth:`sort` and :py:meth:`list`
+    replace properties of the prepared pattern for one call, e.g.,
+    ``query.match(weight=200)``. Such calls substitute the modified pattern
+    again.
+
+    A query is bound to the config it was prepared with, and reflects the
+    configuration rules at that time. It can be shared between threads.
+
+    Example::
+
+        query = fontconfig.prepare(":lang=ja", select=("family", "file"))
+        for request in requests:
+            font = query.match()
+            bold = query.match(weight=200)
+    """
+    cdef Pattern _pattern
+    cdef Pattern _prepared
+    cdef ObjectSet _object_set
+    cdef Config _config
+    cdef tuple _select
+    cdef tuple _keys
+    cdef bint _trim
+
+    def __init__(self, *args, **kwargs):
+        raise TypeError("Use fontconfig.prepare() to create a Query")
+
+    @property
+    def pattern(self) -> Pattern:
+        """Copy of the pattern before substitution"""
+        return self._pattern.copy()
+
+    @property
+    def select(self) -> Tuple[str, ...]:
+        """Properties included in the results"""
+        return self._select
+
+    def __repr__(self) -> str:
+        return "<Query %r select=%r>" % (self._pattern.unparse(), self._select)
+
+    cdef Pattern _override(self, dict overrides, bint substitute):
+        """Return the pattern with overrides, substituted if requested."""
+        if not overrides:
+            return self._prepared if substitute else self._pattern
+        p = self._pattern.copy()
+        for key, value in overrides.items():
+            p.delete(key)
+            if value is not None and not p.add(key, value):
+                raise MemoryError()
+        if substitute:
+            p.default_substitute()
+            self._config.substitute(p)
+        return p
+
+    def match(self, **overrides: Any) -> Optional[Dict[str, Any]]:
+        """Return the selected properties of the best matching font, or None.
+
+        :param overrides: Properties replacing those of the prepared pattern.
+        :return: Dict with selected properties, or None if no match.
+        """
+        cdef _Call call = _BeginCall(_CALL_MATCH)
+        try:
+            return self._match(overrides)
+        finally:
+            if call is not None:
+                _EndCall(call)
+
+    cdef object _match(self, dict overrides):
+        cdef Pattern p = self._override(overrides, True)
+        cdef c_impl.FcPattern* request = p._ptr
+        cdef c_impl.FcConfig* config = self._config._reference()
+        cdef c_impl.FcPattern* matched
+        cdef c_impl.FcResult result
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            matched = c_impl.FcFontMatch(config, request, &result)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_MATCH, start)
+        if result == c_impl.FcResultMatch:
+            try:
+                start = _StartPhase()
+                font = _FcPatternToDict(matched, self._keys)
+                if start:
+                    _RecordPhase(_PHASE_CONVERT, start, 1)
+                return font
+            finally:
+                c_impl.FcPatternDestroy(matched)
+        if matched is not NULL:
+            c_impl.FcPatternDestroy(matched)
+        if result == c_impl.FcResultNoMatch:
+            return None
+        elif result == c_impl.FcResultOutOfMemory:
+            raise MemoryError()
+        raise RuntimeError("Match result is %d" % result)
+
+    def sort(self, limit: Optional[int] = None, **overrides: Any) -> List[Dict[str, Any]]:
+        """Return the selected properties of the matching fonts, best first.
+
+        :param Optional[int] limit: Maximum number of fonts to return (default: all).
+        :param overrides: Properties replacing those of the prepared pattern.
+        :return: List of dicts with selected properties, sorted by match quality.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("limit must not be negative: %d" % limit)
+        cdef _Call call = _BeginCall(_CALL_SORT)
+        try:
+            return self._sort(limit, overrides)
+        finally:
+            if call is not None:
+                _EndCall(call)
+
+    cdef object _sort(self, object limit, dict overrides):
+        cdef Pattern p = self._override(overrides, True)
+        cdef c_impl.FcPattern* request = p._ptr
+        cdef c_impl.FcBool trim = <c_impl.FcBool>self._trim
+        cdef c_impl.FcConfig* config = self._config._reference()
+        cdef c_impl.FcFontSet* ptr
+        cdef c_impl.FcResult result
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontSort(config, request, trim, NULL, &result)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_SORT, start)
+        font_set = _sort_result(ptr, NULL, result, False)
+        if font_set is None:
+            return []
+        return _FontSetToDicts(font_set, self._keys, limit)
+
+    def list(self, **overrides: Any) -> List[Dict[str, Any]]:
+        """Return the selected properties of all fonts matching the pattern.
+
+        As with :py:func:`list`, the pattern is not substituted.
+
+        :param overrides: Properties replacing those of the prepared pattern.
+        :return: List of dicts with selected properties.
+        """
+        cdef _Call call = _BeginCall(_CALL_LIST)
+        try:
+            return self._list(overrides)
+        finally:
+            if call is not None:
+                _EndCall(call)
+
+    cdef object _list(self, dict overrides):
+        cdef Pattern p = self._override(overrides, False)
+        cdef c_impl.FcPattern* request = p._ptr
+        cdef c_impl.FcObjectSet* object_set = self._object_set._ptr
+        cdef c_impl.FcConfig* config = self._config._reference()
+        cdef c_impl.FcFontSet* ptr
+        cdef uint64_t start = _StartPhase()
+        with nogil:
+            ptr = c_impl.FcFontList(config, request, object_set)
+            c_impl.FcConfigDestroy(config)
+        if start:
+            _RecordPhase(_PHASE_LIST, start)
+        if ptr is NULL:
+            raise MemoryError()
+        return _FontSetToDicts(FontSet(<intptr_t>ptr), self._keys, None)
+
+
+def prepare(
+    pattern: str = "",
+    properties: Optional[Dict[str, Any]] = None,
+    select: Iterable[str] = ("family", "file", "style"),
+    trim: bool = True,
+    config: Optional[Config] = None,
+) -> Query:
+    """
+    Prepare a request for repeated :py:func:`match`, :py:func:`sort` or
+    :py:func:`list` calls.
+
+    The pattern is parsed, default-substituted and config-substituted once,
+    and the ``select`` properties are validated once. The returned
+    :py:class:`Query` then only runs the lookup on each call.
+
+    Example::
+
+        query = fontconfig.prepare(":lang=ja", select=("family", "file"))
+        font = query.match()
+        fallbacks = query.sort()
+        bold = query.match(weight=200)
+        fonts = query.list(family="Noto Sans CJK JP")
+
+    :param str pattern: Pattern string like ``":family=Arial:weight=200"``.
+    :param Optional[Dict[str, Any]] properties: Dict of pattern properties (alternative to pattern string).
+    :param Iterable[str] select: Properties to include in results.
+    :param bool trim: Remove fonts with no common charset in :py:meth:`Query.sort`.
+    :param Optional[Config] config: Config instance (default: current config).
+    :return: Prepared query.
+    """
+    cdef Query query = Query.__new__(Query)
+    cdef c_impl.FcConfig* ptr
+    if config is None:
+        # Own a reference, as the current config may change later.
+        _ensure_init()
+        ptr = c_impl.FcConfigReference(NULL)
+        if ptr is NULL:
+            raise RuntimeError("Failed to reference config")
+        config = Config(<intptr_t>ptr)
+    query._config = config
+    query._pattern = _create_pattern(pattern, properties)
+    query._prepared = query._pattern.copy()
+    query._prepared.default_substitute()
+    config.substitute(query._prepared)
+    query._select = tuple(select)
+    query._object_set = ObjectSet.create()
+    query._object_set.build(query._select)
+    query._keys = _SelectKeys(query._select)
+    query._trim = trim
+    return query
 
 
 def query(where: str = "", select: Iterable[str] = ("family",)) -> List[Dict[str, Any]]:
@@ -1324,8 +5651,7 @@ def query(where: str = "", select: Iterable[str] = ("family",)) -> List[Dict[str
 
 @atexit.register
 def _exit():
-    c_impl.FcFini()
-
-
-if not c_impl.FcInit():
-    raise RuntimeError("Failed to initialize fontconfig")
+    # Objects still alive at exit may reference font caches, which FcFini()
+    # asserts to be released. Leave the cleanup to the OS in that case.
+    if _live_objects == 0:
+        c_impl.FcFini()
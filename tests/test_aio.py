@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import fontconfig
+import fontconfig.aio
+
+
+def test_match() -> None:
+    font = asyncio.run(fontconfig.aio.match(":family=sans-serif"))
+    assert font == fontconfig.match(":family=sans-serif")
+
+
+def test_sort_and_list() -> None:
+    async def run():
+        return await asyncio.gather(
+            fontconfig.aio.sort(":family=serif", select=("family", "file")),
+            fontconfig.aio.list(select=("family",)),
+        )
+
+    fonts, families = asyncio.run(run())
+    assert fonts == fontconfig.sort(":family=serif", select=("family", "file"))
+    assert families == fontconfig.list(select=("family",))
+
+
+def test_coalesce(monkeypatch) -> None:
+    calls = []
+    match = fontconfig.match
+
+    def slow_match(*args):
+        calls.append(args)
+        time.sleep(0.05)
+        return match(*args)
+
+    monkeypatch.setattr(fontconfig, "match", slow_match)
+
+    async def run():
+        return await asyncio.gather(
+            *[fontconfig.aio.match(":family=serif") for _ in range(8)],
+            fontconfig.aio.match(":family=monospace"),
+            fontconfig.aio.match(properties={"family": "serif", "lang": ["ja"]}),
+            fontconfig.aio.match(properties={"lang": ["ja"], "family": "serif"}),
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 3
+    assert all(result == results[0] for result in results[:8])
+    assert results[0] is not results[1]
+    assert results[-1] == results[-2]
+
+
+def test_cancel(monkeypatch) -> None:
+    started = threading.Event()
+    release = threading.Event()
+    match = fontconfig.match
+
+    def blocking_match(*args):
+        started.set()
+        release.wait(5)
+        return match(*args)
+
+    monkeypatch.setattr(fontconfig, "match", blocking_match)
+
+    async def run():
+        first = asyncio.create_task(fontconfig.aio.match(":family=serif"))
+        second = asyncio.create_task(fontconfig.aio.match(":family=serif"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        # Cancelling one caller leaves the shared lookup to the other.
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        return await second
+
+    assert asyncio.run(run()) == match(":family=serif")
+
+
+def test_rebuild_waits_for_lookups(monkeypatch) -> None:
+    events = []
+    match = fontconfig.match
+    build_fonts = fontconfig.Config.build_fonts
+
+    def slow_match(*args):
+        events.append("match start")
+        time.sleep(0.05)
+        events.append("match end")
+        return match(*args)
+
+    monkeypatch.setattr(fontconfig, "match", slow_match)
+
+    async def run():
+        config = fontconfig.Config.get_current()
+        lookup = asyncio.create_task(fontconfig.aio.match(":family=serif"))
+        await asyncio.sleep(0)
+        result = await fontconfig.aio.rebuild(config)
+        events.append("rebuilt")
+        await lookup
+        return result
+
+    assert asyncio.run(run()) == build_fonts(fontconfig.Config.get_current())
+    assert events == ["match start", "match end", "rebuilt"]
+
+
+def test_rebuild_app_fonts(tmp_path) -> None:
+    config = fontconfig.Config.create()
+    assert asyncio.run(fontconfig.aio.rebuild(config, dirs=[str(tmp_path)]))
+    assert not asyncio.run(fontconfig.aio.rebuild(config, files=[str(tmp_path / "missing.ttf")]))
+
+
+def test_set_max_workers() -> None:
+    with pytest.raises(ValueError):
+        fontconfig.aio.set_max_workers(0)
+    fontconfig.aio.set_max_workers(2)
+    try:
+        assert asyncio.run(fontconfig.aio.match(":family=serif")) == fontconfig.match(":family=serif")
+    finally:
+        fontconfig.aio.set_max_workers(fontconfig.aio.DEFAULT_MAX_WORKERS)
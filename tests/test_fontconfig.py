@@ -1,5 +1,9 @@
+import array
 import logging
-from typing import Any, Generator
+import os
+import subprocess
+import sys
+from typing import Any, Dict, Generator, List, Union
 
 import fontconfig
 import pytest
@@ -11,6 +15,23 @@ def test_version() -> None:
     assert fontconfig.__version__
 
 
+def test_init() -> None:
+    fontconfig.init()
+    fontconfig.init(preload=False)
+    assert isinstance(fontconfig.Config.get_current(), fontconfig.Config)
+
+
+def test_import_is_lazy() -> None:
+    """Importing the package does not load the configuration."""
+    env = dict(os.environ, FC_DEBUG="1024")  # Log config file loading.
+    code = "import fontconfig; fontconfig.Pattern.parse(':family=serif'); print('imported')"
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "imported"
+    code = "import fontconfig; fontconfig.init(preload=False)"
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert output.stdout
+
+
 def test_Blanks() -> None:
     try:
         blanks = fontconfig.Blanks.create()
@@ -136,6 +157,78 @@ def test_Config_font_list(config, pattern, object_set) -> None:
     assert isinstance(fonts, fontconfig.FontSet)
 
 
+@pytest.fixture
+def catalog(config) -> Generator[fontconfig.FontSet, None, None]:
+    """A FontSet with a subset of the system fonts."""
+    fonts = config.get_fonts()
+    if not len(fonts):
+        pytest.skip("no fonts available")
+    family = fonts[0].get("family")
+    catalog = fontconfig.FontSet.create()
+    for font in fonts:
+        if font.get("family") == family:
+            catalog.add(font)
+    yield catalog
+
+
+def _substituted(config, name: str) -> fontconfig.Pattern:
+    pattern = fontconfig.Pattern.parse(name)
+    pattern.default_substitute()
+    config.substitute(pattern)
+    return pattern
+
+
+def test_Config_font_set_match(config, catalog) -> None:
+    font = config.font_set_match(catalog, _substituted(config, ":family=nonexistent"))
+    assert isinstance(font, fontconfig.Pattern)
+    assert font.get("family") == catalog[0].get("family")
+
+
+def test_Config_font_set_match_multiple_sets(config, catalog) -> None:
+    font = config.font_set_match([catalog, fontconfig.FontSet.create()], _substituted(config, ""))
+    assert font.get("file") in {p.get("file") for p in catalog}
+
+
+def test_Config_font_set_match_empty(config) -> None:
+    assert config.font_set_match(fontconfig.FontSet.create(), _substituted(config, "")) is None
+
+
+def test_Config_font_set_match_invalid_type(config, pattern) -> None:
+    with pytest.raises(TypeError, match="Expected FontSet"):
+        config.font_set_match([pattern], pattern)
+
+
+def test_Config_font_set_sort(config, catalog) -> None:
+    fonts = config.font_set_sort(catalog, _substituted(config, ""), trim=False)
+    assert isinstance(fonts, fontconfig.FontSet)
+    assert len(fonts) == len(catalog)
+
+
+def test_Config_font_sort_coverage(config) -> None:
+    fonts, charset = config.font_sort(_substituted(config, ""), trim=True, coverage=True)
+    if fonts is None:
+        pytest.skip("no fonts available")
+    assert isinstance(charset, fontconfig.CharSet)
+    assert len(charset) >= max(len(font.get("charset")) for font in fonts)
+
+
+def test_Config_font_set_sort_coverage(config, catalog) -> None:
+    fonts, charset = config.font_set_sort(
+        catalog, _substituted(config, ""), trim=False, coverage=True
+    )
+    assert isinstance(fonts, fontconfig.FontSet)
+    assert isinstance(charset, fontconfig.CharSet)
+    assert len(charset) >= max(len(font.get("charset")) for font in catalog)
+
+
+def test_Config_font_set_list(config, catalog) -> None:
+    object_set = fontconfig.ObjectSet.create()
+    object_set.add("file")
+    fonts = config.font_set_list(catalog, fontconfig.Pattern.create(), object_set)
+    assert isinstance(fonts, fontconfig.FontSet)
+    assert len(fonts) == len({p.get("file") for p in catalog})
+
+
 @pytest.mark.skip(reason="version compatibility issue")
 def test_Config_get_filename(config) -> None:
     assert isinstance(config.get_filename(), str)
@@ -240,6 +333,37 @@ def test_Pattern_get(pattern: fontconfig.Pattern) -> None:
         pattern.get("ftface")
 
 
+def test_Pattern_get_default() -> None:
+    pattern = fontconfig.Pattern.parse("Arial:weight=200")
+    assert pattern.get("family", default=None) == "Arial"
+    assert pattern.get("style", default=None) is None
+    assert pattern.get("family", 1, default="fallback") == "fallback"
+
+
+def test_Pattern_typed_getters() -> None:
+    pattern = fontconfig.Pattern.parse("Arial:weight=200:size=10.5:outline=true")
+    assert pattern.get_string("family") == "Arial"
+    assert pattern.get_int("weight") == 200
+    assert pattern.get_double("size") == 10.5
+    assert pattern.get_double("weight") == 200.0
+    assert pattern.get_bool("outline") is True
+    assert pattern.get_string("style") is None
+    assert pattern.get_int("slant", default=0) == 0
+    with pytest.raises(TypeError):
+        pattern.get_string("weight")
+    with pytest.raises(TypeError):
+        pattern.get_bool("family")
+
+
+def test_Pattern_to_dict() -> None:
+    pattern = fontconfig.Pattern.parse("Arial,Helvetica:weight=200")
+    assert pattern.to_dict() == {"family": "Arial", "weight": 200}
+    assert pattern.to_dict(("weight", "style")) == {"weight": 200}
+    assert "family" in pattern
+    assert "style" not in pattern
+    assert 1 not in pattern
+
+
 def test_Pattern_del() -> None:
     pattern = fontconfig.Pattern.parse(":aspect=1.0")
     assert isinstance(pattern.remove("aspect"), bool)
@@ -277,6 +401,55 @@ def object_set():
     yield object_set
 
 
+def test_FontSet_add() -> None:
+    """Test a pattern added to a font set outlives its wrapper."""
+    font_set = fontconfig.FontSet.create()
+    pattern = fontconfig.Pattern.parse(":family=Arial")
+    assert font_set.add(pattern)
+    del pattern
+    assert len(font_set) == 1
+    assert font_set[0].get("family") == "Arial"
+
+
+def test_FontSet_to_columns() -> None:
+    font_set = fontconfig.FontSet.create()
+    for name in (":family=A:slant=100:outline=True", ":family=Bé:weight=80", ":slant=0"):
+        font_set.add(fontconfig.Pattern.parse(name))
+    columns = font_set.to_columns(("family", "slant", "outline", "weight"))
+
+    family = columns["family"]
+    assert family.kind == "string"
+    assert family.valid == b"\x01\x01\x00"
+    assert family.data == "ABé".encode("utf-8")
+    assert family.offsets is not None
+    assert family.offsets.tolist() == [0, 1, 4, 4]
+    assert family.to_pylist() == ["A", "Bé", None]
+
+    assert columns["slant"].kind == "int"
+    assert isinstance(columns["slant"].data, array.array)
+    assert columns["slant"].data.typecode == "q"
+    assert columns["slant"].to_pylist() == [100, None, 0]
+    assert columns["outline"].kind == "bool"
+    assert columns["outline"].to_pylist() == [True, None, None]
+    assert columns["weight"].kind == "range"
+    assert columns["weight"].to_pylist() == [None, (80.0, 80.0), None]
+
+
+def test_FontSet_to_columns_matches_patterns(config) -> None:
+    object_set = fontconfig.ObjectSet.create()
+    object_set.build(["family", "file", "index"])
+    fonts = config.font_list(fontconfig.Pattern.create(), object_set)
+    columns = fonts.to_columns(("family", "file", "index"))
+    for name, column in columns.items():
+        assert len(column.valid) == len(fonts)
+        assert column.to_pylist() == [font.get(name) for font in fonts]
+
+
+def test_FontSet_to_columns_unsupported() -> None:
+    with pytest.raises(ValueError, match="Unsupported"):
+        fontconfig.FontSet.create().to_columns(("charset",))
+
+
 def test_ObjectSet_add(object_set) -> None:
     assert isinstance(object_set.add("familylang"), bool)
 
@@ -361,12 +534,138 @@ def test_match_with_select() -> None:
         assert set(result.keys()).issubset({"family", "file", "weight"})
 
 
+def test_match_with_cache() -> None:
+    """Test match() returns cached results for repeated requests."""
+    cache = fontconfig.MatchCache()
+    first = fontconfig.match(":family=sans-serif", cache=cache)
+    second = fontconfig.match(":family=sans-serif", cache=cache)
+    assert first == second
+    assert first == fontconfig.match(":family=sans-serif")
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert len(cache) == 1
+
+
+def test_match_with_cache_copies_results() -> None:
+    """Test mutating a cached result does not affect the cache."""
+    cache = fontconfig.MatchCache()
+    result = fontconfig.match(":family=serif", cache=cache)
+    if result is None:
+        pytest.skip("no fonts available")
+    result["family"] = "modified"
+    result = fontconfig.match(":family=serif", cache=cache)
+    assert result is not None
+    assert result["family"] != "modified"
+
+
+def test_match_cache_select_in_key() -> None:
+    """Test different select tuples are cached separately."""
+    cache = fontconfig.MatchCache()
+    fontconfig.match(":family=serif", select=("family",), cache=cache)
+    fontconfig.match(":family=serif", select=("file",), cache=cache)
+    assert cache.stats()["misses"] == 2
+
+
+def test_match_cache_eviction() -> None:
+    """Test the least recently used entry is evicted."""
+    cache = fontconfig.MatchCache(maxsize=2)
+    fontconfig.match(":family=serif", cache=cache)
+    fontconfig.match(":family=sans-serif", cache=cache)
+    fontconfig.match(":family=serif", cache=cache)
+    fontconfig.match(":family=monospace", cache=cache)
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    fontconfig.match(":family=serif", cache=cache)
+    assert cache.stats()["hits"] == 2
+
+
+def test_match_cache_invalidation(config) -> None:
+    """Test modifying app fonts invalidates the cache."""
+    cache = fontconfig.MatchCache()
+    fontconfig.match(":family=serif", config=config, cache=cache)
+    config.app_font_clear()
+    fontconfig.match(":family=serif", config=config, cache=cache)
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["hits"] == 0
+
+
+def test_match_cache_freed_config() -> None:
+    """Test a config reusing the address of a freed one gets no stale hits."""
+    cache = fontconfig.MatchCache()
+    for _ in range(10):
+        config = fontconfig.Config.create()
+        fontconfig.match(":family=serif", config=config, cache=cache)
+        del config
+    stats = cache.stats()
+    assert stats["hits"] == 0
+    assert stats["invalidations"] == 9
+
+
+def test_match_cache_invalid_maxsize() -> None:
+    with pytest.raises(ValueError):
+        fontconfig.MatchCache(maxsize=0)
+
+
 def test_match_error_both_pattern_and_properties() -> None:
     """Test error when both pattern and properties specified."""
     with pytest.raises(ValueError, match="Cannot specify both"):
         fontconfig.match(pattern=":family=Arial", properties={"family": "Arial"})
 
 
+def test_match_many() -> None:
+    """Test batch match returns the same results as match() in input order."""
+    requests: List[Union[str, Dict[str, Any]]] = [":family=serif", {"family": "monospace"}, ":family=serif", ""]
+    results = fontconfig.match_many(requests)
+    assert len(results) == len(requests)
+    assert results[0] == fontconfig.match(":family=serif")
+    assert results[1] == fontconfig.match(properties={"family": "monospace"})
+    assert results[2] == results[0]
+    assert results[3] == fontconfig.match()
+
+
+def test_match_many_duplicates_are_independent() -> None:
+    """Test deduplicated results are returned as separate dicts."""
+    results = fontconfig.match_many([":family=serif", ":family=serif"])
+    if results[0] is None:
+        pytest.skip("no fonts available")
+    assert results[0] is not results[1]
+
+
+def test_match_many_pattern_not_modified() -> None:
+    """Test Pattern inputs are not substituted in place."""
+    pattern = fontconfig.Pattern.parse(":family=serif")
+    before = len(pattern)
+    fontconfig.match_many([pattern])
+    assert len(pattern) == before
+
+
+def test_match_many_empty() -> None:
+    assert fontconfig.match_many([]) == []
+
+
+def test_match_many_invalid_type() -> None:
+    with pytest.raises(TypeError, match="Expected str, dict or Pattern"):
+        fontconfig.match_many([123])  # type: ignore[list-item]
+
+
+def test_match_many_invalid_select() -> None:
+    with pytest.raises(AttributeError):
+        fontconfig.match_many([":family=serif", ":family=sans-serif"], select=(1,))  # type: ignore[arg-type]
+    with pytest.raises(AttributeError):
+        fontconfig.sort_many([":family=serif"], select=(1,))  # type: ignore[arg-type]
+
+
+def test_sort_many() -> None:
+    """Test batch sort returns the same results as sort()."""
+    requests = [":family=serif", ":lang=en", ":family=serif"]
+    results = fontconfig.sort_many(requests, select=("family", "file"), trim=False)
+    assert len(results) == len(requests)
+    for request, fonts in zip(requests, results):
+        assert fonts == fontconfig.sort(request, select=("family", "file"), trim=False)
+
+
 def test_sort_basic() -> None:
     """Test basic sort functionality."""
     results = fontconfig.sort()
@@ -398,6 +697,18 @@ def test_sort_with_trim() -> None:
     assert len(results_no_trim) >= len(results_trim)
 
 
+def test_sort_with_cache() -> None:
+    """Test sort() returns cached results for repeated requests."""
+    cache = fontconfig.MatchCache()
+    first = fontconfig.sort(":family=sans-serif", cache=cache)
+    second = fontconfig.sort(":family=sans-serif", cache=cache)
+    third = fontconfig.sort(":family=sans-serif", trim=False, cache=cache)
+    assert first == second
+    assert third == fontconfig.sort(":family=sans-serif", trim=False)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
 def test_sort_with_select() -> None:
     """Test sort with custom select."""
     results = fontconfig.sort(":family=Arial", select=("family", "file"))
@@ -467,6 +778,30 @@ def test_properties_dict_error_handling() -> None:
         fontconfig.list(pattern=":family=Arial", properties={"family": "Arial"})
 
 
+def test_resolve_fallback() -> None:
+    """Test each font in the fallback chain covers something new."""
+    text = "Hello, \u4e16\u754c! \u0628\u2801 \U0001f389"
+    results = fontconfig.resolve_fallback(text, select=("family", "charset"))
+    assert isinstance(results, list)
+    remaining = set(text)
+    for font in results:
+        covered = {c for c in remaining if ord(c) in font["charset"]}
+        assert covered
+        remaining -= covered
+    if results:
+        sorted_fonts = fontconfig.sort(select=("charset",), trim=True)
+        assert not any(ord(c) in font["charset"] for c in remaining for font in sorted_fonts)
+
+
+def test_resolve_fallback_empty_text() -> None:
+    assert fontconfig.resolve_fallback("") == []
+
+
+def test_resolve_fallback_with_select() -> None:
+    for font in fontconfig.resolve_fallback("abc", ":family=serif", select=("family",)):
+        assert set(font.keys()).issubset({"family"})
+
+
 def test_match_with_custom_config() -> None:
     """Test match with custom config."""
     config = fontconfig.Config.get_current()
@@ -488,6 +823,33 @@ def test_list_with_custom_config() -> None:
     assert isinstance(results, list)
 
 
+def test_sort_limit() -> None:
+    """Test sort with a limit on the number of results."""
+    results = fontconfig.sort(":family=sans-serif", limit=2)
+    assert len(results) <= 2
+    assert results == fontconfig.sort(":family=sans-serif")[:2]
+    assert fontconfig.sort(":family=sans-serif", limit=0) == []
+    with pytest.raises(ValueError):
+        fontconfig.sort(":family=sans-serif", limit=-1)
+
+
+def test_iter_list() -> None:
+    """Test iter_list yields the same fonts as list."""
+    fonts = fontconfig.iter_list(":lang=en", select=("family", "file"))
+    assert iter(fonts) is fonts
+    assert [font for font in fonts] == fontconfig.list(":lang=en", select=("family", "file"))
+
+
+def test_iter_sort() -> None:
+    """Test iter_sort yields the same fonts as sort."""
+    fonts = fontconfig.iter_sort(":family=serif")
+    assert [font for font in fonts] == fontconfig.sort(":family=serif")
+    fonts = fontconfig.iter_sort(properties={"family": "serif"}, trim=False)
+    assert [font for font in fonts] == fontconfig.sort(":family=serif", trim=False)
+    first = next(fontconfig.iter_sort(":family=serif", select=("family",)), None)
+    assert first is None or set(first.keys()).issubset({"family"})
+
+
 # CharSet tests
 
 
@@ -522,6 +884,44 @@ def test_CharSet_from_codepoints() -> None:
     assert 0x41 in charset
 
 
+def test_CharSet_from_codepoints_buffer() -> None:
+    """Test creating charset from buffers of 32-bit codepoints."""
+    expected = fontconfig.CharSet.from_codepoints([0x41, 0x42, 0x1F389])
+    assert fontconfig.CharSet.from_codepoints(array.array("I", [0x41, 0x42, 0x1F389])) == expected
+    assert fontconfig.CharSet.from_codepoints(array.array("i", [0x41, 0x42, 0x1F389])) == expected
+    assert fontconfig.CharSet.from_codepoints(memoryview(array.array("I", [0x41, 0x42, 0x1F389]))) == expected
+
+
+def test_CharSet_from_codepoints_invalid() -> None:
+    with pytest.raises(ValueError, match="-1 out of valid range"):
+        fontconfig.CharSet.from_codepoints(array.array("i", [0x41, -1]))
+    with pytest.raises(ValueError, match="out of valid range"):
+        fontconfig.CharSet.from_codepoints([0x110000])
+    with pytest.raises(TypeError, match="Expected str or int"):
+        fontconfig.CharSet.from_codepoints([1.5])  # type: ignore[list-item]
+
+
+def test_CharSet_update() -> None:
+    charset = fontconfig.CharSet.from_string("ab")
+    charset.update("b\U0001f389")
+    charset.update(range(0x30, 0x32))
+    assert sorted(charset) == [0x30, 0x31, ord("a"), ord("b"), 0x1F389]
+
+
+def test_CharSet_has_chars() -> None:
+    charset = fontconfig.CharSet.from_string("h\u00e9llo\U0001f389")
+    assert charset.has_chars("hax\U0001f389") == b"\x01\x00\x00\x01"
+    assert charset.has_chars(array.array("I", [ord("h"), ord("x")])) == b"\x01\x00"
+    assert charset.has_chars("") == b""
+
+
+def test_CharSet_first_missing() -> None:
+    charset = fontconfig.CharSet.from_string("hello")
+    assert charset.first_missing("hello world") == 5
+    assert charset.first_missing("hell") == -1
+    assert charset.first_missing([ord("h"), "x"]) == 1
+
+
 def test_CharSet_add_char() -> None:
     """Test adding characters by string."""
     charset = fontconfig.CharSet.create()
@@ -674,6 +1074,49 @@ def test_CharSet_copy() -> None:
     assert charset1 != charset2
 
 
+def test_CharSet_copy_font_charset() -> None:
+    """Test copying a constant charset owned by a font."""
+    fonts = fontconfig.list(select=("charset",))
+    if not fonts:
+        pytest.skip("no fonts available")
+    charset = fonts[0]["charset"].copy()
+    assert charset == fonts[0]["charset"]
+    assert charset.add(0x10FFFF)
+    assert charset != fonts[0]["charset"]
+
+
+def test_CharSet_iter_ranges() -> None:
+    charset = fontconfig.CharSet.from_codepoints([5, 0xFF, 0x100, 0x101, 0x41, 0x42, 0x10FFFF])
+    assert list(charset.iter_ranges()) == [(5, 5), (0x41, 0x42), (0xFF, 0x101), (0x10FFFF, 0x10FFFF)]
+    assert list(fontconfig.CharSet.create().iter_ranges()) == []
+
+
+def test_CharSet_iter_pages() -> None:
+    charset = fontconfig.CharSet.from_codepoints([0x41, 0x4E00, 0x4E09])
+    pages = list(charset.iter_pages())
+    assert [base for base, _ in pages] == [0x0, 0x4E00]
+    assert all(len(bitmap) == 32 for _, bitmap in pages)
+    assert int.from_bytes(pages[0][1], "little") == 1 << 0x41
+    assert int.from_bytes(pages[1][1], "little") == (1 << 0) | (1 << 9)
+
+
+def test_CharSet_bytes_roundtrip() -> None:
+    charset = fontconfig.CharSet.from_string("Hello, \u4e16\u754c! \U0001f389")
+    data = charset.to_bytes()
+    assert data[:4] == b"FcCS"
+    assert len(data) == 8 + 36 * len(list(charset.iter_pages()))
+    assert fontconfig.CharSet.from_bytes(data) == charset
+    empty = fontconfig.CharSet.create()
+    assert fontconfig.CharSet.from_bytes(empty.to_bytes()) == empty
+
+
+def test_CharSet_from_bytes_invalid() -> None:
+    data = fontconfig.CharSet.from_string("abc").to_bytes()
+    for invalid in (b"", b"XXXX" + data[4:], data[:-1], data[:8] + b"\x01" + data[9:]):
+        with pytest.raises(ValueError, match="Invalid CharSet data"):
+            fontconfig.CharSet.from_bytes(invalid)
+
+
 def test_CharSet_eq() -> None:
     """Test equality comparison."""
     charset1 = fontconfig.CharSet.from_string("abc")
@@ -692,6 +1135,59 @@ def test_CharSet_eq_different_type() -> None:
     assert charset != 123
 
 
+def test_CharSet_set_operators() -> None:
+    a = fontconfig.CharSet.from_string("abc")
+    b = fontconfig.CharSet.from_string("bcd")
+    assert a | b == fontconfig.CharSet.from_string("abcd")
+    assert a & b == fontconfig.CharSet.from_string("bc")
+    assert a - b == fontconfig.CharSet.from_string("a")
+    assert len(a) == 3 and len(b) == 3
+
+
+def test_CharSet_subset() -> None:
+    a = fontconfig.CharSet.from_string("ab")
+    b = fontconfig.CharSet.from_string("abc")
+    assert a <= b and a < b
+    assert b >= a and b > a
+    assert a <= a and not a < a
+    assert not b <= a
+
+
+def test_CharSet_ior() -> None:
+    a = fontconfig.CharSet.from_string("ab")
+    original = a
+    a |= fontconfig.CharSet.from_string("bc")
+    assert a is original
+    assert a == fontconfig.CharSet.from_string("abc")
+
+
+def test_CharSet_ior_font_charset() -> None:
+    """Test in-place union on a constant charset owned by a font."""
+    fonts = fontconfig.list(select=("charset",))
+    if not fonts:
+        pytest.skip("no fonts available")
+    charset = fonts[0]["charset"]
+    count = len(charset)
+    charset |= fontconfig.CharSet.from_codepoints([0x10FFFF])
+    assert len(charset) == count + 1
+    assert len(fontconfig.list(select=("charset",))[0]["charset"]) == count
+
+
+def test_CharSet_operators_invalid_type() -> None:
+    charset = fontconfig.CharSet.from_string("abc")
+    with pytest.raises(TypeError):
+        charset | "d"  # type: ignore[operator]
+    with pytest.raises(TypeError):
+        charset <= "abc"
+
+
+def test_CharSet_counts() -> None:
+    charset = fontconfig.CharSet.from_string("hello")
+    assert charset.intersection_count("help") == 3
+    assert charset.missing_count("help") == 1
+    assert charset.missing_count(fontconfig.CharSet.from_string("hell")) == 0
+
+
 def test_CharSet_repr_empty() -> None:
     """Test string representation of empty charset."""
     charset = fontconfig.CharSet.create()
@@ -759,6 +1255,173 @@ def test_CharSet_conversion_codepoints() -> None:
     assert "C" in retrieved
 
 
+# LangSet tests
+
+
+def test_LangSet_from_langs() -> None:
+    langs = fontconfig.LangSet.from_langs(["en", "fr"])
+    assert len(langs) == 2
+    assert "en" in langs
+    assert "de" not in langs
+    assert 1 not in langs
+    assert sorted(langs) == ["en", "fr"]
+    assert langs == ["fr", "en"]
+    assert langs == fontconfig.LangSet.from_langs(("fr", "en"))
+    assert langs != fontconfig.LangSet.from_langs(["en"])
+    assert langs.copy() == langs
+    assert len(fontconfig.LangSet.create()) == 0
+    assert repr(fontconfig.LangSet.from_langs(["en"])) == "LangSet(['en'])"
+
+
+def test_LangSet_pattern_value() -> None:
+    pattern = fontconfig.Pattern.parse(":lang=en|fr")
+    langs = pattern.get("lang")
+    assert isinstance(langs, fontconfig.LangSet)
+    assert langs == ["en", "fr"]
+    other = fontconfig.Pattern.create()
+    other.add("lang", langs)
+    assert other.get("lang") == langs
+
+
+def test_LangSet_list() -> None:
+    fonts = fontconfig.list(select=("family", "lang"))
+    fonts = [font for font in fonts if "lang" in font]
+    if not fonts:
+        pytest.skip("no fonts available")
+    langs = fonts[0]["lang"]
+    assert isinstance(langs, fontconfig.LangSet)
+    assert len(langs) == len([lang for lang in langs])
+    assert all(lang in langs for lang in langs)
+
+
+def test_LangSet_operators() -> None:
+    a = fontconfig.LangSet.from_langs(["en", "fr", "de"])
+    b = fontconfig.LangSet.from_langs(["en", "ja"])
+    assert a | b == ["de", "en", "fr", "ja"]
+    assert a - b == ["de", "fr"]
+    assert a & b == ["en"]
+    en = fontconfig.LangSet.from_langs(["en"])
+    assert en <= a
+    assert en < a
+    assert a >= en
+    assert a > en
+    assert not a <= en
+    assert en >= fontconfig.LangSet.from_langs(["en-us"])
+    assert hash(a) == hash(a.copy())
+    assert len({a, a.copy(), b}) == 2
+    assert a != ("de", "en", "fr")
+    assert a != frozenset(["de", "en", "fr"])
+
+
+def test_LangSet_compare() -> None:
+    langs = fontconfig.LangSet.from_langs(["en", "fr"])
+    assert langs.has_lang("en") == "equal"
+    assert langs.has_lang("en-us") == "different_territory"
+    assert langs.has_lang("ja") == "different_lang"
+    assert langs.compare(fontconfig.LangSet.from_langs(["fr"])) == "equal"
+    assert langs.compare(fontconfig.LangSet.from_langs(["ja"])) == "different_lang"
+
+
+def test_lang_charset() -> None:
+    charset = fontconfig.lang_charset("en")
+    assert isinstance(charset, fontconfig.CharSet)
+    assert "a" in charset
+    assert fontconfig.lang_charset("not-a-language") is None
+
+
+def test_normalize_lang() -> None:
+    assert fontconfig.normalize_lang("ja_JP.UTF-8") == "ja"
+    assert fontconfig.normalize_lang("en") == "en"
+
+
+def test_FontSet_filter_by_lang() -> None:
+    fonts = fontconfig.FontSet.create()
+    for family, langs in (("A", ["en", "fr"]), ("B", ["en"]), ("C", ["ja"])):
+        pattern = fontconfig.Pattern.parse(":family=%s" % family)
+        pattern.add("lang", langs)
+        fonts.add(pattern)
+    fonts.add(fontconfig.Pattern.parse(":family=D"))
+    assert [font.get("family") for font in fonts.filter_by_lang(["en"])] == ["A", "B"]
+    assert [font.get("family") for font in fonts.filter_by_lang(["en", "fr"])] == ["A"]
+    assert [font.get("family") for font in fonts.filter_by_lang(["en-us"])] == ["A", "B"]
+    assert len(fonts.filter_by_lang(fontconfig.LangSet.from_langs(["ko"]))) == 0
+    assert len(fonts.filter_by_lang([])) == 3
+
+
+# Serialization tests
+
+
+def test_Pattern_bytes_roundtrip() -> None:
+    pattern = fontconfig.Pattern.create()
+    pattern.add("family", "Noto Sans")
+    pattern.add("family", "sans-serif")
+    pattern.add("weight", 200)
+    pattern.add("size", 12.5)
+    pattern.add("antialias", True)
+    pattern.add("matrix", (1.0, 0.2, 0.0, 1.0))
+    pattern.add("charset", "Hello, \u4e16\u754c!")
+    pattern.add("lang", ["en", "ja"])
+    pattern.default_substitute()
+    data = pattern.to_bytes()
+    assert data[:4] == b"FcPt"
+    restored = fontconfig.Pattern.from_bytes(data)
+    assert restored == pattern
+    assert restored.unparse() == pattern.unparse()
+    empty = fontconfig.Pattern.create()
+    assert dict(fontconfig.Pattern.from_bytes(empty.to_bytes())) == {}
+
+
+def test_FontSet_bytes_roundtrip() -> None:
+    config = fontconfig.Config.get_current()
+    object_set = fontconfig.ObjectSet.create()
+    object_set.build(["family", "style", "file", "weight", "charset", "lang"])
+    fonts = config.font_list(fontconfig.Pattern.create(), object_set)
+    data = fonts.to_bytes()
+    assert data[:4] == b"FcFS"
+    restored = fontconfig.FontSet.from_bytes(data)
+    assert [dict(font) for font in restored] == [dict(font) for font in fonts]
+    assert len(fontconfig.FontSet.from_bytes(fontconfig.FontSet.create().to_bytes())) == 0
+
+
+def test_LangSet_bytes_roundtrip() -> None:
+    langs = fontconfig.LangSet.from_langs(["en", "ja", "zh-tw", "x-custom"])
+    data = langs.to_bytes()
+    assert data[:4] == b"FcLS"
+    assert fontconfig.LangSet.from_bytes(data) == langs
+    assert fontconfig.LangSet.from_bytes(fontconfig.LangSet.create().to_bytes()) == []
+
+
+def test_pickle() -> None:
+    import pickle
+
+    pattern = fontconfig.Pattern.parse(":family=serif:weight=80")
+    pattern.add("lang", ["en"])
+    pattern.add("charset", "abc")
+    restored = pickle.loads(pickle.dumps(pattern))
+    assert isinstance(restored, fontconfig.Pattern)
+    assert restored == pattern
+    fonts = fontconfig.FontSet.create()
+    fonts.add(pattern)
+    restored = pickle.loads(pickle.dumps(fonts))
+    assert [dict(font) for font in restored] == [dict(pattern)]
+    charset = fontconfig.CharSet.from_string("abc")
+    assert pickle.loads(pickle.dumps(charset)) == charset
+    langs = fontconfig.LangSet.from_langs(["en", "fr"])
+    assert pickle.loads(pickle.dumps(langs)) == langs
+
+
+def test_from_bytes_invalid() -> None:
+    pattern = fontconfig.Pattern.parse(":family=serif:weight=80:lang=en")
+    data = pattern.to_bytes()
+    for invalid in (b"", b"FcPt", b"FcFS" + data[4:], data[:-1], data + b"\0"):
+        with pytest.raises(ValueError, match="Invalid Pattern data"):
+            fontconfig.Pattern.from_bytes(invalid)
+    with pytest.raises(ValueError, match="Invalid FontSet data"):
+        fontconfig.FontSet.from_bytes(b"FcFS\0\0\0\0\1\0\0\0")
+    with pytest.raises(ValueError, match="Invalid LangSet data"):
+        fontconfig.LangSet.from_bytes(data)
+
+
 # Integration tests with public APIs
 
 
@@ -894,3 +1557,624 @@ def test_CharSet_integration_compare_with_font_charset() -> None:
 
         # Font charset should contain more characters than our test charset
         assert len(font_charset) >= len(test_charset)
+
+
+# Cache tests
+
+
+@pytest.fixture
+def cache_env(tmp_path) -> Generator[tuple, None, None]:
+    """Font directory with a subdirectory, and a config writing caches to tmp_path."""
+    import shutil
+
+    files = [font["file"] for font in fontconfig.list(select=("file",)) if "file" in font]
+    if not files:
+        pytest.skip("no fonts available")
+    font_dir = tmp_path / "fonts"
+    (font_dir / "sub").mkdir(parents=True)
+    shutil.copy(files[0], font_dir)
+    shutil.copy(files[-1], font_dir / "sub")
+    (tmp_path / "cache").mkdir()
+    conf = tmp_path / "fonts.conf"
+    conf.write_text("<fontconfig><cachedir>%s</cachedir></fontconfig>" % (tmp_path / "cache"))
+    config = fontconfig.Config.create()
+    assert config.parse_and_load(str(conf))
+    yield str(font_dir), str(tmp_path / "cache"), config
+
+
+def test_Cache_read(cache_env) -> None:
+    font_dir, cache_dir, config = cache_env
+    assert fontconfig.Cache.load(font_dir, config=config) is None
+    cache = fontconfig.Cache.read(font_dir, config=config)
+    assert isinstance(cache, fontconfig.Cache)
+    assert cache.dir == font_dir
+    assert cache.num_font == len(cache) == 1
+    assert cache.subdirs == [os.path.join(font_dir, "sub")]
+    assert len(os.listdir(cache_dir)) == 1
+
+    fonts = cache.get_fonts()
+    assert isinstance(fonts, fontconfig.FontSet)
+    assert os.path.dirname(fonts[0].get("file")) == font_dir
+
+    loaded = fontconfig.Cache.load(font_dir, config=config)
+    assert loaded is not None and loaded.num_font == 1
+
+
+def test_Cache_rescan(cache_env) -> None:
+    font_dir, _, config = cache_env
+    assert fontconfig.Cache.rescan(font_dir, config=config) is None
+    assert fontconfig.Cache.read(font_dir, config=config) is not None
+    cache = fontconfig.Cache.rescan(font_dir, config=config)
+    assert cache is not None and cache.num_font == 1
+
+
+def test_Cache_missing_dir(cache_env, tmp_path) -> None:
+    _, _, config = cache_env
+    assert fontconfig.Cache.read(str(tmp_path / "missing"), config=config) is None
+
+
+def test_Cache_unlink_and_clean(cache_env) -> None:
+    font_dir, cache_dir, config = cache_env
+    assert fontconfig.Cache.read(font_dir, config=config) is not None
+    assert fontconfig.Cache.unlink(font_dir, config=config)
+    assert os.listdir(cache_dir) == []
+    assert fontconfig.Cache.load(font_dir, config=config) is None
+    assert fontconfig.Cache.clean(cache_dir)
+
+
+def test_build_caches(cache_env, tmp_path) -> None:
+    font_dir, cache_dir, config = cache_env
+    reported = []
+    results = fontconfig.build_caches(
+        [font_dir, str(tmp_path / "missing")],
+        workers=2,
+        progress=lambda path, count: reported.append((path, count)),
+        config=config,
+    )
+    assert results == {font_dir: 1, os.path.join(font_dir, "sub"): 1}
+    assert sorted(reported) == sorted(results.items())
+    assert len(os.listdir(cache_dir)) == 2
+    assert fontconfig.Cache.load(os.path.join(font_dir, "sub"), config=config) is not None
+
+
+def test_build_caches_force(cache_env) -> None:
+    font_dir, _, config = cache_env
+    assert fontconfig.build_caches([font_dir], config=config)
+    assert fontconfig.build_caches([font_dir], force=True, config=config)[font_dir] == 1
+
+
+def test_build_caches_invalid_workers() -> None:
+    with pytest.raises(ValueError, match="workers must be positive"):
+        fontconfig.build_caches([], workers=0)
+
+
+def test_Cache_is_valid(tmp_path) -> None:
+    assert isinstance(fontconfig.Cache.is_valid(str(tmp_path)), bool)
+
+
+# Font file query tests
+
+
+@pytest.fixture
+def font_file() -> str:
+    files = [font["file"] for font in fontconfig.list(select=("file",)) if "file" in font]
+    if not files:
+        pytest.skip("no fonts available")
+    return files[0]
+
+
+def test_query_file(font_file) -> None:
+    fonts = fontconfig.query_file(font_file)
+    assert isinstance(fonts, fontconfig.FontSet)
+    assert len(fonts) >= 1
+    assert all(font.get("file") == font_file for font in fonts)
+
+
+def test_query_file_index(font_file) -> None:
+    pattern = fontconfig.query_file(font_file, index=0)
+    assert isinstance(pattern, fontconfig.Pattern)
+    assert pattern.get("file") == font_file
+    assert pattern.get("index") == 0
+    assert fontconfig.query_file(font_file, index=1000) is None
+    with pytest.raises(ValueError):
+        fontconfig.query_file(font_file, index=-1)
+
+
+def test_query_file_not_a_font(tmp_path) -> None:
+    path = tmp_path / "not-a-font.ttf"
+    path.write_bytes(b"not a font")
+    assert len(fontconfig.query_file(str(path))) == 0
+    assert fontconfig.query_file(str(path), index=0) is None
+    assert len(fontconfig.query_file(str(tmp_path / "missing.ttf"))) == 0
+
+
+def test_query_files(font_file, tmp_path) -> None:
+    invalid = tmp_path / "invalid.otf"
+    invalid.write_bytes(b"")
+    paths = [font_file, str(invalid), font_file]
+    results = fontconfig.query_files(paths, workers=2)
+    assert [len(fonts) > 0 for fonts in results] == [True, False, True]
+    assert results[0][0] == results[2][0]
+    assert fontconfig.query_files([]) == []
+
+
+def test_query_bytes(font_file) -> None:
+    with open(font_file, "rb") as f:
+        data = f.read()
+    expected = fontconfig.query_file(font_file)
+    fonts = fontconfig.query_bytes(data, name=font_file)
+    assert isinstance(fonts, fontconfig.FontSet)
+    assert [font for font in fonts] == [font for font in expected]
+    fonts = fontconfig.query_bytes(memoryview(data), name=font_file)
+    assert fonts[0] == expected[0]
+    fonts = fontconfig.FontSet.from_buffer(bytearray(data), name=font_file)
+    assert fonts[0] == expected[0]
+    fonts = fontconfig.query_bytes(data)
+    with pytest.raises(KeyError):
+        fonts[0].get("file")
+
+
+def test_query_bytes_index(font_file) -> None:
+    with open(font_file, "rb") as f:
+        data = f.read()
+    pattern = fontconfig.query_bytes(data, name=font_file, index=0)
+    assert pattern == fontconfig.query_file(font_file, index=0)
+    assert fontconfig.query_bytes(data, index=1000) is None
+    with pytest.raises(ValueError):
+        fontconfig.query_bytes(data, index=-1)
+
+
+def test_query_bytes_not_a_font() -> None:
+    assert len(fontconfig.query_bytes(b"not a font")) == 0
+    assert len(fontconfig.query_bytes(b"")) == 0
+    assert fontconfig.query_bytes(b"not a font", index=0) is None
+    with pytest.raises(TypeError):
+        fontconfig.query_bytes("not bytes")
+
+
+# CoverageIndex tests
+
+
+@pytest.fixture
+def coverage_fonts() -> fontconfig.FontSet:
+    font_set = fontconfig.FontSet.create()
+    for family, text in (
+        ("Latin", "abcdefgh"),
+        ("Greek", "abc\u03b1\u03b2\u03b3"),
+        ("CJK", "ab\u4e16\u754c"),
+        ("Empty", ""),
+    ):
+        pattern = fontconfig.Pattern.parse(":family=%s" % family)
+        if text:
+            pattern.add("charset", fontconfig.CharSet.from_string(text))
+        font_set.add(pattern)
+    return font_set
+
+
+def _families(fonts) -> list:
+    return [font["family"] for font in fonts]
+
+
+def test_CoverageIndex_covering(coverage_fonts) -> None:
+    index = fontconfig.CoverageIndex.build(coverage_fonts, select=("family",))
+    assert len(index) == 4
+    assert _families(index.fonts) == ["Latin", "Greek", "CJK", "Empty"]
+    assert _families(index.covering("ab")) == ["Latin", "Greek", "CJK"]
+    assert _families(index.covering("abc\u03b1")) == ["Greek"]
+    assert _families(index.covering("a\u4e16")) == ["CJK"]
+    assert index.covering("a\u03b1\u4e16") == []
+    assert index.covering("\U0001f389") == []
+    assert len(index.covering("")) == 4
+
+
+def test_CoverageIndex_best(coverage_fonts) -> None:
+    index = fontconfig.CoverageIndex.build(coverage_fonts, select=("family",))
+    best = index.best("abc\u03b1\u4e16\u4e16", n=2)
+    assert [(font["family"], count) for font, count in best] == [("Greek", 4), ("Latin", 3)]
+    assert index.best("\U0001f389") == []
+
+
+def test_CoverageIndex_save_load(coverage_fonts, tmp_path) -> None:
+    index = fontconfig.CoverageIndex.build(coverage_fonts, select=("family",))
+    path = str(tmp_path / "coverage.idx")
+    index.save(path)
+    loaded = fontconfig.CoverageIndex.load(path)
+    assert loaded.fonts == index.fonts
+    for text in ("ab", "abc\u03b1", "a\u4e16", "xyz"):
+        assert loaded.covering(text) == index.covering(text)
+        assert loaded.best(text) == index.best(text)
+
+
+def test_CoverageIndex_save_load_lang(tmp_path) -> None:
+    index = fontconfig.CoverageIndex.from_config(select=("family", "file", "lang"))
+    path = str(tmp_path / "coverage.idx")
+    index.save(path)
+    loaded = fontconfig.CoverageIndex.load(path)
+    assert loaded.fonts == index.fonts
+    assert all(isinstance(font["lang"], fontconfig.LangSet) for font in loaded.fonts if "lang" in font)
+
+
+def test_CoverageIndex_load_invalid(tmp_path) -> None:
+    path = tmp_path / "invalid.idx"
+    path.write_bytes(b"FcCI\x01\x00")
+    with pytest.raises(ValueError, match="Invalid CoverageIndex data"):
+        fontconfig.CoverageIndex.load(str(path))
+
+
+def test_CoverageIndex_from_config() -> None:
+    index = fontconfig.CoverageIndex.from_config(select=("family", "file", "charset"))
+    fonts = index.fonts
+    assert len(fonts) == len(index)
+    expected = [font["file"] for font in fonts if all(ord(c) in font.get("charset", ()) for c in "Hello")]
+    assert [font["file"] for font in index.covering("Hello")] == expected
+
+
+# Snapshot tests
+
+
+def test_Snapshot_config(tmp_path) -> None:
+    path = str(tmp_path / "fonts.snapshot")
+    fontconfig.Snapshot.export(path)
+    with fontconfig.Snapshot.open(path) as snapshot:
+        assert len(snapshot) == len(fontconfig.Config.get_current().get_fonts())
+        families = snapshot.families()
+        for family in families:
+            expected = fontconfig.list(properties={"family": family}, select=("family", "style", "file"))
+            fonts = snapshot.list(family=family, select=("family", "style", "file"))
+            assert sorted(fonts, key=repr) == sorted(expected, key=repr)
+        for pattern in (":family=serif", ":family=sans-serif:weight=200", ":lang=ja", ":family=Nonexistent"):
+            assert snapshot.match(pattern) == fontconfig.match(pattern)
+        if len(snapshot):
+            assert isinstance(snapshot[0], fontconfig.Pattern)
+            assert snapshot[-1].get("file") == snapshot[len(snapshot) - 1].get("file")
+    with pytest.raises(ValueError, match="closed"):
+        snapshot.list()
+
+
+def test_Snapshot_font_set(tmp_path) -> None:
+    fonts = fontconfig.FontSet.create()
+    for family, style, weight in (("Foo Sans", "Regular", 80), ("Foo Sans", "Bold", 200), ("Bar", "Regular", 80)):
+        pattern = fontconfig.Pattern.parse(":family=%s:style=%s:weight=%d" % (family, style, weight))
+        pattern.add("charset", "abc")
+        fonts.add(pattern)
+    path = str(tmp_path / "fonts.snapshot")
+    fontconfig.Snapshot.export(path, font_set=fonts)
+    snapshot = fontconfig.Snapshot.open(path)
+    assert repr(snapshot) == "<Snapshot: 3 fonts, 2 families>"
+    assert snapshot.families() == ["Bar", "Foo Sans"]
+    assert [font["style"] for font in snapshot.list(family="foosans", select=("style",))] == ["Regular", "Bold"]
+    assert snapshot.list(family="Foo Sans", style="bold", select=("weight",)) == [{"weight": 200.0}]
+    assert snapshot.list(family="Baz") == []
+    assert snapshot[0].get("charset") == fontconfig.CharSet.from_string("abc")
+    assert snapshot.match(":family=Foo Sans:weight=200", select=("style",)) == {"style": "Bold"}
+    assert snapshot.match(":family=Bar", select=("family",)) == {"family": "Bar"}
+    with pytest.raises(IndexError):
+        snapshot[3]
+    with pytest.raises(TypeError):
+        fontconfig.Snapshot()
+
+
+def test_Snapshot_match_lang(tmp_path) -> None:
+    """Weakly bound families do not outrank fonts covering the language."""
+    fonts = fontconfig.FontSet.create()
+    for name in (":family=FooJP:lang=ja", ":family=DejaVu Sans:lang=en"):
+        fonts.add(fontconfig.Pattern.parse(name))
+    path = str(tmp_path / "fonts.snapshot")
+    fontconfig.Snapshot.export(path, font_set=fonts)
+    snapshot = fontconfig.Snapshot.open(path)
+    config = fontconfig.Config.get_current()
+    for request in (":lang=ja", ":family=sans-serif:lang=ja", ":family=DejaVu Sans:lang=ja", ":family=FooJP"):
+        pattern = fontconfig.Pattern.parse(request)
+        pattern.default_substitute()
+        config.substitute(pattern)
+        expected = config.font_set_match(fonts, pattern)
+        assert expected is not None
+        assert snapshot.match(request, select=("family",)) == {"family": expected.get("family")}
+    assert snapshot.match(":lang=ja", select=("family",)) == {"family": "FooJP"}
+    assert snapshot.match(":family=DejaVu Sans:lang=ja", select=("family",)) == {"family": "DejaVu Sans"}
+
+
+def test_Snapshot_match_priority(tmp_path) -> None:
+    """Properties added by substitution can outrank the requested family."""
+    fonts = fontconfig.FontSet.create()
+    for name in (":family=Foo:variable=True", ":family=Bar:variable=False"):
+        fonts.add(fontconfig.Pattern.parse(name))
+    path = str(tmp_path / "fonts.snapshot")
+    fontconfig.Snapshot.export(path, font_set=fonts)
+    snapshot = fontconfig.Snapshot.open(path)
+    config = fontconfig.Config.get_current()
+    for request in (":family=Foo", ":family=Foo:variable=True", ":family=Bar", ""):
+        pattern = fontconfig.Pattern.parse(request)
+        pattern.default_substitute()
+        config.substitute(pattern)
+        expected = config.font_set_match(fonts, pattern)
+        assert expected is not None
+        assert snapshot.match(request, select=("family",)) == {"family": expected.get("family")}
+    assert snapshot.match(":family=Foo:variable=True", select=("family",)) == {"family": "Foo"}
+
+
+def test_Snapshot_invalid(tmp_path) -> None:
+    path = str(tmp_path / "fonts.snapshot")
+    fontconfig.Snapshot.export(path, font_set=fontconfig.FontSet.create())
+    with open(path, "rb") as f:
+        data = f.read()
+    for invalid in (b"", b"XXXX" + data[4:], data[:-1], data + b"\0"):
+        with open(path, "wb") as f:
+            f.write(invalid)
+        with pytest.raises(ValueError):
+            fontconfig.Snapshot.open(path)
+
+
+# Query tests
+
+
+def test_prepare_match() -> None:
+    query = fontconfig.prepare(":family=serif", select=("family", "file"))
+    assert isinstance(query, fontconfig.Query)
+    assert query.select == ("family", "file")
+    assert query.match() == fontconfig.match(":family=serif", select=("family", "file"))
+    assert query.match() == query.match()
+
+
+def test_prepare_overrides() -> None:
+    query = fontconfig.prepare(properties={"family": "serif"}, select=("family", "style"))
+    assert query.match(weight=200) == fontconfig.match(
+        properties={"family": "serif", "weight": 200}, select=("family", "style")
+    )
+    assert query.match(family="monospace") == fontconfig.match(
+        ":family=monospace", select=("family", "style")
+    )
+    assert query.match(family=None) == fontconfig.match(select=("family", "style"))
+    # Overrides do not modify the prepared pattern.
+    assert query.pattern.get("family") == "serif"
+    with pytest.raises(KeyError):
+        query.match(nonexistent=1)
+
+
+def test_prepare_sort_and_list() -> None:
+    query = fontconfig.prepare(":family=sans-serif", select=("family", "file", "style"))
+    assert query.sort() == fontconfig.sort(":family=sans-serif")
+    assert query.sort(limit=1) == fontconfig.sort(":family=sans-serif", limit=1)
+    assert query.list() == fontconfig.list(":family=sans-serif", select=("family", "file", "style"))
+    query = fontconfig.prepare(select=("family",), trim=False)
+    assert query.sort() == fontconfig.sort(select=("family",), trim=False)
+    assert query.list() == fontconfig.list(select=("family",))
+    families = {font["family"] for font in query.list()}
+    for family in families:
+        assert all(font["family"] == family for font in query.list(family=family))
+
+
+def test_prepare_invalid() -> None:
+    with pytest.raises(KeyError):
+        fontconfig.prepare(select=("nonexistent",))
+    with pytest.raises(TypeError):
+        fontconfig.Query()
+
+
+# Stats tests
+
+
+@pytest.fixture
+def stats():
+    records = []
+    fontconfig.reset_stats()
+    fontconfig.add_stats_hook(records.append)
+    fontconfig.enable_stats()
+    try:
+        yield records
+    finally:
+        fontconfig.enable_stats(False)
+        fontconfig.remove_stats_hook(records.append)
+        fontconfig.reset_stats()
+
+
+def test_stats_calls(stats) -> None:
+    cache = fontconfig.MatchCache()
+    fontconfig.match(":family=serif", cache=cache)
+    fontconfig.match(":family=serif", cache=cache)
+    results = fontconfig.sort(":family=sans-serif", limit=2)
+    fontconfig.list(properties={"family": "nonexistent"})
+
+    assert [record.operation for record in stats] == ["match", "match", "sort", "list"]
+    assert [record.cache_hit for record in stats] == [False, True, None, None]
+    assert [record.results for record in stats] == [1, 1, len(results), 0]
+    assert set(stats[0].phases) == {"parse", "substitute", "match", "convert"}
+    assert set(stats[1].phases) == {"parse"}
+    assert all(record.elapsed >= sum(record.phases.values()) for record in stats)
+
+    calls = fontconfig.get_stats()["calls"]
+    assert calls["match"]["count"] == 2
+    assert calls["match"]["cache_hits"] == 1
+    assert calls["match"]["cache_misses"] == 1
+    assert calls["sort"]["results"] == len(results)
+    assert calls["list"]["count"] == 1
+    assert sum(count for _, count in calls["match"]["histogram"]) == 2
+    assert calls["match"]["histogram"][-1][0] == float("inf")
+
+
+def test_stats_phases(stats) -> None:
+    config = fontconfig.Config.get_current()
+    pattern = fontconfig.Pattern.parse(":family=serif")
+    pattern.default_substitute()
+    config.substitute(pattern)
+    config.font_match(pattern)
+    query = fontconfig.prepare(":family=serif")
+    query.match()
+    query.sort(limit=1)
+
+    result = fontconfig.get_stats()
+    assert result["enabled"]
+    phases = result["phases"]
+    assert phases["match"]["count"] == 2
+    assert phases["sort"]["count"] == 1
+    assert phases["parse"]["count"] == 2
+    assert phases["substitute"]["count"] == 4
+    assert phases["match"]["max"] <= phases["match"]["total"]
+    assert result["calls"]["match"]["count"] == 1
+    assert [record.operation for record in stats] == ["match", "sort"]
+
+
+def test_stats_batch_and_iterators(stats) -> None:
+    fonts = fontconfig.match_many([":family=serif", ":family=serif", ":family=sans-serif"])
+    font_lists = fontconfig.sort_many([":family=serif"])
+    listed = [font for font in fontconfig.iter_list()]
+    for first in fontconfig.iter_sort(":family=serif"):
+        break
+    fallback = fontconfig.resolve_fallback("Hello", ":family=sans-serif")
+
+    assert [record.operation for record in stats] == [
+        "match_many",
+        "sort_many",
+        "iter_list",
+        "iter_sort",
+        "resolve_fallback",
+    ]
+    assert stats[0].results == sum(font is not None for font in fonts)
+    assert stats[1].results == len(font_lists[0])
+    assert stats[2].results == len(listed)
+    assert stats[3].results >= 1 and first
+    assert stats[4].results == len(fallback)
+    assert set(stats[0].phases) == {"parse", "substitute", "match", "convert"}
+    assert "convert" not in stats[2].phases
+
+    result = fontconfig.get_stats()
+    assert result["calls"]["match_many"]["count"] == 1
+    assert result["calls"]["iter_sort"]["count"] == 1
+    assert result["phases"]["match"]["count"] == 2
+    assert result["phases"]["convert"]["count"] == 5
+
+
+def test_stats_disabled() -> None:
+    fontconfig.reset_stats()
+    records: List[fontconfig.CallStats] = []
+    fontconfig.add_stats_hook(records.append)
+    try:
+        fontconfig.match(":family=serif")
+    finally:
+        fontconfig.remove_stats_hook(records.append)
+    result = fontconfig.get_stats()
+    assert not result["enabled"]
+    assert not records
+    assert result["calls"]["match"]["count"] == 0
+    assert result["phases"]["match"]["count"] == 0
+    with pytest.raises(ValueError):
+        fontconfig.remove_stats_hook(records.append)
+
+
+# Threading tests
+
+
+def _resolve_in_threads(func, args_list, workers=8):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [f for f in executor.map(lambda args: func(*args), args_list)]
+
+
+def test_threads_match_consistent() -> None:
+    """Concurrent match() calls return the same result as a serial call."""
+    patterns = [":family=sans-serif", ":family=serif", ":family=monospace"]
+    expected = [fontconfig.match(p) for p in patterns]
+    results = _resolve_in_threads(fontconfig.match, [(p,) for p in patterns] * 50)
+    for i, result in enumerate(results):
+        assert result == expected[i % len(patterns)]
+
+
+def test_threads_snapshot(tmp_path) -> None:
+    """A Snapshot can be queried from many threads."""
+    path = str(tmp_path / "fonts.snapshot")
+    fontconfig.Snapshot.export(path)
+    snapshot = fontconfig.Snapshot.open(path)
+    n = len(snapshot)
+    if n == 0:
+        pytest.skip("no fonts available")
+    expected = [snapshot[i] for i in range(n)]
+    results = _resolve_in_threads(snapshot.__getitem__, [(i % n,) for i in range(400)])
+    for i, result in enumerate(results):
+        assert result == expected[i % n]
+
+    requests = [":family=sans-serif", ":lang=ja", ""]
+    expected_matches = [snapshot.match(request) for request in requests]
+    matches = _resolve_in_threads(snapshot.match, [(request,) for request in requests] * 50)
+    for i, match in enumerate(matches):
+        assert match == expected_matches[i % len(requests)]
+
+
+def test_threads_sort_list_consistent() -> None:
+    """Concurrent sort() and list() calls return consistent results."""
+    expected_sort = fontconfig.sort(":family=sans-serif")
+    expected_list = fontconfig.list(":lang=en", select=("family", "file"))
+
+    def work(i):
+        if i % 2:
+            return fontconfig.sort(":family=sans-serif") == expected_sort
+        return fontconfig.list(":lang=en", select=("family", "file")) == expected_list
+
+    assert all(_resolve_in_threads(work, [(i,) for i in range(100)]))
+
+
+def test_threads_config_methods(config) -> None:
+    """Config methods releasing the GIL can be called from many threads."""
+
+    def work(i):
+        pattern = fontconfig.Pattern.parse(":family=sans-serif")
+        pattern.default_substitute()
+        config.substitute(pattern)
+        font = config.font_match(pattern)
+        fonts = config.font_sort(pattern, trim=True)
+        object_set = fontconfig.ObjectSet.create()
+        object_set.add("family")
+        listed = config.font_list(fontconfig.Pattern.create(), object_set)
+        return (
+            font is None or isinstance(font, fontconfig.Pattern),
+            fonts is None or isinstance(fonts, fontconfig.FontSet),
+            isinstance(listed, fontconfig.FontSet),
+        )
+
+    for checks in _resolve_in_threads(work, [(i,) for i in range(64)]):
+        assert all(checks)
+
+
+def _count_gil_releases(func, duration: float = 0.5) -> int:
+    """Count how often a probe thread runs Python code while `func` is called
+    repeatedly for `duration` seconds.
+
+    With a long switch interval the interpreter never forces a GIL handoff,
+    so the probe can only run while `func` releases the GIL itself.
+    """
+    import threading
+    import time
+
+    counter = [0]
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            counter[0] += 1
+            time.sleep(0)
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(100)
+    try:
+        before = counter[0]
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            func()
+        return counter[0] - before
+    finally:
+        sys.setswitchinterval(interval)
+        stop.set()
+        thread.join()
+
+
+def test_threads_release_gil() -> None:
+    """Other threads run Python code while fonts are being resolved."""
+    if not fontconfig.list():
+        pytest.skip("no fonts available")
+
+    assert _count_gil_releases(lambda: sum(range(1000))) == 0
+    assert _count_gil_releases(lambda: fontconfig.match(":family=serif")) > 0
+    assert _count_gil_releases(lambda: fontconfig.sort(":family=serif")) > 0
+    assert _count_gil_releases(lambda: fontconfig.list(":lang=en")) > 0